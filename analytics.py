@@ -0,0 +1,82 @@
+"""
+Statistics behind the admin analytics page.
+
+They are read from the daily rollups in the Analytics collection, see
+rollups.py, rather than from the raw collections. Each metric is summed by
+a single aggregation: a $facet stage adds up the total, the per-category
+totals and one total per chart window side by side, so the page makes the
+same few round-trips however many users, appointments and payments there are.
+"""
+
+from datetime import datetime, time, timedelta
+
+def day_start(day):
+    return datetime.combine(day, time.min)
+
+def month_windows(today, months=6):
+    """(start, end) dates of the user growth chart, oldest first; the current month ends today"""
+    windows = []
+    for i in range(months):
+        month_start = today.replace(day=1) - timedelta(days=30*i)
+        month_end = today if i == 0 else month_start + timedelta(days=30)
+        windows.append((month_start, month_end))
+    return windows[::-1]
+
+def day_windows(today, days=7):
+    """(start, end) dates of each of the last days up to today, oldest first"""
+    return [(today - timedelta(days=n), today - timedelta(days=n - 1)) for n in range(days - 1, -1, -1)]
+
+def facet_total(result, name):
+    # $group yields no document at all when nothing matched
+    rows = result.get(name) or []
+    return rows[0]['total'] if rows else 0
+
+def metric_summary(metric_name, windows=()):
+    """Sum of a rollup metric overall, per category and per [start, end) window of days, in one aggregation"""
+    from models import Analytics
+
+    total = {'$sum': '$metric_value'}
+    facets = {'categories': [{'$group': {'_id': '$category', 'total': total}}]}
+    for n, (start, end) in enumerate(windows):
+        facets[f'window_{n}'] = [
+            {'$match': {'metric_date': {'$gte': day_start(start), '$lt': day_start(end)}}},
+            {'$group': {'_id': None, 'total': total}}
+        ]
+    result = next(Analytics.objects(metric_name=metric_name).aggregate([{'$facet': facets}]))
+
+    categories = {row['_id']: row['total'] for row in result['categories']}
+    return {
+        'total': sum(categories.values()),
+        'categories': categories,
+        'windows': [facet_total(result, f'window_{n}') for n in range(len(windows))]
+    }
+
+def user_statistics(today):
+    """Total users, users per role and monthly registrations"""
+    windows = month_windows(today)
+    summary = metric_summary('new_users', windows)
+    return {
+        'total': int(summary['total']),
+        # Roles are stored by their enum value
+        'roles': {role: int(count) for role, count in summary['categories'].items()},
+        'growth_labels': [start.strftime('%b') for start, _ in windows],
+        'growth_data': [int(count) for count in summary['windows']]
+    }
+
+def appointment_statistics(today):
+    """Total appointments and appointments per day of the last week"""
+    windows = day_windows(today)
+    summary = metric_summary('appointments', windows)
+    return {
+        'total': int(summary['total']),
+        'trend_labels': [start.strftime('%a') for start, _ in windows],
+        'trend_data': [int(count) for count in summary['windows']]
+    }
+
+def paid_revenue():
+    """Sum of the paid payment amounts"""
+    return metric_summary('revenue')['total']
+
+def chat_volume():
+    """Number of chatbot messages"""
+    return int(metric_summary('chat_messages')['total'])
@@ -1,14 +1,21 @@
-from flask import Flask, request, jsonify, render_template, send_from_directory, flash, redirect, url_for
+from flask import Flask, request, jsonify, render_template, send_from_directory, flash, redirect, url_for, g
 from flask_cors import CORS
 from flask_login import LoginManager, current_user, login_required
 from flask_socketio import SocketIO, emit, join_room, leave_room
+from werkzeug.local import LocalProxy
 import os
-import nltk
+import json
 import logging
 from mongoengine import connect
-from learning_model import HealthChatbotModel
+from learning_model import HealthChatbotModel, validate_intents
 from config import Config
-from models import User, ChatMessage, UserRole, Call, CallParticipant, CallLog, CallStatus
+from bulk_writer import BulkWriter
+from call_registry import CallRegistry
+from socket_queue import queue_options
+from realtime import user_room
+from unread import unread_counts
+import identity
+from models import User, ChatMessage, SystemLog, UserRole
 from auth import auth
 from dashboard import dashboard
 from datetime import datetime
@@ -17,28 +24,27 @@ from datetime import datetime
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Download required NLTK data
-try:
-    nltk.download('punkt')
-    nltk.download('wordnet')
-    nltk.download('omw-1.4')
-    nltk.download('averaged_perceptron_tagger')
-    logger.info("NLTK data downloaded successfully")
-except Exception as e:
-    logger.error(f"Error downloading NLTK data: {str(e)}")
+# NLTK data is not downloaded here; the chatbot loads locally installed
+# resources on first use (see nltk_resources.py to provision a host).
 
 def create_app(config_class=Config):
     app = Flask(__name__, static_folder='static')
     app.config.from_object(config_class)
 
     # Connect to MongoDB
-    connect(host=app.config['MONGODB_URI'])
+    if app.config.get('MONGODB_MOCK'):
+        # In-memory stand-in, see loadtest_signaling.py
+        import mongomock
+        connect(host=app.config['MONGODB_URI'], mongo_client_class=mongomock.MongoClient)
+    else:
+        connect(host=app.config['MONGODB_URI'])
 
     # Initialize extensions
     CORS(app)
 
-    # Initialize SocketIO
-    socketio = SocketIO(app, cors_allowed_origins="*")
+    # Initialize SocketIO, across workers when they share a message queue
+    socketio = SocketIO(app, cors_allowed_origins="*",
+                        **queue_options(app.config['SOCKETIO_MESSAGE_QUEUE'], app.config['SOCKETIO_CHANNEL']))
 
     # Initialize Flask-Login
     login_manager = LoginManager()
@@ -58,14 +64,59 @@ def create_app(config_class=Config):
         """Slice ObjectId string representation"""
         return str(value)[start:end]
 
+    def current_unread_counts():
+        if 'unread_counts' not in g:
+            g.unread_counts = (unread_counts(current_user) if current_user.is_authenticated
+                               else {'messages': 0, 'notifications': 0})
+        return g.unread_counts
+
+    @app.context_processor
+    def inject_unread_counts():
+        """Unread messages and notifications of the signed-in user, from its counter, see unread.py.
+
+        Read on first use, once per request, so templates not showing them cost no query.
+        """
+        return {'unread': LocalProxy(current_unread_counts)}
+
     @login_manager.user_loader
     def load_user(user_id):
-        return User.objects(id=user_id).first()
+        # Cached between requests, see identity.py
+        return identity.load_user(user_id)
 
     # Register blueprints
     app.register_blueprint(auth, url_prefix='/auth')
     app.register_blueprint(dashboard, url_prefix='/dashboard')
 
+    # Chat history is written in batches off the request path, bounded so a slow database cannot grow it without limit
+    chat_writer = BulkWriter(
+        ChatMessage,
+        batch_size=app.config['CHAT_WRITER_BATCH_SIZE'],
+        flush_interval=app.config['CHAT_WRITER_FLUSH_INTERVAL'],
+        name='chat-message-writer',
+        max_queue=app.config['CHAT_WRITER_MAX_QUEUE'],
+        overflow=app.config['CHAT_WRITER_OVERFLOW'],
+        block_timeout=app.config['CHAT_WRITER_BLOCK_TIMEOUT']
+    )
+    app.extensions['chat_writer'] = chat_writer
+
+    # So is the audit trail of dashboard.log_action
+    app.extensions['audit_writer'] = BulkWriter(
+        SystemLog,
+        batch_size=app.config['AUDIT_WRITER_BATCH_SIZE'],
+        flush_interval=app.config['AUDIT_WRITER_FLUSH_INTERVAL'],
+        name='system-log-writer',
+        max_queue=app.config['AUDIT_WRITER_MAX_QUEUE'],
+        overflow=app.config['AUDIT_WRITER_OVERFLOW'],
+        block_timeout=app.config['AUDIT_WRITER_BLOCK_TIMEOUT']
+    )
+
+    # Rooms of the calls in progress for the signaling handlers below
+    calls = CallRegistry(
+        flush_interval=app.config['CALL_STATE_FLUSH_INTERVAL'],
+        idle_timeout=app.config['CALL_ROOM_IDLE_TIMEOUT']
+    )
+    app.extensions['call_registry'] = calls
+
     # Initialize chatbot
     chatbot = None
 
@@ -73,7 +124,7 @@ def create_app(config_class=Config):
         nonlocal chatbot
         try:
             logger.info("Initializing chatbot...")
-            chatbot = HealthChatbotModel()
+            chatbot = HealthChatbotModel(cache_size=app.config['CHAT_CACHE_SIZE'])
 
             # Try to load existing model, if not found, train a new one
             if not chatbot.load_saved_model():
@@ -86,6 +137,16 @@ def create_app(config_class=Config):
                 logger.info("Model training completed!")
             else:
                 logger.info("Loaded existing model successfully")
+                if chatbot.intents is not None:
+                    # The artifact was missing or stale: write it so workers started from now on map it
+                    try:
+                        chatbot.save_artifact()
+                    except OSError as e:
+                        logger.warning(f"Could not save the intent index: {str(e)}")
+
+            # Pick up edits of the intents file without restarting the worker
+            if app.config['CHAT_RELOAD_INTERVAL'] > 0:
+                chatbot.watch(app.config['CHAT_RELOAD_INTERVAL'])
 
         except Exception as e:
             logger.error(f"Error initializing chatbot: {str(e)}")
@@ -147,14 +208,13 @@ def create_app(config_class=Config):
             # Get chatbot response
             response = chatbot.get_response(user_message)
 
-            # Save chat message to database if user is authenticated
+            # Queue chat message for the history writer if user is authenticated
             if current_user.is_authenticated:
-                chat_message = ChatMessage(
-                    user=current_user,
+                chat_writer.submit(ChatMessage(
+                    user=current_user._get_current_object(),
                     message=user_message,
                     response=response
-                )
-                chat_message.save()
+                ))
 
             return jsonify({
                 'status': 'success',
@@ -166,6 +226,79 @@ def create_app(config_class=Config):
             logger.error(f"Error in chat API: {str(e)}")
             return jsonify({'status': 'error', 'error': 'Internal server error'}), 500
 
+    @app.route('/api/chat/batch', methods=['POST'])
+    @login_required
+    def chat_batch_api():
+        try:
+            data = request.get_json(silent=True) or {}
+            messages = data.get('messages')
+
+            if not isinstance(messages, list) or not messages:
+                return jsonify({'status': 'error', 'error': 'No messages provided'}), 400
+            if not all(isinstance(message, str) and message for message in messages):
+                return jsonify({'status': 'error', 'error': 'Messages must be non-empty strings'}), 400
+            if len(messages) > app.config['CHAT_BATCH_LIMIT']:
+                return jsonify({
+                    'status': 'error',
+                    'error': f"At most {app.config['CHAT_BATCH_LIMIT']} messages per batch"
+                }), 400
+
+            # Score all messages in one pass; batch replays are not saved as chat history
+            responses = chatbot.get_responses(messages)
+
+            return jsonify({
+                'status': 'success',
+                'responses': responses,
+                'timestamp': datetime.utcnow().isoformat()
+            })
+
+        except Exception as e:
+            logger.error(f"Error in chat batch API: {str(e)}")
+            return jsonify({'status': 'error', 'error': 'Internal server error'}), 500
+
+    @app.route('/api/chat/reload', methods=['POST'])
+    @login_required
+    def chat_reload_api():
+        """
+        Rebuilds the chatbot index in the background, from an uploaded
+        intents file or JSON body when given, else from model/intents.json
+        """
+        if not current_user.is_admin():
+            return jsonify({'status': 'error', 'error': 'Admin privileges required'}), 403
+        try:
+            intents = None
+            upload = request.files.get('intents')
+            if upload:
+                intents = json.load(upload.stream)
+            elif request.is_json:
+                intents = request.get_json(silent=True)
+                if intents is None:
+                    raise ValueError('The request body is not valid JSON')
+            if intents is not None:
+                validate_intents(intents)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'error': f'Invalid intents: {str(e)}'}), 400
+
+        if not chatbot.reload_async(intents=intents):
+            return jsonify({'status': 'error', 'error': 'A reload is already in progress'}), 409
+
+        logger.info(f"Chatbot reload started by {current_user.username}")
+        return jsonify({
+            'status': 'accepted',
+            'timestamp': datetime.utcnow().isoformat()
+        }), 202
+
+    @app.route('/api/chat/metrics', methods=['GET'])
+    @login_required
+    def chat_metrics_api():
+        if not current_user.is_admin():
+            return jsonify({'status': 'error', 'error': 'Admin privileges required'}), 403
+        return jsonify({
+            'status': 'success',
+            'metrics': dict(chatbot.metrics(), history_writer=chat_writer.stats(), user_cache=identity.cache_stats()),
+            'timestamp': datetime.utcnow().isoformat()
+        })
+
     @app.route('/api/welcome', methods=['GET'])
     def welcome_api():
         """
@@ -186,7 +319,23 @@ def create_app(config_class=Config):
     def internal_error(error):
         return render_template('500.html'), 500
 
-    # SocketIO event handlers for WebRTC calls
+    # Each signed-in socket joins the room its notifications and messages are pushed to, see realtime.py
+    @socketio.on('connect')
+    def handle_connect():
+        if current_user.is_authenticated:
+            join_room(user_room(current_user.id))
+
+    # Sockets dropped without leave_call, e.g. a closed tab, still leave their calls
+    @socketio.on('disconnect')
+    def handle_disconnect():
+        try:
+            for room_id, user_id in calls.disconnect(request.sid, datetime.utcnow()):
+                emit('user_left', {'user_id': user_id}, room=room_id, include_self=False)
+        except Exception as e:
+            logger.error(f"Error updating participant status: {e}")
+
+    # SocketIO event handlers for WebRTC calls. Participant state is kept in memory
+    # and written in the background, see call_registry.py
     @socketio.on('join_call')
     def handle_join_call(data):
         room_id = data.get('room_id')
@@ -194,19 +343,11 @@ def create_app(config_class=Config):
 
         if room_id and user_id:
             join_room(room_id)
-            emit('user_joined', {'user_id': user_id}, room=room_id, skip_sid=True)
+            emit('user_joined', {'user_id': user_id}, room=room_id, include_self=False)
 
             # Update call participant status
             try:
-                call = Call.objects(room_id=room_id).first()
-                if call:
-                    participant = CallParticipant.objects(call=call, user=user_id).first()
-                    if participant:
-                        participant.joined_at = datetime.utcnow()
-                        participant.save()
-
-                        # Log the action
-                        CallLog(call=call, user=user_id, action='joined').save()
+                calls.join(room_id, user_id, datetime.utcnow(), sid=request.sid)
             except Exception as e:
                 logger.error(f"Error updating participant status: {e}")
 
@@ -217,19 +358,11 @@ def create_app(config_class=Config):
 
         if room_id and user_id:
             leave_room(room_id)
-            emit('user_left', {'user_id': user_id}, room=room_id, skip_sid=True)
+            emit('user_left', {'user_id': user_id}, room=room_id, include_self=False)
 
             # Update call participant status
             try:
-                call = Call.objects(room_id=room_id).first()
-                if call:
-                    participant = CallParticipant.objects(call=call, user=user_id).first()
-                    if participant:
-                        participant.left_at = datetime.utcnow()
-                        participant.save()
-
-                        # Log the action
-                        CallLog(call=call, user=user_id, action='left').save()
+                calls.leave(room_id, user_id, datetime.utcnow(), sid=request.sid)
             except Exception as e:
                 logger.error(f"Error updating participant status: {e}")
 
@@ -240,7 +373,7 @@ def create_app(config_class=Config):
         user_id = data.get('user_id')
 
         if room_id and offer:
-            emit('offer', {'offer': offer, 'user_id': user_id}, room=room_id, skip_sid=True)
+            emit('offer', {'offer': offer, 'user_id': user_id}, room=room_id, include_self=False)
 
     @socketio.on('answer')
     def handle_answer(data):
@@ -249,7 +382,7 @@ def create_app(config_class=Config):
         user_id = data.get('user_id')
 
         if room_id and answer:
-            emit('answer', {'answer': answer, 'user_id': user_id}, room=room_id, skip_sid=True)
+            emit('answer', {'answer': answer, 'user_id': user_id}, room=room_id, include_self=False)
 
     @socketio.on('ice_candidate')
     def handle_ice_candidate(data):
@@ -258,7 +391,7 @@ def create_app(config_class=Config):
         user_id = data.get('user_id')
 
         if room_id and candidate:
-            emit('ice_candidate', {'candidate': candidate, 'user_id': user_id}, room=room_id, skip_sid=True)
+            emit('ice_candidate', {'candidate': candidate, 'user_id': user_id}, room=room_id, include_self=False)
 
     @socketio.on('mute_audio')
     def handle_mute_audio(data):
@@ -266,19 +399,11 @@ def create_app(config_class=Config):
         user_id = data.get('user_id')
 
         if room_id and user_id:
-            emit('user_muted', {'user_id': user_id}, room=room_id, skip_sid=True)
+            emit('user_muted', {'user_id': user_id}, room=room_id, include_self=False)
 
             # Update participant status
             try:
-                call = Call.objects(room_id=room_id).first()
-                if call:
-                    participant = CallParticipant.objects(call=call, user=user_id).first()
-                    if participant:
-                        participant.is_muted = True
-                        participant.save()
-
-                        # Log the action
-                        CallLog(call=call, user=user_id, action='muted').save()
+                calls.record(room_id, user_id, 'muted', is_muted=True)
             except Exception as e:
                 logger.error(f"Error updating mute status: {e}")
 
@@ -288,19 +413,11 @@ def create_app(config_class=Config):
         user_id = data.get('user_id')
 
         if room_id and user_id:
-            emit('user_unmuted', {'user_id': user_id}, room=room_id, skip_sid=True)
+            emit('user_unmuted', {'user_id': user_id}, room=room_id, include_self=False)
 
             # Update participant status
             try:
-                call = Call.objects(room_id=room_id).first()
-                if call:
-                    participant = CallParticipant.objects(call=call, user=user_id).first()
-                    if participant:
-                        participant.is_muted = False
-                        participant.save()
-
-                        # Log the action
-                        CallLog(call=call, user=user_id, action='unmuted').save()
+                calls.record(room_id, user_id, 'unmuted', is_muted=False)
             except Exception as e:
                 logger.error(f"Error updating unmute status: {e}")
 
@@ -311,19 +428,12 @@ def create_app(config_class=Config):
         enabled = data.get('enabled', True)
 
         if room_id and user_id:
-            emit('video_toggled', {'user_id': user_id, 'enabled': enabled}, room=room_id, skip_sid=True)
+            emit('video_toggled', {'user_id': user_id, 'enabled': enabled}, room=room_id, include_self=False)
 
             # Update participant status
             try:
-                call = Call.objects(room_id=room_id).first()
-                if call:
-                    participant = CallParticipant.objects(call=call, user=user_id).first()
-                    if participant:
-                        participant.is_video_enabled = enabled
-                        participant.save()
-
-                        action = 'video_enabled' if enabled else 'video_disabled'
-                        CallLog(call=call, user=user_id, action=action).save()
+                action = 'video_enabled' if enabled else 'video_disabled'
+                calls.record(room_id, user_id, action, is_video_enabled=enabled)
             except Exception as e:
                 logger.error(f"Error updating video status: {e}")
 
@@ -334,19 +444,12 @@ def create_app(config_class=Config):
         sharing = data.get('sharing', False)
 
         if room_id and user_id:
-            emit('screen_shared', {'user_id': user_id, 'sharing': sharing}, room=room_id, skip_sid=True)
+            emit('screen_shared', {'user_id': user_id, 'sharing': sharing}, room=room_id, include_self=False)
 
             # Update participant status
             try:
-                call = Call.objects(room_id=room_id).first()
-                if call:
-                    participant = CallParticipant.objects(call=call, user=user_id).first()
-                    if participant:
-                        participant.is_screen_sharing = sharing
-                        participant.save()
-
-                        action = 'screen_share_started' if sharing else 'screen_share_stopped'
-                        CallLog(call=call, user=user_id, action=action).save()
+                action = 'screen_share_started' if sharing else 'screen_share_stopped'
+                calls.record(room_id, user_id, action, is_screen_sharing=sharing)
             except Exception as e:
                 logger.error(f"Error updating screen share status: {e}")
 
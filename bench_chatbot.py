@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for chatbot intent matching.
+
+Replays a fixed corpus of queries built from the intents file (every
+pattern, misspelled and truncated variants of it, and out-of-domain text)
+through each matching mode and reports p50/p95/p99 latency, throughput
+and memory. Run it whenever the intents grow:
+
+    python bench_chatbot.py --json bench.json          # record a baseline
+    python bench_chatbot.py --baseline bench.json      # exit 1 on regression
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+OUT_OF_DOMAIN = [
+    "What is the capital of France",
+    "Recommend a good science fiction novel",
+    "How do I change a flat tire",
+    "Who won the football match yesterday",
+    "Explain how compilers optimize loops",
+    "What time does the train to Boston leave",
+    "Translate good morning into Spanish",
+    "How much does a used car cost",
+    "Write a poem about the ocean",
+    "What is the stock price of Apple",
+    "How do I reset my router password",
+    "Best pizza toppings for a party",
+    "asdf qwerty zxcv",
+    "The quick brown fox jumps over the lazy dog",
+    "Can you help me fix my bicycle chain",
+    "How many planets are in the solar system"
+]
+
+MODES = ['model', 'model-batch', 'overlap', 'tfidf']
+
+# Relative change above which a metric counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+def misspell(text, rng):
+    """Swap, drop or double one letter of a random word"""
+    words = text.split()
+    candidates = [position for position, word in enumerate(words) if len(word) > 3]
+    if not candidates:
+        return text
+    position = rng.choice(candidates)
+    word = words[position]
+    at = rng.randrange(1, len(word) - 1)
+    edit = rng.choice(('swap', 'drop', 'double'))
+    if edit == 'swap':
+        word = word[:at] + word[at + 1] + word[at] + word[at + 2:]
+    elif edit == 'drop':
+        word = word[:at] + word[at + 1:]
+    else:
+        word = word[:at] + word[at] + word[at:]
+    words[position] = word
+    return ' '.join(words)
+
+def build_corpus(intents_file, seed=42):
+    """Return the fixed query corpus for an intents file, as (kind, query) pairs"""
+    with open(intents_file, 'r', encoding='utf-8') as f:
+        patterns = [pattern for intent in json.load(f)['intents'] for pattern in intent['patterns']]
+
+    rng = random.Random(seed)
+    corpus = [('pattern', pattern) for pattern in patterns]
+    corpus += [('misspelled', misspell(pattern, rng)) for pattern in patterns]
+    corpus += [('truncated', ' '.join(pattern.split()[:max(1, len(pattern.split()) - 1)]))
+               for pattern in patterns if len(pattern.split()) > 2]
+    corpus += [('out_of_domain', text) for text in OUT_OF_DOMAIN]
+    # Mixes of words from unrelated patterns share tokens with many of them
+    words = ' '.join(patterns).split()
+    corpus += [('out_of_domain', ' '.join(rng.sample(words, rng.randint(3, 6))))
+               for _ in range(len(OUT_OF_DOMAIN))]
+    return corpus
+
+def make_responder(mode, intents_file, batch_size):
+    """Build the chatbot for a mode; returns a function answering a list of queries"""
+    if mode in ('model', 'model-batch'):
+        from learning_model import HealthChatbotModel
+        # Without a response cache every replay measures scoring
+        model = HealthChatbotModel(cache_size=0)
+        model.load_data(intents_file)
+        model.ensure_index()
+        if mode == 'model':
+            return lambda queries: [model.get_response(query) for query in queries], 1
+        return model.get_responses, batch_size
+
+    from chatbot import HealthChatbot
+    bot = HealthChatbot(match_mode=mode, intents_file=intents_file)
+    return lambda queries: [bot.get_response(query) for query in queries], 1
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+def run_mode(mode, queries, intents_file, batch_size=100, repeat=3, warmup=50):
+    """Time the mode over the corpus; latency samples are per call of the responder"""
+    started = time.perf_counter()
+    respond, step = make_responder(mode, intents_file, batch_size)
+    setup_seconds = time.perf_counter() - started
+    respond(queries[:warmup])
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for start in range(0, len(queries), step):
+            chunk = queries[start:start + step]
+            call_started = time.perf_counter_ns()
+            respond(chunk)
+            samples.append((time.perf_counter_ns() - call_started) / 1e6)
+    elapsed = time.perf_counter() - started
+
+    # Measured in a separate pass, tracing slows down the timed one
+    tracemalloc.start()
+    respond, step = make_responder(mode, intents_file, batch_size)
+    retained_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    for start in range(0, len(queries), step):
+        respond(queries[start:start + step])
+    peak_bytes = tracemalloc.get_traced_memory()[1] - retained_bytes
+    tracemalloc.stop()
+
+    return {
+        'queries': len(queries) * repeat,
+        'batch_size': step,
+        'setup_ms': round(setup_seconds * 1000, 3),
+        'p50_ms': round(percentile(samples, 0.50), 4),
+        'p95_ms': round(percentile(samples, 0.95), 4),
+        'p99_ms': round(percentile(samples, 0.99), 4),
+        'throughput_qps': round(len(queries) * repeat / elapsed, 1),
+        'setup_memory_kb': round(retained_bytes / 1024, 1),
+        'peak_memory_kb': round(peak_bytes / 1024, 1)
+    }
+
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Compare results with a baseline run; returns a list of readable regressions"""
+    regressions = []
+    for mode, result in results.items():
+        previous = baseline.get('results', {}).get(mode)
+        if not previous:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'setup_memory_kb', 'peak_memory_kb'):
+            if previous[metric] and result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{mode} {metric}: {previous[metric]} -> {result[metric]}")
+        if result['throughput_qps'] < previous['throughput_qps'] * (1 - tolerance):
+            regressions.append(f"{mode} throughput_qps: {previous['throughput_qps']} -> {result['throughput_qps']}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark chatbot intent matching")
+    parser.add_argument('--intents', default='model/intents.json', help="intents file to build the corpus and bots from")
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--repeat', type=int, default=3, help="replays of the corpus per mode")
+    parser.add_argument('--batch-size', type=int, default=100, help="messages per get_responses call in model-batch")
+    parser.add_argument('--seed', type=int, default=42, help="seed of the perturbed corpus")
+    parser.add_argument('--json', help="write the results to this file")
+    parser.add_argument('--baseline', help="results file of a previous run to gate regressions against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown or memory growth (default 0.25)")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.WARNING)
+    corpus = build_corpus(args.intents, args.seed)
+    queries = [query for _, query in corpus]
+    kinds = {}
+    for kind, _ in corpus:
+        kinds[kind] = kinds.get(kind, 0) + 1
+    print(f"📊 Corpus: {len(queries)} queries from {args.intents} ({', '.join(f'{n} {kind}' for kind, n in kinds.items())})")
+
+    results = {}
+    print(f"{'mode':<12} {'setup ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'qps':>9} "
+          f"{'setup KB':>9} {'peak KB':>9}")
+    for mode in args.modes:
+        result = run_mode(mode, queries, args.intents, args.batch_size, args.repeat)
+        results[mode] = result
+        print(f"{mode:<12} {result['setup_ms']:>9} {result['p50_ms']:>9} {result['p95_ms']:>9} "
+              f"{result['p99_ms']:>9} {result['throughput_qps']:>9} {result['setup_memory_kb']:>9} "
+              f"{result['peak_memory_kb']:>9}")
+    print("(model-batch latencies are per get_responses call; setup KB is retained by the bot, "
+          "peak KB is the extra peak while replaying)")
+
+    report = {'intents': args.intents, 'corpus_size': len(queries), 'seed': args.seed, 'results': results}
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('corpus_size') != len(queries):
+            print(f"ℹ️ Corpus grew from {baseline.get('corpus_size')} to {len(queries)} queries since the baseline")
+        regressions = find_regressions(results, baseline, args.tolerance)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"   {regression}")
+            return 1
+        print(f"✅ No regressions beyond {args.tolerance:.0%} of {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
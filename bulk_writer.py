@@ -0,0 +1,153 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class BulkWriter:
+    """Queue of MongoEngine documents inserted in batches by a background thread.
+
+    Requests hand documents to submit() and return immediately. A daemon
+    thread inserts them with one insert_many per batch, as soon as
+    batch_size documents are waiting or flush_interval seconds after the
+    first of them arrived. Whatever is still queued is written at exit.
+
+    The thread is started on first use, and again in a forked child: a
+    writer created before a pre-forking server spawns its workers gets a
+    fresh queue and thread in each of them, the parent writes its own.
+
+    With max_queue set, at most that many documents wait. When the database
+    falls behind, overflow='block' makes submit() wait for room, up to
+    block_timeout seconds, and overflow='drop' gives up right away; either
+    way a document that does not fit is dropped and counted.
+    """
+
+    OVERFLOW_POLICIES = ('block', 'drop')
+
+    def __init__(self, document_class, batch_size=100, flush_interval=1.0, name=None,
+                 max_queue=0, overflow='block', block_timeout=None):
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}, expected one of {self.OVERFLOW_POLICIES}")
+        self.document_class = document_class
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name or f"{document_class.__name__}-writer"
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self.submitted = 0
+        self.written = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def submit(self, document):
+        """Validate the document now and queue it for insertion; False if the full queue dropped it"""
+        # insert() skips validation, so invalid documents are rejected to the caller here
+        document.validate()
+        self._ensure_started()
+        try:
+            if self.overflow == 'drop':
+                self._queue.put_nowait(document)
+            else:
+                self._queue.put(document, timeout=self.block_timeout)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"{self.name}: queue full, {self.dropped} documents dropped so far")
+            return False
+        self.submitted += 1
+        return True
+
+    def flush(self, timeout=None):
+        """Block until everything submitted so far has been written; False on timeout"""
+        if self._pid != os.getpid():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        """Write what is queued and stop the thread"""
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.error(f"{self.name}: still {self._queue.qsize()} documents queued at close, not written")
+            return
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            'queued': self._queue.qsize() if self._pid == os.getpid() else 0,
+            'submitted': self.submitted,
+            'written': self.written,
+            'failed': self.failed,
+            'dropped': self.dropped,
+            'batches': self.batches
+        }
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is None:
+                atexit.register(self.close)
+            # After a fork the parent's thread does not exist here and its queue is the parent's to write
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            try:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is _STOP:
+                self._write(batch)
+                return
+            if isinstance(item, threading.Event):
+                self._write(batch)
+                batch, deadline = [], None
+                item.set()
+                continue
+            if item is not None:
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            if len(batch) >= self.batch_size or (deadline is not None and time.monotonic() >= deadline):
+                self._write(batch)
+                batch, deadline = [], None
+
+    def _write(self, batch):
+        if not batch:
+            return
+        try:
+            self.document_class.objects.insert(batch, load_bulk=False)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"{self.name}: failed to insert {len(batch)} documents: {str(e)}")
+        self.batches += 1
@@ -0,0 +1,254 @@
+"""
+State of the calls in progress, kept in memory for the Socket.IO handlers.
+
+Joining, leaving, muting, toggling the video or sharing the screen used to
+look the Call and the CallParticipant up, save the participant and save a
+CallLog, four round-trips inside the signaling path. The registry keeps,
+per room, the call id and its participants with their media state, loaded
+once with two queries. Handlers change that state in memory and return; a
+background thread writes the participants that changed with one bulk_write
+every flush_interval seconds, and the CallLog rows go through a BulkWriter.
+
+Pages reading CallParticipant may therefore lag up to flush_interval
+seconds behind the signaling. What is queued is written at exit.
+
+Users found in no call are remembered for MISS_TTL seconds, so the events
+of a stranger do not reload the room each time. Rooms are dropped when
+everybody left, including by disconnecting, and otherwise after
+idle_timeout seconds without events, e.g. when the call ended on another
+worker.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+from bulk_writer import BulkWriter
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# CallParticipant fields kept in memory
+MEDIA_STATE = ('is_muted', 'is_video_enabled', 'is_screen_sharing')
+
+class ParticipantState:
+    def __init__(self, participant_id, user_id, state=None):
+        self.id = participant_id
+        self.user_id = user_id
+        self.state = state or {}
+        self.present = False
+
+class CallRoom:
+    def __init__(self, call_id, participants=None, last_active=0.0):
+        self.call_id = call_id
+        # By user id as a string, as the clients send it
+        self.participants = participants or {}
+        self.last_active = last_active
+
+class CallRegistry:
+    """Rooms of the calls in progress, with their participants' state written behind"""
+
+    # Seconds a user is not looked up again in a room they take no part in
+    MISS_TTL = 10.0
+    MISS_CACHE_SIZE = 4096
+
+    def __init__(self, flush_interval=1.0, log_writer=None, idle_timeout=300.0, clock=time.monotonic):
+        from models import CallLog
+        self.flush_interval = flush_interval
+        self.log_writer = log_writer or BulkWriter(CallLog, flush_interval=flush_interval, name='call-log-writer')
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._rooms = {}
+        # (room id, user id) found in no call
+        self._misses = TTLCache(self.MISS_CACHE_SIZE, self.MISS_TTL, clock=clock)
+        # Socket id -> {(room id, user id)} joined through it
+        self._sockets = {}
+        # Participant id -> fields to $set on the next flush
+        self._pending = {}
+        self._pid = None
+        self._stop = None
+        self._thread = None
+        self.loads = 0
+        self.updates_written = 0
+        self.failed = 0
+        self.evicted = 0
+
+    def record(self, room_id, user_id, action, **state):
+        """Apply state to the participant user_id of room_id and log action.
+
+        Returns the ParticipantState, None if user_id takes no part in the call.
+        """
+        from models import CallLog
+
+        room = self.room(room_id, user_id)
+        if room is None:
+            return None
+        participant = room.participants[str(user_id)]
+        with self._lock:
+            room.last_active = self.clock()
+            changed = {name: value for name, value in state.items() if participant.state.get(name) != value}
+            participant.state.update(changed)
+            if changed:
+                self._pending.setdefault(participant.id, {}).update(changed)
+        self.log_writer.submit(CallLog(call=room.call_id, user=participant.user_id, action=action))
+        self._ensure_started()
+        return participant
+
+    def join(self, room_id, user_id, moment, sid=None):
+        """Mark user_id present in room_id; sid is the socket it joined through, left on disconnect"""
+        # A user added to the call since their last event is looked up again
+        self._misses.pop((room_id, str(user_id)))
+        participant = self.record(room_id, user_id, 'joined', joined_at=moment)
+        if participant is not None:
+            with self._lock:
+                participant.present = True
+                if sid is not None:
+                    self._sockets.setdefault(sid, set()).add((room_id, str(user_id)))
+        return participant
+
+    def leave(self, room_id, user_id, moment, sid=None):
+        participant = self.record(room_id, user_id, 'left', left_at=moment)
+        if participant is not None:
+            with self._lock:
+                participant.present = False
+                if sid in self._sockets:
+                    self._sockets[sid].discard((room_id, str(user_id)))
+                    if not self._sockets[sid]:
+                        del self._sockets[sid]
+                room = self._rooms.get(room_id)
+                # Everybody left: nothing to serve, the queued state is kept by participant
+                if room is not None and not any(p.present for p in room.participants.values()):
+                    del self._rooms[room_id]
+        return participant
+
+    def disconnect(self, sid, moment):
+        """Leave the rooms joined through the socket sid; returns the (room id, user id) left"""
+        with self._lock:
+            joined = sorted(self._sockets.pop(sid, ()))
+        for room_id, user_id in joined:
+            self.leave(room_id, user_id, moment)
+        return joined
+
+    def room(self, room_id, user_id=None):
+        """The CallRoom of room_id, loaded if unknown or if user_id is not among its participants yet"""
+        with self._lock:
+            room = self._rooms.get(room_id)
+        if room is not None and (user_id is None or str(user_id) in room.participants):
+            return room
+        miss = (room_id, None if user_id is None else str(user_id))
+        if self._misses.get(miss):
+            return None
+        room = self._load(room_id)
+        if room is None or (user_id is not None and str(user_id) not in room.participants):
+            self._misses.put(miss, True)
+            return None
+        return room
+
+    def forget(self, room_id):
+        """Drop room_id, e.g. when its call ended"""
+        with self._lock:
+            self._rooms.pop(room_id, None)
+
+    def evict_idle(self):
+        """Drop the rooms without events for idle_timeout seconds; returns how many were dropped"""
+        deadline = self.clock() - self.idle_timeout
+        with self._lock:
+            idle = [room_id for room_id, room in self._rooms.items() if room.last_active < deadline]
+            # The queued state is kept by participant
+            for room_id in idle:
+                del self._rooms[room_id]
+            self.evicted += len(idle)
+        return len(idle)
+
+    def flush(self):
+        """Write the participants changed since the last flush; returns how many were written"""
+        from pymongo import UpdateOne
+        from models import CallParticipant
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            CallParticipant._get_collection().bulk_write(
+                [UpdateOne({'_id': participant_id}, {'$set': fields}) for participant_id, fields in pending.items()],
+                ordered=False
+            )
+        except Exception as e:
+            self.failed += len(pending)
+            logger.error(f"call-registry: failed to write {len(pending)} participants: {str(e)}")
+            # Retried on the next flush, under whatever changed since
+            with self._lock:
+                for participant_id, fields in pending.items():
+                    self._pending[participant_id] = dict(fields, **self._pending.get(participant_id, {}))
+            return 0
+        self.updates_written += len(pending)
+        return len(pending)
+
+    def close(self, timeout=5.0):
+        """Stop the thread, write the queued participants and call logs"""
+        if self._pid == os.getpid():
+            self._stop.set()
+            self._thread.join(timeout)
+        self.flush()
+        self.log_writer.close(timeout)
+
+    def stats(self):
+        with self._lock:
+            rooms, pending, sockets = len(self._rooms), len(self._pending), len(self._sockets)
+        return {
+            'rooms': rooms,
+            'pending': pending,
+            'sockets': sockets,
+            'loads': self.loads,
+            'evicted': self.evicted,
+            'misses': self._misses.stats(),
+            'updates_written': self.updates_written,
+            'failed': self.failed,
+            'call_logs': self.log_writer.stats()
+        }
+
+    def _load(self, room_id):
+        from models import Call, CallParticipant
+
+        call = Call.objects(room_id=room_id).only('id').as_pymongo().first()
+        if call is None:
+            return None
+        rows = CallParticipant.objects(call=call['_id']).only('id', 'user', *MEDIA_STATE).as_pymongo()
+        self.loads += 1
+        room = CallRoom(call['_id'], {
+            str(row['user']): ParticipantState(row['_id'], row['user'], {name: row[name] for name in MEDIA_STATE if name in row})
+            for row in rows
+        }, self.clock())
+        with self._lock:
+            # State changed in memory may not be written yet
+            for participant in room.participants.values():
+                participant.state.update((name, value) for name, value in self._pending.get(participant.id, {}).items()
+                                         if name in MEDIA_STATE)
+            known = self._rooms.get(room_id)
+            if known is not None:
+                room.participants.update(known.participants)
+            self._rooms[room_id] = room
+        return room
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is None:
+                atexit.register(self.close)
+            # After a fork the parent's thread does not exist here, see BulkWriter
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='call-registry', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+            self.evict_idle()
@@ -0,0 +1,78 @@
+"""
+Starting a call in a fixed number of round-trips.
+
+Creating a call used to look every participant up, then save their
+CallParticipant and Notification one at a time, so a group call cost a few
+round-trips per person. start_call() loads the participants with one id__in
+query and inserts their CallParticipant and Notification documents with one
+insert_many each, the initiator's CallParticipant included. With the Call, its CallLog and the update of the unread
+counters, see unread.py, that is six round-trips however many people are
+called, up to MAX_GROUP_PARTICIPANTS.
+"""
+
+import uuid
+
+from bson import ObjectId
+
+from models import User, Call, CallParticipant, CallLog, CallType, NotificationType
+from notifications import notify_many
+from query_utils import USER_DISPLAY_FIELDS
+
+def resolve_participants(initiator, participant_ids):
+    """The users of participant_ids other than initiator, in the order given, with one query.
+
+    Unknown and malformed ids are left out, as are duplicates.
+    """
+    ids = []
+    for participant_id in participant_ids:
+        if ObjectId.is_valid(str(participant_id)):
+            participant_id = ObjectId(str(participant_id))
+            if participant_id != initiator.id and participant_id not in ids:
+                ids.append(participant_id)
+    if not ids:
+        return []
+    users = {user.id: user for user in User.objects(id__in=ids).only(*USER_DISPLAY_FIELDS)}
+    return [users[participant_id] for participant_id in ids if participant_id in users]
+
+def start_call(initiator, participant_ids, call_type=CallType.VIDEO.value, max_participants=None, **details):
+    """Create a call of initiator with participant_ids, its participants, log and notifications.
+
+    details are further Call fields, e.g. call_title and notes. Returns the
+    Call and the list of users called; raises ValueError when nobody valid
+    is called or, with max_participants, when the call would be larger.
+    """
+    call_type = CallType(call_type)
+    if max_participants and len(set(map(str, participant_ids)) - {str(initiator.id)}) + 1 > max_participants:
+        raise ValueError(f'A call takes at most {max_participants} participants.')
+    participants = resolve_participants(initiator, participant_ids)
+    if not participants:
+        raise ValueError('No valid participants found')
+
+    call = Call(
+        initiator=initiator,
+        participants=[initiator] + participants,
+        call_type=call_type,
+        room_id=str(uuid.uuid4()),
+        is_group_call=len(participants) > 1,
+        **details
+    )
+    call.save()
+
+    # The initiator takes part too, so the signaling handlers find them, see call_registry.py
+    call_participants = [CallParticipant(call=call, user=user) for user in [initiator] + participants]
+    # insert() skips validation
+    for call_participant in call_participants:
+        call_participant.validate()
+    CallParticipant.objects.insert(call_participants, load_bulk=False)
+
+    CallLog(call=call, user=initiator, action="initiated").save()
+
+    # Notify all participants with one insert
+    notify_many(
+        participants,
+        title="Incoming Call",
+        message=f"{initiator.get_full_name()} is calling you ({call_type.value.title()} call)",
+        notification_type=NotificationType.SYSTEM,
+        related_id=str(call.id)
+    )
+    return call, participants
@@ -1,29 +1,34 @@
 import json
 import random
 import numpy as np
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import re
 import os
-from nltk.corpus import stopwords
-
-# Download required NLTK data
-nltk.download('punkt')
-nltk.download('wordnet')
-nltk.download('omw-1.4')
-nltk.download('stopwords')
+from nltk_resources import word_tokenize, get_lemmatizer, get_stop_words
 
 class HealthChatbot:
-    def __init__(self):
-        self.lemmatizer = WordNetLemmatizer()
-        self.vectorizer = TfidfVectorizer()
+    # Intent matching strategies and their default score thresholds
+    MATCH_THRESHOLDS = {
+        'overlap': 0.3,  # shared-token ratio
+        'tfidf': 0.3     # cosine similarity of TF-IDF vectors
+    }
+
+    def __init__(self, match_mode='overlap', threshold=None, intents_file='data/intents.json'):
+        if match_mode not in self.MATCH_THRESHOLDS:
+            raise ValueError(f"Unknown match mode: {match_mode}")
+        self.match_mode = match_mode
+        self.threshold = self.MATCH_THRESHOLDS[match_mode] if threshold is None else threshold
+        self.intents_file = intents_file
+        self.lemmatizer = get_lemmatizer()
+        self.vectorizer = TfidfVectorizer(analyzer=self.preprocess_text)
+        self.pattern_vectors = None
         self.patterns = []
+        self.pattern_tokens = []
+        self.pattern_intents = []
         self.responses = []
         self.context = {}
-        self.stop_words = set(stopwords.words('english'))
+        self.stop_words = get_stop_words()
         
         # Health topic categories with more detailed responses
         self.categories = {
@@ -51,7 +56,7 @@ class HealthChatbot:
 
     def load_intents(self):
         try:
-            with open('data/intents.json', 'r', encoding='utf-8') as file:
+            with open(self.intents_file, 'r', encoding='utf-8') as file:
                 return json.load(file)['intents']
         except Exception as e:
             print(f"Error loading intents: {e}")
@@ -61,10 +66,13 @@ class HealthChatbot:
         for intent in self.intents:
             for pattern in intent['patterns']:
                 self.patterns.append(pattern)
+                self.pattern_tokens.append(self.preprocess_text(pattern))
+                self.pattern_intents.append(intent)
                 self.responses.append(intent['responses'])
         
-        # Create TF-IDF vectors
-        self.pattern_vectors = self.vectorizer.fit_transform(self.patterns)
+        # Create TF-IDF vectors over the same tokens the overlap scorer uses
+        if self.patterns:
+            self.pattern_vectors = self.vectorizer.fit_transform(self.patterns)
 
     def preprocess_text(self, text):
         # Tokenize
@@ -92,31 +100,48 @@ class HealthChatbot:
         if not user_input.strip():
             return "I didn't catch that. Could you please repeat your question?"
 
-        # Preprocess user input
+        if self.match_mode == 'tfidf':
+            best_match, highest_score = self.match_tfidf(user_input)
+        else:
+            best_match, highest_score = self.match_overlap(user_input)
+
+        # If we have a good match, return a random response from that intent
+        if best_match and highest_score > self.threshold:
+            return random.choice(best_match['responses'])
+        
+        # If no good match found, return a fallback response
+        return random.choice(self.fallback_responses)
+
+    def match_overlap(self, user_input):
+        """Score every pattern by the share of tokens it has in common with the input"""
         processed_input = self.preprocess_text(user_input)
+        input_words = set(processed_input)
         
         # Find matching intent
         best_match = None
         highest_score = 0
 
-        for intent in self.intents:
-            score = 0
-            for pattern in intent['patterns']:
-                pattern_tokens = self.preprocess_text(pattern)
-                # Calculate similarity score
-                common_words = set(processed_input) & set(pattern_tokens)
-                if common_words:
-                    score = len(common_words) / max(len(processed_input), len(pattern_tokens))
-                    if score > highest_score:
-                        highest_score = score
-                        best_match = intent
+        for intent, pattern_tokens in zip(self.pattern_intents, self.pattern_tokens):
+            # Calculate similarity score
+            common_words = input_words.intersection(pattern_tokens)
+            if common_words:
+                score = len(common_words) / max(len(processed_input), len(pattern_tokens))
+                if score > highest_score:
+                    highest_score = score
+                    best_match = intent
 
-        # If we have a good match, return a random response from that intent
-        if best_match and highest_score > 0.3:  # Threshold for matching
-            return random.choice(best_match['responses'])
-        
-        # If no good match found, return a fallback response
-        return random.choice(self.fallback_responses)
+        return best_match, highest_score
+
+    def match_tfidf(self, user_input):
+        """Score all patterns at once by cosine similarity of their TF-IDF vectors"""
+        if self.pattern_vectors is None:
+            return None, 0
+
+        input_vector = self.vectorizer.transform([user_input])
+        scores = cosine_similarity(input_vector, self.pattern_vectors)[0]
+        best_index = int(np.argmax(scores))
+
+        return self.pattern_intents[best_index], float(scores[best_index])
 
     def get_detailed_response(self, category, query):
         if category == 'diet':
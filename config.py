@@ -17,6 +17,9 @@ class Config:
     else:
         MONGODB_URI = f"mongodb://{MONGODB_HOST}:{MONGODB_PORT}/{MONGODB_DB}"
     
+    # In-memory mongomock database instead of a server, for local load tests (pip install mongomock)
+    MONGODB_MOCK = os.environ.get('MONGODB_MOCK', 'false').lower() in ['true', 'on', '1']
+    
     # Mail settings
     MAIL_SERVER = os.environ.get('MAIL_SERVER') or 'smtp.gmail.com'
     MAIL_PORT = int(os.environ.get('MAIL_PORT') or 587)
@@ -33,9 +36,17 @@ class Config:
     # Call settings
     MAX_CALL_DURATION = int(os.environ.get('MAX_CALL_DURATION') or 3600)  # 1 hour in seconds
     MAX_GROUP_PARTICIPANTS = int(os.environ.get('MAX_GROUP_PARTICIPANTS') or 10)
+    CALL_STATE_FLUSH_INTERVAL = float(os.environ.get('CALL_STATE_FLUSH_INTERVAL') or 1.0)  # max seconds before call signaling state is written
+    CALL_ROOM_IDLE_TIMEOUT = float(os.environ.get('CALL_ROOM_IDLE_TIMEOUT') or 300)  # seconds without signaling before a call room is dropped from memory
+    
+    # Socket.IO message queue shared by all workers, e.g. redis://localhost:6379/0; see socket_queue.py
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    SOCKETIO_CHANNEL = os.environ.get('SOCKETIO_CHANNEL') or 'flask-socketio'
     
     # Session settings
     PERMANENT_SESSION_LIFETIME = timedelta(hours=24)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 30)  # seconds a signed-in user is reused between requests
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE') or 1024)
     
     # File upload settings
     UPLOAD_FOLDER = 'uploads'
@@ -45,5 +56,23 @@ class Config:
     # Pagination
     POSTS_PER_PAGE = 10
     
+    # Admin statistics
+    REVENUE_CACHE_TTL = int(os.environ.get('REVENUE_CACHE_TTL') or 60)  # seconds revenue totals are reused
+    
+    # Audit log settings
+    AUDIT_WRITER_BATCH_SIZE = int(os.environ.get('AUDIT_WRITER_BATCH_SIZE') or 200)  # system logs per insert
+    AUDIT_WRITER_FLUSH_INTERVAL = float(os.environ.get('AUDIT_WRITER_FLUSH_INTERVAL') or 1.0)  # max seconds a log waits to be written
+    AUDIT_WRITER_MAX_QUEUE = int(os.environ.get('AUDIT_WRITER_MAX_QUEUE') or 10000)  # logs waiting at most, 0 for no limit
+    AUDIT_WRITER_OVERFLOW = os.environ.get('AUDIT_WRITER_OVERFLOW') or 'block'  # 'block' waits for room, 'drop' drops new logs when full
+    AUDIT_WRITER_BLOCK_TIMEOUT = float(os.environ.get('AUDIT_WRITER_BLOCK_TIMEOUT') or 0.5)  # max seconds a request waits for room
+    
     # Chat settings
     CHAT_HISTORY_LIMIT = 100
+    CHAT_CACHE_SIZE = int(os.environ.get('CHAT_CACHE_SIZE') or 1024)  # LRU entries of normalized input -> intent
+    CHAT_BATCH_LIMIT = int(os.environ.get('CHAT_BATCH_LIMIT') or 50)  # max messages per /api/chat/batch call
+    CHAT_RELOAD_INTERVAL = int(os.environ.get('CHAT_RELOAD_INTERVAL') or 0)  # seconds between intents file checks, how soon other workers see an upload; 0 disables the watcher
+    CHAT_WRITER_BATCH_SIZE = int(os.environ.get('CHAT_WRITER_BATCH_SIZE') or 100)  # chat messages per history insert
+    CHAT_WRITER_FLUSH_INTERVAL = float(os.environ.get('CHAT_WRITER_FLUSH_INTERVAL') or 1.0)  # max seconds a message waits to be written
+    CHAT_WRITER_MAX_QUEUE = int(os.environ.get('CHAT_WRITER_MAX_QUEUE') or 10000)  # messages waiting at most, 0 for no limit
+    CHAT_WRITER_OVERFLOW = os.environ.get('CHAT_WRITER_OVERFLOW') or 'block'  # 'block' waits for room, 'drop' drops new messages when full
+    CHAT_WRITER_BLOCK_TIMEOUT = float(os.environ.get('CHAT_WRITER_BLOCK_TIMEOUT') or 0.5)  # max seconds a request waits for room
@@ -0,0 +1,34 @@
+"""
+Helpers shared by the test scripts that need a database.
+
+Imported by the scripts rather than injected as fixtures, so each of them
+also runs on its own with python test_<name>.py.
+"""
+
+import sys
+import os
+from contextlib import contextmanager
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+@contextmanager
+def mock_database():
+    """Run against an in-memory mongomock database, restoring the configured connection after"""
+    import mongomock
+    from mongoengine import connect, disconnect
+    from config import Config
+    disconnect()
+    connect('healthcare_test', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+    try:
+        yield
+    finally:
+        disconnect()
+        connect(host=Config.MONGODB_URI)
+
+def make_user(username, first_name, last_name, role):
+    from models import User
+    user = User(username=username, email=f'{username}@example.com', first_name=first_name,
+                last_name=last_name, role=role)
+    user.set_password('password123')
+    return user.save()
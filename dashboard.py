@@ -3,7 +3,7 @@ from flask_login import login_required, current_user
 from models import (
     User, Appointment, Report, Message, Notification, UserRole, AppointmentStatus,
     Prescription, Payment, PaymentStatus, PaymentMethod, SystemLog, Analytics,
-    NotificationType, LogLevel, ChatMessage, Call, CallParticipant, CallType, CallStatus
+    NotificationType, LogLevel, ChatMessage, Call, CallParticipant, CallLog, CallType, CallStatus
 )
 from forms import (
     AppointmentForm, MessageForm, ReportForm, PrescriptionForm, PaymentForm,
@@ -15,6 +15,13 @@ import os
 import json
 from werkzeug.utils import secure_filename
 from mongoengine.queryset.visitor import Q
+from search import apply_search, sync_user_names
+from query_utils import attach_users, keyset_page
+from analytics import user_statistics, appointment_statistics, chat_volume
+from rollups import refresh_async, mark_stale
+import revenue
+from notifications import send_notifications, notify_many
+from call_setup import start_call
 
 dashboard = Blueprint('dashboard', __name__)
 
@@ -51,18 +58,34 @@ def patient_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def list_page(queryset, field='created_at'):
+    """The page of queryset asked for by the request's cursor, and the cursor of the next one"""
+    return keyset_page(queryset, request.args.get('cursor'), current_app.config['POSTS_PER_PAGE'], field)
+
+def notification_counts(notifications):
+    """Unread and per type counts of a notifications queryset, for the statistics cards"""
+    counts = {row['_id']: row['count'] for row in notifications.aggregate([
+        {'$group': {'_id': '$notification_type', 'count': {'$sum': 1}}}
+    ])}
+    counts['unread'] = notifications.filter(is_read=False).count()
+    return counts
+
 def log_action(action, details=None, log_level=LogLevel.INFO):
-    """Log system actions"""
+    """Log system actions, written in batches by the app's audit writer"""
     try:
         log = SystemLog(
-            user=current_user if current_user.is_authenticated else None,
+            user=current_user._get_current_object() if current_user.is_authenticated else None,
             action=action,
             details=details,
             ip_address=request.remote_addr,
             user_agent=request.headers.get('User-Agent', ''),
             log_level=log_level
         )
-        log.save()
+        writer = current_app.extensions.get('audit_writer')
+        if writer is None:
+            log.save()
+        else:
+            writer.submit(log)
     except Exception as e:
         current_app.logger.error(f"Failed to log action: {e}")
 
@@ -96,15 +119,15 @@ def admin_dashboard():
         total_appointments = Appointment.objects.count()
         pending_appointments = Appointment.objects(status=AppointmentStatus.SCHEDULED).count()
         total_payments = Payment.objects.count()
-        total_revenue = sum([p.amount for p in Payment.objects(status=PaymentStatus.PAID)])
+        total_revenue = revenue.total_revenue()
         
         # Recent activities
-        recent_appointments = Appointment.objects.order_by('-created_at').limit(5)
+        recent_appointments = attach_users(Appointment.objects.order_by('-created_at').limit(5))
         recent_users = User.objects.order_by('-created_at').limit(5)
-        recent_payments = Payment.objects.order_by('-created_at').limit(5)
+        recent_payments = attach_users(Payment.objects.order_by('-created_at').limit(5))
         
         # System health
-        system_logs = SystemLog.objects.order_by('-created_at').limit(10)
+        system_logs = attach_users(SystemLog.objects.order_by('-created_at').limit(10))
         
         log_action("Admin dashboard accessed")
         
@@ -135,19 +158,7 @@ def admin_manage_users():
         users = User.objects.order_by('-created_at')
 
         if search_query:
-            # Filter in Python for case-insensitive search
-            all_users = list(users)
-            filtered_users = []
-            search_lower = search_query.lower()
-
-            for user in all_users:
-                if (search_lower in user.first_name.lower() or
-                    search_lower in user.last_name.lower() or
-                    search_lower in user.email.lower() or
-                    search_lower in user.username.lower()):
-                    filtered_users.append(user)
-
-            users = filtered_users
+            users = apply_search(users, search_query)
 
         return render_template('admin/manage_users.html', users=users, search_query=search_query)
     except Exception as e:
@@ -366,29 +377,10 @@ def admin_manage_appointments():
         appointments = Appointment.objects.order_by('-appointment_date')
 
         if search_query:
-            # Filter in Python to handle referenced fields properly
-            all_appointments = list(appointments)
-            filtered_appointments = []
-            search_lower = search_query.lower()
+            # Patient and doctor names are part of the indexed search terms
+            appointments = apply_search(appointments, search_query)
 
-            for appt in all_appointments:
-                # Load referenced objects if not already loaded
-                if not hasattr(appt.patient, 'first_name'):
-                    appt.patient.reload()
-                if not hasattr(appt.doctor, 'first_name'):
-                    appt.doctor.reload()
-
-                # Check if search query matches any field
-                if (search_lower in appt.patient.first_name.lower() or
-                    search_lower in appt.patient.last_name.lower() or
-                    search_lower in appt.doctor.first_name.lower() or
-                    search_lower in appt.doctor.last_name.lower() or
-                    (appt.symptoms and search_lower in appt.symptoms.lower())):
-                    filtered_appointments.append(appt)
-
-            appointments = filtered_appointments
-
-        return render_template('admin/manage_appointments.html', appointments=appointments, search_query=search_query)
+        return render_template('admin/manage_appointments.html', appointments=attach_users(appointments), search_query=search_query)
     except Exception as e:
         flash(f'Error loading appointments: {str(e)}', 'error')
         return redirect(url_for('dashboard.admin_dashboard'))
@@ -403,30 +395,10 @@ def admin_manage_prescriptions():
         prescriptions = Prescription.objects.order_by('-created_at')
 
         if search_query:
-            # Filter in Python for case-insensitive search
-            all_prescriptions = list(prescriptions)
-            filtered_prescriptions = []
-            search_lower = search_query.lower()
-
-            for prescription in all_prescriptions:
-                # Load referenced objects if not already loaded
-                if not hasattr(prescription.patient, 'first_name'):
-                    prescription.patient.reload()
-                if not hasattr(prescription.doctor, 'first_name'):
-                    prescription.doctor.reload()
-
-                # Check if search query matches any field
-                if (search_lower in prescription.patient.first_name.lower() or
-                    search_lower in prescription.patient.last_name.lower() or
-                    search_lower in prescription.doctor.first_name.lower() or
-                    search_lower in prescription.doctor.last_name.lower() or
-                    (prescription.dosage_instructions and search_lower in prescription.dosage_instructions.lower()) or
-                    any(search_lower in med.get('name', '').lower() for med in prescription.medications)):
-                    filtered_prescriptions.append(prescription)
-
-            prescriptions = filtered_prescriptions
+            # Patient and doctor names are part of the indexed search terms
+            prescriptions = apply_search(prescriptions, search_query)
 
-        return render_template('admin/manage_prescriptions.html', prescriptions=prescriptions, search_query=search_query)
+        return render_template('admin/manage_prescriptions.html', prescriptions=attach_users(prescriptions), search_query=search_query)
     except Exception as e:
         flash(f'Error loading prescriptions: {str(e)}', 'error')
         return redirect(url_for('dashboard.admin_dashboard'))
@@ -441,30 +413,10 @@ def admin_manage_reports():
         reports = Report.objects.order_by('-created_at')
 
         if search_query:
-            # Filter in Python for case-insensitive search
-            all_reports = list(reports)
-            filtered_reports = []
-            search_lower = search_query.lower()
-
-            for report in all_reports:
-                # Load referenced objects if not already loaded
-                if not hasattr(report.user, 'first_name'):
-                    report.user.reload()
-                if not hasattr(report.created_by, 'first_name'):
-                    report.created_by.reload()
-
-                # Check if search query matches any field
-                if (search_lower in report.user.first_name.lower() or
-                    search_lower in report.user.last_name.lower() or
-                    search_lower in report.created_by.first_name.lower() or
-                    search_lower in report.created_by.last_name.lower() or
-                    search_lower in report.title.lower() or
-                    (report.description and search_lower in report.description.lower())):
-                    filtered_reports.append(report)
-
-            reports = filtered_reports
+            # Patient and author names are part of the indexed search terms
+            reports = apply_search(reports, search_query)
 
-        return render_template('admin/manage_reports.html', reports=reports, search_query=search_query)
+        return render_template('admin/manage_reports.html', reports=attach_users(reports), search_query=search_query)
     except Exception as e:
         flash(f'Error loading reports: {str(e)}', 'error')
         return redirect(url_for('dashboard.admin_dashboard'))
@@ -475,8 +427,8 @@ def admin_manage_reports():
 def admin_manage_payments():
     """Admin payment management"""
     try:
-        payments = Payment.objects.order_by('-created_at')
-        return render_template('admin/manage_payments.html', payments=payments)
+        payments, next_cursor = list_page(Payment.objects)
+        return render_template('admin/manage_payments.html', payments=attach_users(payments), next_cursor=next_cursor)
     except Exception as e:
         flash(f'Error loading payments: {str(e)}', 'error')
         return redirect(url_for('dashboard.admin_dashboard'))
@@ -492,46 +444,31 @@ def admin_analytics():
         week_ago = today - timedelta(days=7)
         month_ago = today - timedelta(days=30)
         
-        # Basic statistics
-        total_users = User.objects.count()
-        total_doctors = User.objects(role=UserRole.DOCTOR).count()
-        total_patients = User.objects(role=UserRole.PATIENT).count()
-        total_appointments = Appointment.objects.count()
-        total_revenue = sum([p.amount for p in Payment.objects(status=PaymentStatus.PAID)])
-        active_chats = ChatMessage.objects.count()
+        # Basic statistics from the daily rollups, brought up to date in the background
+        refresh_async()
+        users = user_statistics(today)
+        appointments = appointment_statistics(today)
+        total_users = users['total']
+        total_doctors = users['roles'].get(UserRole.DOCTOR.value, 0)
+        total_patients = users['roles'].get(UserRole.PATIENT.value, 0)
+        total_appointments = appointments['total']
+        # The same cached totals as the admin dashboard
+        total_revenue = revenue.total_revenue()
+        active_chats = chat_volume()
         
         # User growth data (last 6 months)
-        user_growth_data = []
-        user_growth_labels = []
-        for i in range(6):
-            month_start = today.replace(day=1) - timedelta(days=30*i)
-            month_end = month_start + timedelta(days=30)
-            if i == 0:
-                month_end = today
-            users_this_month = User.objects(created_at__gte=month_start, created_at__lt=month_end).count()
-            user_growth_data.append(users_this_month)
-            user_growth_labels.append(month_start.strftime('%b'))
-        
-        user_growth_data.reverse()
-        user_growth_labels.reverse()
+        user_growth_data = users['growth_data']
+        user_growth_labels = users['growth_labels']
         
         # Appointment trends (last 7 days)
-        appointment_trends_data = []
-        appointment_trends_labels = []
-        for i in range(7):
-            day = today - timedelta(days=6-i)
-            appointments_today = Appointment.objects(
-                appointment_date__gte=day,
-                appointment_date__lt=day + timedelta(days=1)
-            ).count()
-            appointment_trends_data.append(appointments_today)
-            appointment_trends_labels.append(day.strftime('%a'))
+        appointment_trends_data = appointments['trend_data']
+        appointment_trends_labels = appointments['trend_labels']
         
         # User distribution
         user_distribution = {
             'patients': total_patients,
             'doctors': total_doctors,
-            'admins': User.objects(role=UserRole.ADMIN).count()
+            'admins': users['roles'].get(UserRole.ADMIN.value, 0)
         }
         
         # Recent activity
@@ -549,7 +486,7 @@ def admin_analytics():
             })
         
         # Recent appointments
-        recent_appointments = Appointment.objects.order_by('-created_at').limit(5)
+        recent_appointments = attach_users(Appointment.objects.order_by('-created_at').limit(5))
         for appointment in recent_appointments:
             recent_activities.append({
                 'type': 'appointment',
@@ -560,7 +497,7 @@ def admin_analytics():
             })
         
         # Recent payments
-        recent_payments = Payment.objects.order_by('-created_at').limit(5)
+        recent_payments = attach_users(Payment.objects.order_by('-created_at').limit(5))
         for payment in recent_payments:
             recent_activities.append({
                 'type': 'payment',
@@ -587,7 +524,7 @@ def admin_analytics():
             'avg_response_time': '120ms',
             'uptime': '99.9%',
             'error_rate': '0.1%',
-            'active_sessions': User.objects.count()  # Simplified
+            'active_sessions': total_users  # Simplified
         }
         
         log_action("Admin analytics accessed")
@@ -618,8 +555,11 @@ def admin_analytics():
 def admin_notifications():
     """Admin notifications"""
     try:
-        notifications = Notification.objects.order_by('-created_at')
-        return render_template('admin/notifications.html', notifications=notifications)
+        notifications, next_cursor = list_page(Notification.objects)
+        return render_template('admin/notifications.html',
+                             notifications=attach_users(notifications),
+                             notification_counts=notification_counts(Notification.objects),
+                             next_cursor=next_cursor)
     except Exception as e:
         flash(f'Error loading notifications: {str(e)}', 'error')
         return redirect(url_for('dashboard.admin_dashboard'))
@@ -634,31 +574,10 @@ def admin_messages():
         messages = Message.objects.order_by('-created_at')
 
         if search_query:
-            # Filter in Python for case-insensitive search
-            all_messages = list(messages)
-            filtered_messages = []
-            search_lower = search_query.lower()
-
-            for message in all_messages:
-                # Load referenced objects if not already loaded
-                if not hasattr(message.sender, 'first_name'):
-                    message.sender.reload()
-                if not hasattr(message.recipient, 'first_name'):
-                    message.recipient.reload()
-
-                # Check if search query matches any field
-                sender_name = message.sender.get_full_name() if message.sender else 'System'
-                recipient_name = message.recipient.get_full_name() if message.recipient else 'All Users'
+            # Sender and recipient names are part of the indexed search terms
+            messages = apply_search(messages, search_query)
 
-                if (search_lower in sender_name.lower() or
-                    search_lower in recipient_name.lower() or
-                    search_lower in message.subject.lower() or
-                    search_lower in message.content.lower()):
-                    filtered_messages.append(message)
-
-            messages = filtered_messages
-
-        return render_template('admin/messages.html', messages=messages, search_query=search_query)
+        return render_template('admin/messages.html', messages=attach_users(messages), search_query=search_query)
     except Exception as e:
         flash(f'Error loading messages: {str(e)}', 'error')
         return redirect(url_for('dashboard.admin_dashboard'))
@@ -697,7 +616,7 @@ def admin_chats():
         # Apply search filter
         if search_query:
             # Filter in Python for case-insensitive search across user fields and message content
-            all_chats = list(query.order_by('-created_at'))
+            all_chats = attach_users(query.order_by('-created_at'))
             filtered_chats = []
             search_lower = search_query.lower()
 
@@ -719,7 +638,7 @@ def admin_chats():
 
             chat_messages = filtered_chats
         else:
-            chat_messages = list(query.order_by('-created_at'))
+            chat_messages = attach_users(query.order_by('-created_at'))
 
         # Compute statistics to avoid generator issues in template
         total_chats = len(chat_messages)
@@ -756,8 +675,8 @@ def admin_predictions():
 def admin_system_logs():
     """Admin system logs"""
     try:
-        logs = SystemLog.objects.order_by('-created_at')
-        return render_template('admin/system_logs.html', logs=logs)
+        logs, next_cursor = list_page(SystemLog.objects)
+        return render_template('admin/system_logs.html', logs=attach_users(logs), next_cursor=next_cursor)
     except Exception as e:
         flash(f'Error loading logs: {str(e)}', 'error')
         return redirect(url_for('dashboard.admin_dashboard'))
@@ -789,6 +708,7 @@ def admin_profile():
     try:
         form = ProfileUpdateForm(obj=current_user)
         if form.validate_on_submit():
+            previous_name = current_user.get_full_name()
             current_user.first_name = form.first_name.data
             current_user.last_name = form.last_name.data
             current_user.phone = form.phone.data
@@ -804,6 +724,8 @@ def admin_profile():
                 current_user.profile_picture = filepath
 
             current_user.save()
+            if current_user.get_full_name() != previous_name:
+                sync_user_names(current_user._get_current_object())
             log_action("Admin profile updated")
             flash('Profile updated successfully!', 'success')
             return redirect(url_for('dashboard.admin_profile'))
@@ -847,15 +769,6 @@ def doctor_dashboard():
         except:
             recent_patients = []
         
-        # Get unread messages count
-        try:
-            unread_messages = Message.objects(
-                recipient=current_user,
-                is_read=False
-            ).count()
-        except:
-            unread_messages = 0
-        
         # Get today's appointments count
         try:
             total_appointments_today = Appointment.objects(
@@ -871,7 +784,6 @@ def doctor_dashboard():
         return render_template('doctor/dashboard.html',
                              upcoming_appointments=upcoming_appointments,
                              recent_patients=recent_patients,
-                             unread_messages=unread_messages,
                              total_appointments_today=total_appointments_today,
                              today=today)
     except Exception as e:
@@ -885,12 +797,19 @@ def doctor_dashboard():
 def doctor_appointments():
     """Doctor appointments"""
     try:
-        appointments = Appointment.objects(doctor=current_user).order_by('-appointment_date')
-        return render_template('doctor/appointments.html', appointments=appointments)
+        appointments = Appointment.objects(doctor=current_user)
+        page, next_cursor = list_page(appointments, field='appointment_date')
+        status_counts = {row['_id']: row['count'] for row in appointments.aggregate([
+            {'$group': {'_id': '$status', 'count': {'$sum': 1}}}
+        ])}
+        return render_template('doctor/appointments.html',
+                             appointments=attach_users(page),
+                             status_counts=status_counts,
+                             next_cursor=next_cursor)
     except Exception as e:
         current_app.logger.error(f"Doctor appointments error: {str(e)}")
         flash(f'Error loading appointments: {str(e)}', 'error')
-        return render_template('doctor/appointments.html', appointments=[])
+        return render_template('doctor/appointments.html', appointments=[], status_counts={})
 
 @dashboard.route('/doctor/patients')
 @login_required
@@ -918,7 +837,7 @@ def doctor_prescriptions():
     """Doctor prescriptions"""
     try:
         prescriptions = Prescription.objects(doctor=current_user).order_by('-created_at')
-        return render_template('doctor/prescriptions.html', prescriptions=prescriptions)
+        return render_template('doctor/prescriptions.html', prescriptions=attach_users(prescriptions))
     except Exception as e:
         current_app.logger.error(f"Doctor prescriptions error: {str(e)}")
         flash(f'Error loading prescriptions: {str(e)}', 'error')
@@ -986,6 +905,7 @@ def doctor_profile():
     try:
         form = DoctorProfileForm(obj=current_user)
         if form.validate_on_submit():
+            previous_name = current_user.get_full_name()
             current_user.first_name = form.first_name.data
             current_user.last_name = form.last_name.data
             current_user.phone = form.phone.data
@@ -1007,6 +927,8 @@ def doctor_profile():
                 current_user.profile_picture = filepath
 
             current_user.save()
+            if current_user.get_full_name() != previous_name:
+                sync_user_names(current_user._get_current_object())
             log_action("Doctor profile updated")
             flash('Profile updated successfully!', 'success')
             return redirect(url_for('dashboard.doctor_profile'))
@@ -1023,7 +945,7 @@ def doctor_schedule():
     """Doctor schedule"""
     try:
         appointments = Appointment.objects(doctor=current_user).order_by('appointment_date')
-        return render_template('doctor/schedule.html', appointments=appointments)
+        return render_template('doctor/schedule.html', appointments=attach_users(appointments))
     except Exception as e:
         flash(f'Error loading schedule: {str(e)}', 'error')
         return redirect(url_for('dashboard.doctor_dashboard'))
@@ -1087,7 +1009,7 @@ def doctor_reports():
         # Get existing reports created by the doctor
         reports = Report.objects(created_by=current_user).order_by('-created_at')
 
-        return render_template('doctor/reports.html', reports=reports, form=form)
+        return render_template('doctor/reports.html', reports=attach_users(reports), form=form)
     except Exception as e:
         flash(f'Error loading reports: {str(e)}', 'error')
         return redirect(url_for('dashboard.doctor_dashboard'))
@@ -1098,8 +1020,8 @@ def doctor_reports():
 def doctor_messages():
     """Doctor messages"""
     try:
-        received_messages = Message.objects(recipient=current_user).order_by('-created_at')
-        sent_messages = Message.objects(sender=current_user).order_by('-created_at')
+        received_messages = attach_users(Message.objects(recipient=current_user).order_by('-created_at'))
+        sent_messages = attach_users(Message.objects(sender=current_user).order_by('-created_at'))
         return render_template('doctor/messages.html', 
                              received_messages=received_messages,
                              sent_messages=sent_messages)
@@ -1204,7 +1126,6 @@ def doctor_schedule_appointment(patient_id):
                 notification_type=NotificationType.APPOINTMENT,
                 related_id=str(appointment.id)
             )
-            patient_notification.save()
 
             doctor_notification = Notification(
                 user=current_user,
@@ -1213,7 +1134,7 @@ def doctor_schedule_appointment(patient_id):
                 notification_type=NotificationType.APPOINTMENT,
                 related_id=str(appointment.id)
             )
-            doctor_notification.save()
+            send_notifications([patient_notification, doctor_notification])
 
             log_action("Appointment scheduled", f"Appointment with {patient.get_full_name()}")
             flash('Appointment scheduled successfully!', 'success')
@@ -1280,18 +1201,12 @@ def patient_dashboard():
         recent_reports = Report.objects(user=current_user).order_by('-created_at').limit(5)
         recent_prescriptions = Prescription.objects(patient=current_user).order_by('-created_at').limit(5)
         
-        unread_messages = Message.objects(
-            recipient=current_user,
-            is_read=False
-        ).count()
-        
         log_action("Patient dashboard accessed")
         
         return render_template('patient/dashboard.html',
                              upcoming_appointments=upcoming_appointments,
                              recent_reports=recent_reports,
-                             recent_prescriptions=recent_prescriptions,
-                             unread_messages=unread_messages)
+                             recent_prescriptions=recent_prescriptions)
     except Exception as e:
         flash(f'Error loading dashboard: {str(e)}', 'error')
         return redirect(url_for('home'))
@@ -1332,7 +1247,6 @@ def patient_book_appointment():
                 notification_type=NotificationType.APPOINTMENT,
                 related_id=str(appointment.id)
             )
-            patient_notification.save()
             
             doctor_notification = Notification(
                 user=doctor,
@@ -1341,7 +1255,7 @@ def patient_book_appointment():
                 notification_type=NotificationType.APPOINTMENT,
                 related_id=str(appointment.id)
             )
-            doctor_notification.save()
+            send_notifications([patient_notification, doctor_notification])
             
             log_action("Appointment booked", f"Appointment with Dr. {doctor.get_full_name()}")
             flash('Appointment booked successfully!', 'success')
@@ -1360,7 +1274,7 @@ def patient_appointments():
     """Patient appointments"""
     try:
         appointments = Appointment.objects(patient=current_user).order_by('-appointment_date')
-        return render_template('patient/appointments.html', appointments=appointments)
+        return render_template('patient/appointments.html', appointments=attach_users(appointments))
     except Exception as e:
         current_app.logger.error(f"Patient appointments error: {str(e)}")
         flash(f'Error loading appointments: {str(e)}', 'error')
@@ -1390,13 +1304,8 @@ def patient_history():
 def patient_prescriptions():
     """Patient prescriptions"""
     try:
-        # Get prescriptions with proper reference loading
-        prescriptions = Prescription.objects(patient=current_user).order_by('-created_at')
-        
-        # Ensure doctor references are loaded
-        for prescription in prescriptions:
-            if prescription.doctor:
-                prescription.doctor.reload()
+        # Doctors of all prescriptions loaded with one query
+        prescriptions = attach_users(Prescription.objects(patient=current_user).order_by('-created_at'))
         
         return render_template('patient/prescriptions.html', prescriptions=prescriptions)
     except Exception as e:
@@ -1412,6 +1321,7 @@ def patient_profile():
     try:
         form = PatientProfileForm(obj=current_user)
         if form.validate_on_submit():
+            previous_name = current_user.get_full_name()
             current_user.first_name = form.first_name.data
             current_user.last_name = form.last_name.data
             current_user.phone = form.phone.data
@@ -1432,6 +1342,8 @@ def patient_profile():
                 current_user.profile_picture = filepath
 
             current_user.save()
+            if current_user.get_full_name() != previous_name:
+                sync_user_names(current_user._get_current_object())
             log_action("Patient profile updated")
             flash('Profile updated successfully!', 'success')
             return redirect(url_for('dashboard.patient_profile'))
@@ -1448,7 +1360,7 @@ def patient_reports():
     """Patient reports"""
     try:
         reports = Report.objects(user=current_user).order_by('-created_at')
-        return render_template('patient/reports.html', reports=reports)
+        return render_template('patient/reports.html', reports=attach_users(reports))
     except Exception as e:
         flash(f'Error loading reports: {str(e)}', 'error')
         return redirect(url_for('dashboard.patient_dashboard'))
@@ -1459,8 +1371,11 @@ def patient_reports():
 def patient_notifications():
     """Patient notifications"""
     try:
-        notifications = Notification.objects(user=current_user).order_by('-created_at')
-        return render_template('patient/notifications.html', notifications=notifications)
+        notifications, next_cursor = list_page(Notification.objects(user=current_user))
+        return render_template('patient/notifications.html',
+                             notifications=notifications,
+                             notification_counts=notification_counts(Notification.objects(user=current_user)),
+                             next_cursor=next_cursor)
     except Exception as e:
         flash(f'Error loading notifications: {str(e)}', 'error')
         return redirect(url_for('dashboard.patient_dashboard'))
@@ -1472,7 +1387,7 @@ def patient_payments():
     """Patient payments"""
     try:
         payments = Payment.objects(patient=current_user).order_by('-created_at')
-        return render_template('patient/payments.html', payments=payments)
+        return render_template('patient/payments.html', payments=attach_users(payments))
     except Exception as e:
         flash(f'Error loading payments: {str(e)}', 'error')
         return redirect(url_for('dashboard.patient_dashboard'))
@@ -1507,6 +1422,7 @@ def patient_new_payment():
                 payment_date=datetime.utcnow()
             )
             payment.save()
+            revenue.invalidate()
 
             # Create notification for doctor
             doctor_notification = Notification(
@@ -1516,7 +1432,6 @@ def patient_new_payment():
                 notification_type=NotificationType.PAYMENT,
                 related_id=str(payment.id)
             )
-            doctor_notification.save()
 
             # Create notification for patient
             patient_notification = Notification(
@@ -1526,7 +1441,7 @@ def patient_new_payment():
                 notification_type=NotificationType.PAYMENT,
                 related_id=str(payment.id)
             )
-            patient_notification.save()
+            send_notifications([doctor_notification, patient_notification])
 
             log_action("Payment created", f"Amount: {form.amount.data}")
             flash('Payment processed successfully!', 'success')
@@ -1543,8 +1458,8 @@ def patient_new_payment():
 def patient_messages():
     """Patient messages"""
     try:
-        received_messages = Message.objects(recipient=current_user).order_by('-created_at')
-        sent_messages = Message.objects(sender=current_user).order_by('-created_at')
+        received_messages = attach_users(Message.objects(recipient=current_user).order_by('-created_at'))
+        sent_messages = attach_users(Message.objects(sender=current_user).order_by('-created_at'))
         return render_template('patient/messages.html', 
                              received_messages=received_messages,
                              sent_messages=sent_messages)
@@ -1746,7 +1661,7 @@ def calls():
                 Q(initiator=current_user) | Q(participants=current_user)
             ).order_by('-created_at')
 
-        return render_template('dashboard/calls.html', calls=calls_list)
+        return render_template('dashboard/calls.html', calls=attach_users(calls_list))
     except Exception as e:
         flash(f'Error loading calls: {str(e)}', 'error')
         return redirect(url_for('dashboard.dashboard_home'))
@@ -1764,58 +1679,13 @@ def new_call():
                 flash('Please select at least one participant.', 'error')
                 return redirect(url_for('dashboard.new_call'))
 
-            # Create unique room ID
-            import uuid
-            room_id = str(uuid.uuid4())
-
-            # Get participant objects
-            participants = []
-            for pid in participants_ids:
-                user = User.objects(id=pid).first()
-                if user and user != current_user:
-                    participants.append(user)
-
-            if not participants:
-                flash('No valid participants selected.', 'error')
+            try:
+                call, participants = start_call(current_user._get_current_object(), participants_ids, call_type,
+                                                max_participants=current_app.config['MAX_GROUP_PARTICIPANTS'])
+            except ValueError as e:
+                flash(str(e), 'error')
                 return redirect(url_for('dashboard.new_call'))
 
-            # Create call
-            call = Call(
-                initiator=current_user,
-                participants=[current_user] + participants,
-                call_type=CallType(call_type),
-                room_id=room_id,
-                is_group_call=len(participants) > 1
-            )
-            call.save()
-
-            # Create call participants
-            for participant in participants:
-                call_participant = CallParticipant(
-                    call=call,
-                    user=participant
-                )
-                call_participant.save()
-
-            # Create call log
-            call_log = CallLog(
-                call=call,
-                user=current_user,
-                action="initiated"
-            )
-            call_log.save()
-
-            # Create notifications for participants
-            for participant in participants:
-                notification = Notification(
-                    user=participant,
-                    title="Incoming Call",
-                    message=f"{current_user.get_full_name()} is calling you ({call_type.title()} call)",
-                    notification_type=NotificationType.SYSTEM,
-                    related_id=str(call.id)
-                )
-                notification.save()
-
             log_action("Call initiated", f"Call type: {call_type}, Participants: {len(participants)}")
             flash('Call initiated successfully!', 'success')
             return redirect(url_for('dashboard.join_call', call_id=str(call.id)))
@@ -1914,6 +1784,10 @@ def end_call(call_id):
         if call.start_time:
             call.duration = int((call.end_time - call.start_time).total_seconds())
         call.save()
+        # The signaling handlers no longer need the room
+        call_registry = current_app.extensions.get('call_registry')
+        if call_registry is not None:
+            call_registry.forget(call.room_id)
 
         # Update all participants
         call_participants = CallParticipant.objects(call=call)
@@ -1930,17 +1804,14 @@ def end_call(call_id):
         )
         call_log.save()
 
-        # Create notifications for other participants
-        for participant in call.participants:
-            if participant != current_user:
-                notification = Notification(
-                    user=participant,
-                    title="Call Ended",
-                    message=f"The call with {current_user.get_full_name()} has ended",
-                    notification_type=NotificationType.SYSTEM,
-                    related_id=str(call.id)
-                )
-                notification.save()
+        # Notify the other participants with one insert
+        notify_many(
+            [participant for participant in call.participants if participant != current_user],
+            title="Call Ended",
+            message=f"The call with {current_user.get_full_name()} has ended",
+            notification_type=NotificationType.SYSTEM,
+            related_id=str(call.id)
+        )
 
         log_action("Call ended", f"Call ID: {call_id}")
         flash('Call ended successfully!', 'success')
@@ -2043,7 +1914,7 @@ def appointments():
         else:
             appointments_list = Appointment.objects(patient=current_user).order_by('-appointment_date')
         
-        return render_template('dashboard/appointments.html', appointments=appointments_list)
+        return render_template('dashboard/appointments.html', appointments=attach_users(appointments_list))
     except Exception as e:
         flash(f'Error loading appointments: {str(e)}', 'error')
         return redirect(url_for('dashboard.dashboard_home'))
@@ -2156,7 +2027,7 @@ def reports():
         else:
             reports_list = Report.objects(user=current_user).order_by('-created_at')
         
-        return render_template('dashboard/reports.html', reports=reports_list)
+        return render_template('dashboard/reports.html', reports=attach_users(reports_list))
     except Exception as e:
         flash(f'Error loading reports: {str(e)}', 'error')
         return redirect(url_for('dashboard.dashboard_home'))
@@ -2247,8 +2118,8 @@ def view_report(report_id):
 def messages():
     """Common messages route"""
     try:
-        received_messages = Message.objects(recipient=current_user).order_by('-created_at')
-        sent_messages = Message.objects(sender=current_user).order_by('-created_at')
+        received_messages = attach_users(Message.objects(recipient=current_user).order_by('-created_at'))
+        sent_messages = attach_users(Message.objects(sender=current_user).order_by('-created_at'))
 
         # Get all users except current user for call participants
         all_users = User.objects(id__ne=current_user.id, is_active=True)
@@ -2380,6 +2251,8 @@ def delete_user(user_id):
         
         user_name = user.get_full_name()
         user.delete()
+        # Nothing is left for the rollup to find, recount the day the user registered
+        mark_stale('new_users', user.created_at)
         
         log_action("User deleted", f"User {user_name} deleted")
         flash(f'User {user_name} has been deleted.', 'success')
@@ -2408,6 +2281,55 @@ def mark_notification_read():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@dashboard.route('/api/notifications')
+@login_required
+def list_notifications():
+    """Current user's notifications, newest first, one page per call"""
+    try:
+        notifications, next_cursor = list_page(Notification.objects(user=current_user))
+        return jsonify({
+            'success': True,
+            'notifications': [{
+                'id': str(n.id),
+                'title': n.title,
+                'message': n.message,
+                'type': n.notification_type.value,
+                'is_read': n.is_read,
+                'related_id': n.related_id,
+                'created_at': n.created_at.isoformat() if n.created_at else None
+            } for n in notifications],
+            'next_cursor': next_cursor
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
+@dashboard.route('/api/logs')
+@login_required
+@admin_required
+def list_system_logs():
+    """System logs, newest first, one page per call"""
+    try:
+        logs, next_cursor = list_page(SystemLog.objects.no_dereference())
+        return jsonify({
+            'success': True,
+            'logs': [{
+                'id': str(log.id),
+                'action': log.action,
+                'details': log.details,
+                'level': log.log_level.value if log.log_level else None,
+                'user_id': str(log.user.id) if log.user else None,
+                'ip_address': log.ip_address,
+                'created_at': log.created_at.isoformat() if log.created_at else None
+            } for log in logs],
+            'next_cursor': next_cursor
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 @dashboard.route('/api/search', methods=['POST'])
 @login_required
 def search():
@@ -2474,58 +2396,12 @@ def create_call():
         if not participants_ids:
             return jsonify({'success': False, 'error': 'No participants specified'}), 400
 
-        # Create unique room ID
-        import uuid
-        room_id = str(uuid.uuid4())
-
-        # Get participant objects
-        participants = []
-        for pid in participants_ids:
-            user = User.objects(id=pid).first()
-            if user and user != current_user:
-                participants.append(user)
-
-        if not participants:
-            return jsonify({'success': False, 'error': 'No valid participants found'}), 400
-
-        # Create call
-        call = Call(
-            initiator=current_user,
-            participants=[current_user] + participants,
-            call_type=CallType(call_type),
-            room_id=room_id,
-            is_group_call=len(participants) > 1,
-            call_title=call_title,
-            notes=notes
-        )
-        call.save()
-
-        # Create call participants
-        for participant in participants:
-            call_participant = CallParticipant(
-                call=call,
-                user=participant
-            )
-            call_participant.save()
-
-        # Create call log
-        call_log = CallLog(
-            call=call,
-            user=current_user,
-            action="initiated"
-        )
-        call_log.save()
-
-        # Create notifications for participants
-        for participant in participants:
-            notification = Notification(
-                user=participant,
-                title="Incoming Call",
-                message=f"{current_user.get_full_name()} is calling you ({call_type.title()} call)",
-                notification_type=NotificationType.SYSTEM,
-                related_id=str(call.id)
-            )
-            notification.save()
+        try:
+            call, participants = start_call(current_user._get_current_object(), participants_ids, call_type,
+                                            max_participants=current_app.config['MAX_GROUP_PARTICIPANTS'],
+                                            call_title=call_title, notes=notes)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
 
         log_action("Call initiated", f"Call type: {call_type}, Participants: {len(participants)}")
 
@@ -2533,7 +2409,7 @@ def create_call():
             'success': True,
             'call': {
                 'id': str(call.id),
-                'room_id': room_id,
+                'room_id': call.room_id,
                 'call_type': call_type,
                 'participants': [{'id': str(p.id), 'name': p.get_full_name()} for p in participants]
             }
@@ -2687,6 +2563,21 @@ def toggle_prescription_status():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+@dashboard.route('/api/revenue')
+@login_required
+@admin_required
+def revenue_totals():
+    """Paid revenue overall and per doctor, month and currency"""
+    try:
+        summary = revenue.revenue_summary()
+        doctors = User.objects(id__in=list(summary['by_doctor'])).only('first_name', 'last_name')
+        names = {str(doctor.id): doctor.get_full_name() for doctor in doctors}
+        by_doctor = [{'id': doctor_id, 'name': names.get(doctor_id), 'total': total}
+                     for doctor_id, total in summary['by_doctor'].items()]
+        return jsonify({'success': True, 'revenue': dict(summary, by_doctor=by_doctor)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)})
+
 @dashboard.route('/api/welcome')
 def welcome():
     """Welcome API endpoint that logs requests and returns a welcome message"""
@@ -0,0 +1,90 @@
+def char_masks(word):
+    """Bit masks of the positions of each character in word"""
+    masks = {}
+    for position, char in enumerate(word):
+        masks[char] = masks.get(char, 0) | (1 << position)
+    return masks
+
+def levenshtein(a, b, masks=None):
+    """Number of single-character insertions, deletions and substitutions turning a into b.
+
+    Uses Myers' bit-parallel algorithm, which handles a whole column of
+    the dynamic programming table per character of b. Pass char_masks(a)
+    when comparing the same a against many words.
+    """
+    if not a or not b:
+        return len(a) + len(b)
+    if masks is None:
+        masks = char_masks(a)
+    full = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    positive, negative, distance = full, 0, len(a)
+    for char in b:
+        equal = masks.get(char, 0)
+        vertical = equal | negative
+        horizontal = (((equal & positive) + positive) ^ positive) | equal
+        horizontal_positive = negative | (~(horizontal | positive) & full)
+        horizontal_negative = positive & horizontal
+        if horizontal_positive & last:
+            distance += 1
+        elif horizontal_negative & last:
+            distance -= 1
+        horizontal_positive = ((horizontal_positive << 1) | 1) & full
+        horizontal_negative = (horizontal_negative << 1) & full
+        positive = horizontal_negative | (~(vertical | horizontal_positive) & full)
+        negative = horizontal_positive & vertical
+    return distance
+
+class BKTree:
+    """Burkhard-Keller tree over a set of words under Levenshtein distance.
+
+    Each child edge is labelled with its distance to the parent word. By the
+    triangle inequality a search within distance k of a query at distance d
+    from a node only has to follow edges labelled d - k to d + k, so a
+    lookup visits a small part of the tree instead of every word.
+    """
+
+    def __init__(self, words=()):
+        self.root = None
+        self.size = 0
+        for word in words:
+            self.add(word)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, word):
+        if self.root is None:
+            self.root = (word, {})
+            self.size = 1
+            return
+        masks = char_masks(word)
+        node = self.root
+        while True:
+            distance = levenshtein(word, node[0], masks)
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (word, {})
+                self.size += 1
+                return
+            node = child
+
+    def search(self, word, max_distance):
+        """Return (distance, word) pairs within max_distance of word, nearest first"""
+        if self.root is None:
+            return []
+        masks = char_masks(word)
+        matches = []
+        stack = [self.root]
+        while stack:
+            candidate, children = stack.pop()
+            distance = levenshtein(word, candidate, masks)
+            if distance <= max_distance:
+                matches.append((distance, candidate))
+            for edge in range(max(1, distance - max_distance), distance + max_distance + 1):
+                child = children.get(edge)
+                if child is not None:
+                    stack.append(child)
+        return sorted(matches)
@@ -0,0 +1,46 @@
+"""
+The signed-in user, cached between requests.
+
+Flask-Login loads the user of the session on every request. The raw
+document of each signed-in user is kept here for USER_CACHE_TTL seconds, and
+every request builds its own User from it, so the role checks and pages of a
+busy session do not each go to MongoDB. current_user stays a User document:
+it can be compared, saved and used in queries as before.
+
+Saving or deleting a User drops its entry in this process; other processes
+see the change within USER_CACHE_TTL seconds.
+"""
+
+from mongoengine import signals
+
+from cache import TTLCache
+from config import Config
+from models import User
+
+# Maintained by clean() on save, and never read from current_user
+UNCACHED_FIELDS = ('search_terms',)
+
+_cache = TTLCache(maxsize=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL)
+
+def load_user(user_id):
+    """The User of user_id, None if there is none"""
+    son = _cache.get(str(user_id))
+    if son is None:
+        son = User.objects(id=user_id).exclude(*UNCACHED_FIELDS).as_pymongo().first()
+        if son is None:
+            return None
+        _cache.put(str(user_id), son)
+    # A document of its own per request: changes to it never reach the cache
+    return User._from_son(son, created=False)
+
+def invalidate(user_id):
+    _cache.pop(str(user_id))
+
+def cache_stats():
+    return _cache.stats()
+
+def _user_changed(sender, document, **kwargs):
+    invalidate(document.id)
+
+signals.post_save.connect(_user_changed, sender=User)
+signals.post_delete.connect(_user_changed, sender=User)
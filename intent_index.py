@@ -0,0 +1,414 @@
+from collections import Counter
+from difflib import SequenceMatcher
+import itertools
+import json
+import logging
+import mmap
+import os
+import struct
+import numpy as np
+from cache import LRUCache
+from fuzzy import BKTree
+
+logger = logging.getLogger(__name__)
+
+def align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+class StringTable:
+    """Sequence of strings stored as one UTF-8 byte array plus offsets.
+
+    Strings are decoded on access, so a table over a memory-mapped file
+    keeps nothing but the mapped pages.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+        # Views of the same memory, indexing them is much cheaper than indexing numpy arrays
+        self._offsets = memoryview(offsets)
+        self._data = memoryview(data)
+
+    @classmethod
+    def pack(cls, strings):
+        encoded = [string.encode('utf-8') for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(item) for item in encoded], dtype=np.int64)
+        return cls(offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position):
+        return self.encoded(position).decode('utf-8')
+
+    def __iter__(self):
+        return (self[position] for position in range(len(self)))
+
+    def encoded(self, position):
+        return self._data[self._offsets[position]:self._offsets[position + 1]].tobytes()
+
+class SortedStringTable(StringTable):
+    """StringTable of sorted strings, looked up by bisection.
+
+    UTF-8 preserves the order of code points, so the encoded strings are
+    compared without decoding them.
+    """
+
+    def position(self, string):
+        """Return the position of string, or None if the table does not contain it"""
+        key = string.encode('utf-8')
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.encoded(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self.encoded(low) == key:
+            return low
+        return None
+
+    def __contains__(self, string):
+        return self.position(string) is not None
+
+class IntentIndex:
+    """Precompiled lookup structure over the patterns of an intents file.
+
+    Every pattern is normalized once at build time and the whole index is
+    kept as flat numpy arrays: string tables for the vocabulary, normalized
+    patterns, tags and responses, and a TF-IDF weighted token x pattern
+    matrix in compressed sparse column form. Its columns double as an
+    inverted index: patterns sharing a token with a query are scored first,
+    best TF-IDF candidates first. The character counts of every pattern give
+    the quick_ratio() bound of SequenceMatcher for all patterns at once, so
+    the remaining ones are only scored when they could still win, and the
+    result is the one of a full scan.
+
+    save() writes the arrays to a single file that load() memory-maps, so
+    every worker on a host shares the same pages of a precompiled index.
+    """
+
+    MAGIC = b'HCINTIDX'
+    FORMAT_VERSION = 2
+
+    # Number of queries whose candidates are expanded in one sparse product
+    BATCH_CHUNK_SIZE = 1024
+
+    # Edit distance tolerated when correcting a token of at least this many characters
+    CORRECTION_DISTANCES = ((6, 2), (4, 1))
+    CORRECTION_CACHE_SIZE = 4096
+
+    _generations = itertools.count(1)
+
+    def __init__(self, intents, tokenize, **metadata):
+        intents = intents['intents']
+        tags, responses, intent_responses = [], [], [0]
+        pattern_texts, pattern_intents, pattern_tokens = [], [], []
+
+        for intent_id, intent in enumerate(intents):
+            tags.append(intent['tag'])
+            responses.extend(intent['responses'])
+            intent_responses.append(len(responses))
+            for pattern in intent['patterns']:
+                tokens = tokenize(pattern)
+                pattern_texts.append(' '.join(tokens).lower())
+                pattern_intents.append(intent_id)
+                pattern_tokens.append(Counter(tokens))
+
+        vocabulary = sorted(set().union(*pattern_tokens))
+        alphabet = sorted(set(''.join(pattern_texts)))
+        letters = {letter: column for column, letter in enumerate(alphabet)}
+        # Row per pattern, column per character, stored flat
+        pattern_chars = np.zeros((len(pattern_texts), len(alphabet)), dtype=np.uint16)
+        for pattern_id, text in enumerate(pattern_texts):
+            for letter, count in Counter(text).items():
+                pattern_chars[pattern_id, letters[letter]] = count
+
+        columns = {token: column for column, token in enumerate(vocabulary)}
+
+        # Smoothed inverse document frequency, as computed by scikit-learn
+        document_frequency = np.zeros(len(vocabulary))
+        for counts in pattern_tokens:
+            document_frequency[[columns[token] for token in counts]] += 1
+        idf = np.log((1 + len(pattern_texts)) / (1 + document_frequency)) + 1
+
+        # Columns are filled in pattern order, so each one is a sorted posting list
+        column_entries = [[] for _ in vocabulary]
+        for pattern_id, counts in enumerate(pattern_tokens):
+            weights = {columns[token]: count * idf[columns[token]] for token, count in counts.items()}
+            norm = np.sqrt(sum(weight * weight for weight in weights.values()))
+            for column, weight in weights.items():
+                column_entries[column].append((pattern_id, weight / norm))
+
+        token_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        token_offsets[1:] = np.cumsum([len(entries) for entries in column_entries], dtype=np.int64)
+        entries = [entry for column in column_entries for entry in column]
+
+        arrays = {
+            'pattern_intents': np.asarray(pattern_intents, dtype=np.int32),
+            'intent_responses': np.asarray(intent_responses, dtype=np.int64),
+            'idf': idf.astype(np.float32),
+            'token_offsets': token_offsets,
+            'token_patterns': np.asarray([entry[0] for entry in entries], dtype=np.int32),
+            'token_weights': np.asarray([entry[1] for entry in entries], dtype=np.float32),
+            'alphabet': np.asarray([ord(letter) for letter in alphabet], dtype=np.int32),
+            'pattern_chars': pattern_chars.ravel(),
+            'pattern_lengths': np.asarray([len(text) for text in pattern_texts], dtype=np.int32)
+        }
+        for name, strings in (('vocabulary', vocabulary), ('pattern_texts', pattern_texts),
+                              ('tags', tags), ('responses', responses)):
+            table = StringTable.pack(strings)
+            arrays[f'{name}_offsets'] = table.offsets
+            arrays[f'{name}_data'] = table.data
+
+        self.attach(arrays, metadata)
+        # Matches built in this process return the original intent dicts
+        self._intents.update(enumerate(intents))
+        logger.info(f"Intent index built: {len(self.tags)} intents, "
+                    f"{len(self)} patterns, {len(self.vocabulary)} tokens")
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map an index written by save()"""
+        with open(path, 'rb') as f:
+            header, data_start = cls.read_header(f, path)
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        arrays = {}
+        for name, spec in header['arrays'].items():
+            if spec['count']:
+                arrays[name] = np.frombuffer(buffer, dtype=spec['dtype'], count=spec['count'],
+                                             offset=data_start + spec['offset'])
+            else:
+                arrays[name] = np.empty(0, dtype=spec['dtype'])
+
+        index = cls.__new__(cls)
+        index.attach(arrays, header['metadata'])
+        index.source = path
+        logger.info(f"Intent index mapped from {path}: {len(index.tags)} intents, "
+                    f"{len(index)} patterns, {len(index.vocabulary)} tokens")
+        return index
+
+    @classmethod
+    def read_metadata(cls, path):
+        """Return the metadata stored with a saved index without mapping it"""
+        with open(path, 'rb') as f:
+            return cls.read_header(f, path)[0]['metadata']
+
+    @classmethod
+    def read_header(cls, f, path):
+        prefix = f.read(len(cls.MAGIC) + 8)
+        if len(prefix) < len(cls.MAGIC) + 8 or prefix[:len(cls.MAGIC)] != cls.MAGIC:
+            raise ValueError(f"{path} is not an intent index file")
+        header_length, = struct.unpack('<Q', prefix[len(cls.MAGIC):])
+        header = json.loads(f.read(header_length).decode('utf-8'))
+        if header.get('version') != cls.FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported format version {header.get('version')}")
+        return header, align(len(prefix) + header_length)
+
+    def save(self, path, **metadata):
+        """Write the index to path, merging metadata into what it was built with.
+
+        Layout: magic, little-endian uint64 header length, JSON header, then
+        every array 8-byte aligned. The file is replaced atomically so
+        running workers never map a partially written index.
+        """
+        self.metadata = {**self.metadata, **metadata}
+        header = {'version': self.FORMAT_VERSION, 'metadata': self.metadata, 'arrays': {}}
+        offset = 0
+        for name, array in self.arrays.items():
+            header['arrays'][name] = {'dtype': array.dtype.str, 'offset': offset, 'count': int(array.size)}
+            offset = align(offset + array.nbytes)
+        header_bytes = json.dumps(header).encode('utf-8')
+        data_start = align(len(self.MAGIC) + 8 + len(header_bytes))
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in self.arrays.items():
+                f.seek(data_start + header['arrays'][name]['offset'])
+                f.write(np.ascontiguousarray(array).tobytes())
+        os.replace(temp_path, path)
+        logger.info(f"Intent index saved to {path}")
+
+    def attach(self, arrays, metadata):
+        # Unique per built or loaded index, lets caches tell results of different indexes apart
+        self.generation = next(self._generations)
+        self.arrays = arrays
+        self.metadata = dict(metadata)
+        # Path of the file the index is mapped from, None when built in this process
+        self.source = None
+        self.pattern_intents = arrays['pattern_intents']
+        self.intent_responses = arrays['intent_responses']
+        self.idf = arrays['idf']
+        self.token_offsets = arrays['token_offsets']
+        self.token_patterns = arrays['token_patterns']
+        self.token_weights = arrays['token_weights']
+        self.alphabet = arrays['alphabet']
+        self.pattern_lengths = arrays['pattern_lengths']
+        self.pattern_chars = arrays['pattern_chars'].reshape(len(self.pattern_lengths), len(self.alphabet))
+        self.tags = StringTable(arrays['tags_offsets'], arrays['tags_data'])
+        self.responses = StringTable(arrays['responses_offsets'], arrays['responses_data'])
+        # Looked up in place, a mapped index is shared by the workers rather than copied into each
+        self.vocabulary = SortedStringTable(arrays['vocabulary_offsets'], arrays['vocabulary_data'])
+        self.pattern_texts = StringTable(arrays['pattern_texts_offsets'], arrays['pattern_texts_data'])
+        self._intents = {}
+        # Built on the first correction, most queries only use known words
+        self._spelling = None
+        self._corrections = LRUCache(self.CORRECTION_CACHE_SIZE)
+
+    def __len__(self):
+        return len(self.pattern_lengths)
+
+    def intent(self, intent_id):
+        """Return the intent as a dict with its tag and responses, decoded on first use"""
+        intent = self._intents.get(intent_id)
+        if intent is None:
+            start, end = self.intent_responses[intent_id], self.intent_responses[intent_id + 1]
+            intent = self._intents.setdefault(intent_id, {
+                'tag': self.tags[intent_id],
+                'responses': [self.responses[position] for position in range(start, end)]
+            })
+        return intent
+
+    def correct(self, tokens):
+        """Replace unknown tokens by the nearest vocabulary word within a few edits.
+
+        Short tokens are left alone, they are too ambiguous to correct. Among
+        equally close words the one used by the most patterns wins.
+        """
+        return [token if token in self.vocabulary else self.correct_token(token) for token in tokens]
+
+    def correct_token(self, token):
+        max_distance = next((distance for length, distance in self.CORRECTION_DISTANCES
+                             if len(token) >= length), 0)
+        if not max_distance or not token.isalpha():
+            return token
+        corrected = self._corrections.get(token)
+        if corrected is None:
+            if self._spelling is None:
+                self._spelling = BKTree(self.vocabulary)
+            matches = self._spelling.search(token, max_distance)
+            if matches:
+                nearest = matches[0][0]
+                corrected = min((word for distance, word in matches if distance == nearest),
+                                key=lambda word: (-self.document_frequency(word), word))
+            else:
+                corrected = token
+            self._corrections.put(token, corrected)
+        return corrected
+
+    def document_frequency(self, token):
+        column = self.vocabulary.position(token)
+        return int(self.token_offsets[column + 1] - self.token_offsets[column])
+
+    def candidates(self, tokens):
+        """Return the ids of patterns sharing a token with the query, best TF-IDF score first"""
+        return self.ranked_candidates([tokens])[0]
+
+    def ranked_candidates(self, token_lists):
+        """Return the candidate pattern ids of every query, best TF-IDF score first.
+
+        The columns of all query tokens are expanded and summed per
+        (query, pattern) pair with a few numpy operations, i.e. one sparse
+        product of the query matrix with the pattern matrix.
+        """
+        rows, columns = [], []
+        for row, tokens in enumerate(token_lists):
+            for column in set(map(self.vocabulary.position, tokens)) - {None}:
+                rows.append(row)
+                columns.append(column)
+        if not rows:
+            return [[] for _ in token_lists]
+
+        rows = np.asarray(rows, dtype=np.int64)
+        columns = np.asarray(columns, dtype=np.int64)
+        starts = self.token_offsets[columns]
+        lengths = self.token_offsets[columns + 1] - starts
+        positions = np.arange(lengths.sum()) + np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+
+        pattern_count = len(self)
+        keys, pairs = np.unique(np.repeat(rows, lengths) * pattern_count + self.token_patterns[positions],
+                                return_inverse=True)
+        scores = np.bincount(pairs, weights=self.token_weights[positions] * np.repeat(self.idf[columns], lengths))
+        key_rows, key_patterns = np.divmod(keys, pattern_count)
+
+        order = np.lexsort((key_patterns, -scores, key_rows))
+        ranked = key_patterns[order]
+        bounds = np.searchsorted(key_rows[order], np.arange(len(token_lists) + 1))
+        return [ranked[bounds[row]:bounds[row + 1]].tolist() for row in range(len(token_lists))]
+
+    def quick_ratios(self, query):
+        """Return SequenceMatcher(None, query, pattern).quick_ratio() of every pattern.
+
+        It is an upper bound of ratio(), computed from the character counts
+        of the patterns without building a matcher per pattern.
+        """
+        counts = np.zeros(len(self.alphabet), dtype=np.uint16)
+        for letter, count in Counter(query).items():
+            column = np.searchsorted(self.alphabet, ord(letter))
+            if column < len(self.alphabet) and self.alphabet[column] == ord(letter):
+                counts[column] = count
+        matches = np.minimum(self.pattern_chars, counts).sum(axis=1, dtype=np.int64)
+        lengths = self.pattern_lengths + len(query)
+        return np.divide(2.0 * matches, lengths, out=np.ones(len(lengths)), where=lengths > 0)
+
+    def best_match(self, tokens, threshold=0.5):
+        """Return the (intent, score) pair of the most similar pattern above threshold"""
+        return self._score(tokens, self.candidates(tokens), threshold)
+
+    def best_matches(self, token_lists, threshold=0.5):
+        """Return the (intent, score) pairs for many queries at once"""
+        results = []
+        for start in range(0, len(token_lists), self.BATCH_CHUNK_SIZE):
+            chunk = token_lists[start:start + self.BATCH_CHUNK_SIZE]
+            for tokens, candidate_ids in zip(chunk, self.ranked_candidates(chunk)):
+                results.append(self._score(tokens, candidate_ids, threshold))
+        return results
+
+    @staticmethod
+    def _beats(score, pattern_id, best_id, best_score):
+        # Ties resolve to the earliest pattern, whatever order candidates are visited in
+        return score > best_score or (score == best_score and best_id is not None and pattern_id < best_id)
+
+    def _score(self, tokens, candidate_ids, threshold):
+        """Run SequenceMatcher over the patterns that could beat the best score so far.
+
+        Visiting the best TF-IDF candidates first finds a good match early,
+        after which the quick_ratio() bounds skip most of the rest. Patterns
+        sharing no token with the query come last, by decreasing bound, as
+        their characters may still match best.
+        """
+        query = ' '.join(tokens).lower()
+        best_id = None
+        best_score = threshold
+
+        bounds = self.quick_ratios(query)
+        for pattern_id in candidate_ids:
+            if self._beats(bounds[pattern_id], pattern_id, best_id, best_score):
+                score = SequenceMatcher(None, query, self.pattern_texts[pattern_id]).ratio()
+                if self._beats(score, pattern_id, best_id, best_score):
+                    best_score = score
+                    best_id = pattern_id
+
+        scored = set(candidate_ids)
+        rest = np.flatnonzero(bounds >= best_score)
+        for pattern_id in rest[np.argsort(-bounds[rest], kind='stable')].tolist():
+            if bounds[pattern_id] < best_score:
+                break
+            if pattern_id in scored or not self._beats(bounds[pattern_id], pattern_id, best_id, best_score):
+                continue
+            score = SequenceMatcher(None, query, self.pattern_texts[pattern_id]).ratio()
+            if self._beats(score, pattern_id, best_id, best_score):
+                best_score = score
+                best_id = pattern_id
+
+        if best_id is None:
+            return None, 0.0
+        return self.intent(int(self.pattern_intents[best_id])), best_score
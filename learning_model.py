@@ -1,20 +1,67 @@
+import hashlib
 import json
-import nltk
-from nltk.stem import WordNetLemmatizer
 import random
 import os
 from difflib import SequenceMatcher
 import logging
+import threading
+import time
+from datetime import datetime
+from intent_index import IntentIndex
+from cache import LRUCache
+import nltk_resources
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+INTENTS_PATH = 'model/intents.json'
+ARTIFACT_PATH = 'model/intent_index.bin'
+
+def hash_file(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def file_signature(path):
+    """Return (mtime, size) of a file, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def validate_intents(intents):
+    """Raise ValueError unless intents has the structure of an intents file"""
+    if not isinstance(intents, dict) or not isinstance(intents.get('intents'), list):
+        raise ValueError("Intents must be an object with an 'intents' list")
+    for position, intent in enumerate(intents['intents']):
+        if not isinstance(intent, dict) or not isinstance(intent.get('tag'), str):
+            raise ValueError(f"Intent {position} must be an object with a 'tag'")
+        for field in ('patterns', 'responses'):
+            values = intent.get(field)
+            if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+                raise ValueError(f"Intent '{intent['tag']}' must have a list of {field}")
+
 class HealthChatbotModel:
-    def __init__(self):
-        self.lemmatizer = WordNetLemmatizer()
+    def __init__(self, cache_size=1024):
+        self._lemmatizer = None
         self.intents = None
+        self.index = None
+        self._index_lock = threading.Lock()
         self.ignore_words = ['?', '!', '.', ',']
+        # Maps normalized inputs to their matched (intent, score)
+        self.response_cache = LRUCache(cache_size)
+        # Serializes reloads; requests keep using the current index meanwhile
+        self._reload_lock = threading.Lock()
+        self._watched_signature = None
+        self.reload_stats = {
+            'reloads': 0,
+            'failures': 0,
+            'in_progress': False,
+            'last_reload_at': None,
+            'last_duration_seconds': None,
+            'last_error': None
+        }
         logger.info("HealthChatbotModel initialized")
         
     def load_data(self, intents_file):
@@ -22,6 +69,7 @@ class HealthChatbotModel:
             logger.info(f"Loading intents from {intents_file}")
             with open(intents_file, 'r', encoding='utf-8') as file:
                 self.intents = json.load(file)
+            self.reset_index()
             logger.info("Intents loaded successfully")
         except Exception as e:
             logger.error(f"Error loading intents: {str(e)}")
@@ -39,83 +87,320 @@ class HealthChatbotModel:
         # No training needed for pattern matching
         pass
         
-    def save_model(self, model_path='model/health_chatbot_model.h5'):
+    def save_model(self, model_path=ARTIFACT_PATH, intents_path=INTENTS_PATH):
+        """Save the intents and a precompiled, memory-mappable index of them"""
         try:
-            # Save intents data
-            if not os.path.exists('model'):
-                os.makedirs('model')
-            with open('model/intents.json', 'w', encoding='utf-8') as f:
+            if self.intents is None:
+                # Mapped from an artifact, the intents file on disk is already current
+                self.load_data(intents_path)
+            directory = os.path.dirname(intents_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Replaced atomically, watchers in other workers never read a partial file
+            temp_path = f"{intents_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
                 json.dump(self.intents, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, intents_path)
+            self.save_artifact(model_path, intents_path)
             logger.info("Model saved successfully")
         except Exception as e:
             logger.error(f"Error saving model: {str(e)}")
             raise
+
+    def save_artifact(self, model_path=ARTIFACT_PATH, intents_path=INTENTS_PATH):
+        """Precompile the intents file into the memory-mappable index, leaving the file untouched"""
+        with open(intents_path, 'rb') as f:
+            content = f.read()
+        intents = json.loads(content)
+        validate_intents(intents)
+        # The index of the loaded intents is reused when they are the file's
+        index = self.ensure_index() if intents == self.intents else IntentIndex(intents, self.tokenize)
+        index.save(model_path, content_hash=hashlib.sha256(content).hexdigest(),
+                   tokenizer=nltk_resources.fingerprint())
+        logger.info(f"Intent index of {intents_path} saved to {model_path}")
             
-    def load_saved_model(self, model_path='model/health_chatbot_model.h5'):
+    def load_saved_model(self, model_path=ARTIFACT_PATH, intents_path=INTENTS_PATH):
         try:
-            intents_path = 'model/intents.json'
-            if os.path.exists(intents_path):
-                logger.info(f"Loading saved model from {intents_path}")
-                with open(intents_path, 'r', encoding='utf-8') as f:
-                    self.intents = json.load(f)
-                logger.info("Saved model loaded successfully")
+            if not os.path.exists(intents_path):
+                logger.info("No saved model found")
+                return False
+            index = self.open_artifact(model_path, intents_path)
+            if index is not None:
+                self.intents = None
+                self.index = index
+                self.response_cache.clear()
                 return True
-            logger.info("No saved model found")
-            return False
+            logger.info(f"Loading saved model from {intents_path}")
+            with open(intents_path, 'r', encoding='utf-8') as f:
+                self.intents = json.load(f)
+            self.reset_index()
+            logger.info("Saved model loaded successfully")
+            return True
         except Exception as e:
             logger.error(f"Error loading saved model: {str(e)}")
             return False
-        
+
+    def open_artifact(self, model_path, intents_path):
+        """Memory-map the precompiled index if it was built from the current intents file.
+
+        The artifact is stale when the intents file changed since it was
+        saved, or when it was normalized with different NLTK resources than
+        are installed now; nltk itself is not imported to tell. Returns None
+        so the caller falls back to JSON.
+        """
+        if not os.path.exists(model_path):
+            return None
+        try:
+            metadata = IntentIndex.read_metadata(model_path)
+            if metadata.get('content_hash') != hash_file(intents_path) or \
+                    metadata.get('tokenizer') != nltk_resources.fingerprint():
+                logger.warning(f"{model_path} is stale, falling back to {intents_path}. "
+                               f"Run 'python learning_model.py' to rebuild it.")
+                return None
+            return IntentIndex.load(model_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load {model_path}: {str(e)}")
+            return None
+
+    def reload(self, intents=None, model_path=ARTIFACT_PATH, intents_path=INTENTS_PATH):
+        """Build a new index to the side and swap it in.
+
+        With intents given they are validated, indexed and then saved, which
+        lets watchers in other workers pick them up. Otherwise the intents
+        file is re-read, or its artifact mapped when current. Requests keep
+        being answered from the old index until the new one is complete;
+        the swap itself is a single reference assignment.
+        """
+        with self._reload_lock:
+            self._reload(intents, model_path, intents_path)
+
+    def reload_async(self, intents=None, model_path=ARTIFACT_PATH, intents_path=INTENTS_PATH):
+        """Run reload() on a background thread; returns False if one is already running"""
+        if not self._reload_lock.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                self._reload(intents, model_path, intents_path)
+            except Exception:
+                pass  # Logged and counted by _reload
+            finally:
+                self._reload_lock.release()
+
+        threading.Thread(target=run, name='intents-reload', daemon=True).start()
+        return True
+
+    def _reload(self, intents, model_path, intents_path):
+        started = time.perf_counter()
+        self.reload_stats['in_progress'] = True
+        try:
+            uploaded = intents is not None
+            if uploaded:
+                validate_intents(intents)
+                index = IntentIndex(intents, self.tokenize)
+            else:
+                # Taken before reading, a change made meanwhile triggers another reload
+                signature = file_signature(intents_path)
+                index = self.open_artifact(model_path, intents_path)
+                if index is None:
+                    with open(intents_path, 'r', encoding='utf-8') as f:
+                        intents = json.load(f)
+                    validate_intents(intents)
+                    index = IntentIndex(intents, self.tokenize)
+
+            # The index carries its own intents, so readers are consistent either way
+            self.intents = intents
+            self.index = index
+            self.response_cache.clear()
+
+            if uploaded:
+                self.save_model(model_path, intents_path)
+                signature = file_signature(intents_path)
+            self._watched_signature = signature
+        except Exception as e:
+            self.reload_stats['failures'] += 1
+            self.reload_stats['last_error'] = str(e)
+            logger.error(f"Error reloading intents: {str(e)}")
+            raise
+        else:
+            duration = time.perf_counter() - started
+            self.reload_stats['reloads'] += 1
+            self.reload_stats['last_reload_at'] = datetime.utcnow().isoformat()
+            self.reload_stats['last_duration_seconds'] = round(duration, 4)
+            self.reload_stats['last_error'] = None
+            logger.info(f"Intents reloaded in {duration:.3f}s: {len(index.tags)} intents, {len(index)} patterns")
+        finally:
+            self.reload_stats['in_progress'] = False
+
+    def watch(self, interval, model_path=ARTIFACT_PATH, intents_path=INTENTS_PATH):
+        """Poll the intents file from a daemon thread and reload whenever it changes"""
+        if self._watched_signature is None:
+            self._watched_signature = file_signature(intents_path)
+
+        def poll():
+            while True:
+                time.sleep(interval)
+                signature = file_signature(intents_path)
+                if signature is None or signature == self._watched_signature:
+                    continue
+                logger.info(f"{intents_path} changed, reloading intents")
+                try:
+                    self.reload(model_path=model_path, intents_path=intents_path)
+                except Exception:
+                    pass  # Logged by _reload, retried on the next change
+
+        thread = threading.Thread(target=poll, name='intents-watcher', daemon=True)
+        thread.start()
+        return thread
+
+    def metrics(self):
+        """Return index size, reload timings and response cache counters"""
+        index = self.index
+        return {
+            'index': None if index is None else {
+                'generation': index.generation,
+                'intents': len(index.tags),
+                'patterns': len(index),
+                'tokens': len(index.vocabulary),
+                'bytes': sum(int(array.nbytes) for array in index.arrays.values()),
+                'source': index.source or 'built'
+            },
+            'reload': dict(self.reload_stats),
+            'cache': self.response_cache.stats()
+        }
+
+    def tokenize(self, sentence):
+        words = nltk_resources.word_tokenize(sentence)
+        return [self.lemmatizer.lemmatize(word.lower()) for word in words if word not in self.ignore_words]
+
+    @property
+    def lemmatizer(self):
+        if self._lemmatizer is None:
+            self._lemmatizer = nltk_resources.get_lemmatizer()
+        return self._lemmatizer
+
+    def compile_index(self):
+        self.index = IntentIndex(self.intents, self.tokenize)
+        self.response_cache.clear()
+        return self.index
+
+    def reset_index(self):
+        """Drop the compiled index after the intents changed.
+
+        The index is rebuilt on first use, so loading intents at startup does
+        not pull in the NLTK tokenizer and lemmatizer.
+        """
+        self.index = None
+        self.response_cache.clear()
+
+    def ensure_index(self):
+        index = self.index
+        if index is None:
+            with self._index_lock:
+                index = self.index
+                if index is None:
+                    index = self.compile_index()
+        return index
+
+    def cache_key(self, index, tokens):
+        """Normalized form of an input: its lemmatized, spelling-corrected tokens.
+
+        These are exactly what the index scores, so inputs sharing a key
+        always share their match. Stop words are kept, "not" and "no" among
+        them change the meaning.
+        """
+        return index.generation, tuple(tokens)
+
+    def match(self, tokens):
+        """Return the matched (intent, score), consulting the response cache first.
+
+        Misspelled tokens are corrected first, so "fevr" and "fever" share
+        a cache entry and the same match.
+        """
+        index = self.ensure_index()
+        tokens = index.correct(tokens)
+        key = self.cache_key(index, tokens)
+        cached = self.response_cache.get(key)
+        if cached is None:
+            cached = index.best_match(tokens)
+            self.response_cache.put(key, cached)
+        return cached
+
+    @property
+    def loaded(self):
+        return self.index is not None or bool(self.intents)
+
     def get_similarity_score(self, str1, str2):
         return SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
         
     def get_response(self, sentence):
         try:
-            if not self.intents:
+            if not self.loaded:
                 logger.error("Intents not loaded")
                 return "I'm not properly initialized. Please try again later."
             
             logger.info(f"Processing message: {sentence}")
             
-            # Tokenize and lemmatize the input sentence
-            sentence_words = nltk.word_tokenize(sentence)
-            sentence_words = [self.lemmatizer.lemmatize(word.lower()) for word in sentence_words if word not in self.ignore_words]
-            
-            best_match = None
-            highest_similarity = 0.5  # Minimum similarity threshold
-            
-            # Find the best matching intent
-            for intent in self.intents['intents']:
-                for pattern in intent['patterns']:
-                    pattern_words = nltk.word_tokenize(pattern)
-                    pattern_words = [self.lemmatizer.lemmatize(word.lower()) for word in pattern_words if word not in self.ignore_words]
-                    
-                    # Calculate similarity between input and pattern
-                    similarity = self.get_similarity_score(' '.join(sentence_words), ' '.join(pattern_words))
-                    
-                    if similarity > highest_similarity:
-                        highest_similarity = similarity
-                        best_match = intent
+            # Score the normalized input against the precompiled pattern index
+            best_match, _ = self.match(self.tokenize(sentence))
             
             if best_match:
-                response = random.choice(best_match['responses'])
                 logger.info(f"Found response for intent: {best_match['tag']}")
-                return response
             else:
                 logger.info("No matching intent found")
-                return "I'm not sure I understand. Could you please rephrase that?"
+            return self.choose_response(best_match)
                 
         except Exception as e:
             logger.error(f"Error getting response: {str(e)}")
             return "I apologize, but I encountered an error. Please try again."
 
+    def get_responses(self, sentences):
+        """Answer many messages in one pass over the pattern index"""
+        try:
+            if not self.loaded:
+                logger.error("Intents not loaded")
+                return ["I'm not properly initialized. Please try again later."] * len(sentences)
+
+            logger.info(f"Processing batch of {len(sentences)} messages")
+
+            # Messages that normalize to the same tokens are scored only once,
+            # and only those missing from the response cache are scored at all
+            index = self.ensure_index()
+            sentence_tokens = [tuple(index.correct(self.tokenize(sentence))) for sentence in sentences]
+            matches = {}
+            misses = []
+            for tokens in dict.fromkeys(sentence_tokens):
+                cached = self.response_cache.get(self.cache_key(index, tokens))
+                if cached is None:
+                    misses.append(tokens)
+                else:
+                    matches[tokens] = cached
+
+            for tokens, result in zip(misses, index.best_matches(misses)):
+                matches[tokens] = result
+                self.response_cache.put(self.cache_key(index, tokens), result)
+
+            return [self.choose_response(matches[tokens][0]) for tokens in sentence_tokens]
+
+        except Exception as e:
+            logger.error(f"Error getting batch responses: {str(e)}")
+            return ["I apologize, but I encountered an error. Please try again."] * len(sentences)
+
+    def choose_response(self, intent):
+        if intent:
+            return random.choice(intent['responses'])
+        return "I'm not sure I understand. Could you please rephrase that?"
+
 # Example usage
 if __name__ == "__main__":
-    # Download required NLTK data
-    nltk.download('punkt')
-    nltk.download('wordnet')
+    # Install required NLTK data
+    nltk_resources.download_all()
     
-    # Initialize the chatbot
+    # Rebuild the index of the live intents, which uploads and edits change;
+    # the bundled ones only seed them on the first run
     chatbot = HealthChatbotModel()
-    chatbot.load_data('data/intents.json')
-    chatbot.save_model() 
\ No newline at end of file
+    if os.path.exists(INTENTS_PATH):
+        chatbot.save_artifact()
+    else:
+        chatbot.load_data('data/intents.json')
+        chatbot.save_model() 
\ No newline at end of file
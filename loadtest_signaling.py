@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Load test for the WebRTC call signaling over Socket.IO.
+
+Starts the app on a local port with an in-memory mongomock database, signs
+in simulated doctors and patients, has each doctor create a call through
+/dashboard/api/create_call, then connects one Socket.IO client per
+participant. Every client joins its call and replays offer, answer,
+ice_candidate and mute_audio/unmute_audio traffic; the other participants
+of the room must receive each event. Reports the fan-out latency, from emit
+to receipt, and the deliveries that never arrived:
+
+    python loadtest_signaling.py --calls 50 --participants 3 --rounds 20
+    python loadtest_signaling.py --workers 3 --json signaling.json
+
+Needs mongomock and the Socket.IO client: python-socketio with requests,
+and websocket-client to use WebSocket rather than long-polling.
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_chatbot import percentile
+
+# Event a client emits -> event the rest of its room receives
+RELAYED = {
+    'offer': 'offer',
+    'answer': 'answer',
+    'ice_candidate': 'ice_candidate',
+    'mute_audio': 'user_muted',
+    'unmute_audio': 'user_unmuted'
+}
+
+class Deliveries:
+    """Emit times per sender and event, matched to their receipts in order"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sent = {}
+        self._received = {}
+        self.latencies = []
+        self.expected = 0
+        self.unexpected = 0
+
+    def sent(self, sender_id, event, receivers):
+        with self._lock:
+            self._sent.setdefault((sender_id, RELAYED[event]), []).append(time.perf_counter())
+            self.expected += receivers
+
+    def received(self, receiver_id, sender_id, event):
+        now = time.perf_counter()
+        with self._lock:
+            # A room relays the events of a sender in the order they were emitted
+            key = (receiver_id, sender_id, event)
+            position = self._received.get(key, 0)
+            self._received[key] = position + 1
+            times = self._sent.get((sender_id, event), [])
+            if position < len(times):
+                self.latencies.append(now - times[position])
+            else:
+                self.unexpected += 1
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def serve(app, port):
+    """Serve app from a daemon thread; its base URL once it answers"""
+    import requests
+    thread = threading.Thread(
+        target=app.extensions['socketio'].run, args=(app,),
+        kwargs={'host': '127.0.0.1', 'port': port, 'use_reloader': False,
+                'log_output': False, 'allow_unsafe_werkzeug': True},
+        name=f'signaling-server-{port}', daemon=True
+    )
+    thread.start()
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            requests.get(f'{base_url}/about', timeout=1)
+            return base_url
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server did not start on port {port}")
+
+def start_servers(workers=1, port=None):
+    """Import the app on mongomock and serve workers instances of it; [(app, base URL)]
+
+    Several workers share the in-process local:// message queue, as the
+    workers of a deployment share SOCKETIO_MESSAGE_QUEUE.
+    """
+    os.environ['MONGODB_MOCK'] = 'true'
+    if workers > 1:
+        os.environ['SOCKETIO_MESSAGE_QUEUE'] = 'local://'
+    import app as application
+
+    apps = [application.app] + [application.create_app()[0] for _ in range(workers - 1)]
+    ports = [port + n for n in range(workers)] if port else [free_port() for _ in range(workers)]
+    return [(app, serve(app, port)) for app, port in zip(apps, ports)]
+
+def session_cookie(app, user):
+    """The Flask-Login session cookie of user, as signing in would set it"""
+    serializer = app.session_interface.get_signing_serializer(app)
+    return app.config['SESSION_COOKIE_NAME'], serializer.dumps({'_user_id': str(user.id), '_fresh': True})
+
+def create_users(calls, participants):
+    from models import User, UserRole
+    groups = []
+    for n in range(calls):
+        members = []
+        for m in range(participants):
+            role = UserRole.DOCTOR if m == 0 else UserRole.PATIENT
+            user = User(username=f'load{n}_{m}', email=f'load{n}_{m}@example.com', first_name='Load',
+                        last_name=f'User{n}x{m}', role=role)
+            user.set_password('password123')
+            members.append(user.save())
+        groups.append(members)
+    return groups
+
+def create_call(app, base_url, members):
+    """Room id of a new call of members, created by the first of them over HTTP"""
+    import requests
+    name, value = session_cookie(app, members[0])
+    response = requests.post(f'{base_url}/dashboard/api/create_call', cookies={name: value},
+                             json={'participants': [str(user.id) for user in members[1:]], 'call_type': 'video'},
+                             timeout=30)
+    result = response.json()
+    if not result.get('success'):
+        raise RuntimeError(f"create_call failed: {result.get('error')}")
+    return result['call']['room_id']
+
+def connect_client(app, base_url, user, deliveries):
+    import socketio
+    from engineio.payload import Payload
+    # Without websocket-client the clients long-poll, and a poll can return many queued events
+    Payload.max_decode_packets = 100000
+    client = socketio.Client(reconnection=False, logger=False, engineio_logger=False)
+    user_id = str(user.id)
+
+    def on(event):
+        client.on(event, lambda data: deliveries.received(user_id, data.get('user_id'), event))
+
+    for event in set(RELAYED.values()):
+        on(event)
+    name, value = session_cookie(app, user)
+    client.connect(base_url, headers={'Cookie': f'{name}={value}'}, wait_timeout=30)
+    return client
+
+def replay(client, user_id, room_id, receivers, rounds, ice, interval, deliveries):
+    """Signaling of one participant: per round an offer, an answer, ICE candidates and a mute toggle"""
+    def emit(event, **data):
+        deliveries.sent(user_id, event, receivers)
+        client.emit(event, dict(data, room_id=room_id, user_id=user_id))
+
+    for n in range(rounds):
+        emit('offer', offer={'type': 'offer', 'sdp': f'v=0 offer {n}'})
+        emit('answer', answer={'type': 'answer', 'sdp': f'v=0 answer {n}'})
+        for k in range(ice):
+            emit('ice_candidate', candidate={'candidate': f'candidate:{n} {k} udp', 'sdpMid': '0'})
+        emit('mute_audio')
+        emit('unmute_audio')
+        if interval:
+            time.sleep(interval)
+
+def run(calls=10, participants=2, rounds=10, ice=3, interval=0.0, drain=5.0, workers=1, port=None):
+    servers = start_servers(workers, port)
+    groups = create_users(calls, participants)
+    started = time.perf_counter()
+    rooms = [create_call(*servers[n % workers], members) for n, members in enumerate(groups)]
+    setup_seconds = time.perf_counter() - started
+
+    deliveries = Deliveries()
+    # The participants of a call are spread over the workers
+    clients = [[connect_client(*servers[(n + m) % workers], user, deliveries) for m, user in enumerate(members)]
+               for n, members in enumerate(groups)]
+    # Every participant in its room before anybody signals: call() waits for the handler to have run
+    for members, room_clients, room_id in zip(groups, clients, rooms):
+        for user, client in zip(members, room_clients):
+            client.call('join_call', {'room_id': room_id, 'user_id': str(user.id)}, timeout=30)
+
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=replay, args=(client, str(user.id), room_id, participants - 1,
+                                              rounds, ice, interval, deliveries))
+        for members, room_clients, room_id in zip(groups, clients, rooms)
+        for user, client in zip(members, room_clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sent_seconds = time.perf_counter() - started
+
+    deadline = time.monotonic() + drain
+    while len(deliveries.latencies) < deliveries.expected and time.monotonic() < deadline:
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    for room_clients in clients:
+        for client in room_clients:
+            client.disconnect()
+
+    latencies = [seconds * 1000 for seconds in deliveries.latencies] or [0.0]
+    events = deliveries.expected // max(1, participants - 1)
+    updates_written = 0
+    for app, _ in servers:
+        app.extensions['call_registry'].flush()
+        updates_written += app.extensions['call_registry'].updates_written
+    return {
+        'workers': workers,
+        'calls': calls,
+        'clients': calls * participants,
+        'events_sent': events,
+        'deliveries_expected': deliveries.expected,
+        'deliveries_received': len(deliveries.latencies),
+        'dropped': deliveries.expected - len(deliveries.latencies),
+        'unexpected': deliveries.unexpected,
+        'call_setup_ms': round(setup_seconds * 1000 / calls, 3),
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'max_ms': round(max(latencies), 3),
+        'emit_rate': round(events / sent_seconds, 1) if sent_seconds else 0.0,
+        'delivery_rate': round(len(deliveries.latencies) / elapsed, 1) if elapsed else 0.0,
+        'participant_updates_written': updates_written
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the Socket.IO call signaling")
+    parser.add_argument('--calls', type=int, default=10, help="concurrent calls")
+    parser.add_argument('--participants', type=int, default=2, help="clients per call, the doctor calling included")
+    parser.add_argument('--rounds', type=int, default=10, help="offer/answer/ICE/mute rounds per client")
+    parser.add_argument('--ice', type=int, default=3, help="ICE candidates per round")
+    parser.add_argument('--interval', type=float, default=0.0, help="seconds each client pauses between rounds")
+    parser.add_argument('--drain', type=float, default=5.0, help="seconds to wait for deliveries after the last emit")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="app instances sharing a local message queue, a call's clients spread over them")
+    parser.add_argument('--port', type=int, help="first port to serve on, free ones by default")
+    parser.add_argument('--json', help="write the results to this file")
+    args = parser.parse_args(argv)
+    if args.participants < 2:
+        parser.error("--participants must be at least 2")
+
+    logging.disable(logging.WARNING)
+    try:
+        import websocket  # noqa: F401
+    except ImportError:
+        logging.disable(logging.ERROR)
+        print("ℹ️ websocket-client is not installed, the clients long-poll: expect higher latencies")
+    print(f"📞 {args.calls} calls of {args.participants} clients, {args.rounds} rounds each, {args.workers} worker(s)")
+    result = run(args.calls, args.participants, args.rounds, args.ice, args.interval, args.drain,
+                 args.workers, args.port)
+
+    print(f"{'sent':>8} {'expected':>9} {'received':>9} {'dropped':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9} {'emits/s':>9}")
+    print(f"{result['events_sent']:>8} {result['deliveries_expected']:>9} {result['deliveries_received']:>9} "
+          f"{result['dropped']:>8} {result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9} "
+          f"{result['max_ms']:>9} {result['emit_rate']:>9}")
+    print(f"(call setup {result['call_setup_ms']} ms per create_call; "
+          f"{result['participant_updates_written']} participant updates written)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"✅ Results written to {args.json}")
+    if result['dropped']:
+        print(f"❌ {result['dropped']} deliveries never arrived")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,8 @@
 from flask import Flask, render_template, request, jsonify
 from chatbot import HealthChatbot
-import nltk
 import os
 import json
 
-# Download required NLTK data
-nltk.download('punkt')
-nltk.download('wordnet')
-
 app = Flask(__name__)
 chatbot = HealthChatbot()
 
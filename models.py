@@ -1,8 +1,10 @@
-from mongoengine import Document, StringField, EmailField, DateTimeField, BooleanField, IntField, ReferenceField, ListField, EnumField, DateField, FloatField, DictField
+from mongoengine import signals, Document, StringField, EmailField, DateTimeField, BooleanField, IntField, ReferenceField, ListField, EnumField, DateField, FloatField, DictField
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
 import enum
+from search import index_terms, terms_outdated, user_names
+import unread
 
 class UserRole(enum.Enum):
     ADMIN = "admin"
@@ -103,15 +105,29 @@ class User(Document, UserMixin):
     employee_id = StringField(max_length=50)
     last_login = DateTimeField()
     
+    # Maintained by clean(), see search.py
+    search_terms = ListField(StringField())
+    
     meta = {
         'collection': 'users',
         'indexes': [
             'username',
             'email',
-            'role'
+            'role',
+            'search_terms',
+            'created_at',
+            'updated_at'
         ]
     }
     
+    def build_search_terms(self):
+        return index_terms(names=[self.first_name, self.last_name, self.email, self.username])
+    
+    def clean(self):
+        self.search_terms = self.build_search_terms()
+        # Rollups recount the registration days of users changed since their last run, e.g. in role
+        self.updated_at = datetime.utcnow()
+    
     def set_password(self, password):
         self.password_hash = generate_password_hash(password)
     
@@ -149,15 +165,31 @@ class Appointment(Document):
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
     
+    # Maintained by clean(), see search.py
+    search_terms = ListField(StringField())
+    
     meta = {
         'collection': 'appointments',
         'indexes': [
             'patient',
             'doctor',
             'appointment_date',
-            'status'
+            'status',
+            'search_terms',
+            'updated_at',
+            # Keyset pages, see query_utils.keyset_page
+            ('doctor', '-appointment_date', '-id')
         ]
     }
+    
+    def build_search_terms(self):
+        return index_terms(names=user_names(self, 'patient', 'doctor'), texts=[self.symptoms])
+    
+    def clean(self):
+        if terms_outdated(self, 'patient', 'doctor', 'symptoms'):
+            self.search_terms = self.build_search_terms()
+        # Rollups recompute the days of appointments changed since their last run
+        self.updated_at = datetime.utcnow()
 
 class Prescription(Document):
     patient = ReferenceField(User, required=True)
@@ -171,14 +203,27 @@ class Prescription(Document):
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
     
+    # Maintained by clean(), see search.py
+    search_terms = ListField(StringField())
+    
     meta = {
         'collection': 'prescriptions',
         'indexes': [
             'patient',
             'doctor',
-            'is_active'
+            'is_active',
+            'search_terms'
         ]
     }
+    
+    def build_search_terms(self):
+        medication_names = [medication.get('name', '') for medication in self.medications or []]
+        return index_terms(names=user_names(self, 'patient', 'doctor') + medication_names,
+                           texts=[self.dosage_instructions])
+    
+    def clean(self):
+        if terms_outdated(self, 'patient', 'doctor', 'medications', 'dosage_instructions'):
+            self.search_terms = self.build_search_terms()
 
 class Report(Document):
     user = ReferenceField(User, required=True)
@@ -191,14 +236,26 @@ class Report(Document):
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
     
+    # Maintained by clean(), see search.py
+    search_terms = ListField(StringField())
+    
     meta = {
         'collection': 'reports',
         'indexes': [
             'user',
             'created_by',
-            'report_type'
+            'report_type',
+            'search_terms'
         ]
     }
+    
+    def build_search_terms(self):
+        return index_terms(names=user_names(self, 'user', 'created_by') + [self.title],
+                           texts=[self.description])
+    
+    def clean(self):
+        if terms_outdated(self, 'user', 'created_by', 'title', 'description'):
+            self.search_terms = self.build_search_terms()
 
 class Message(Document):
     sender = ReferenceField(User, required=True)
@@ -208,18 +265,29 @@ class Message(Document):
     is_read = BooleanField(default=False)
     created_at = DateTimeField(default=datetime.utcnow)
     
+    # Maintained by clean(), see search.py
+    search_terms = ListField(StringField())
+    
     meta = {
         'collection': 'messages',
         'indexes': [
             'sender',
             'recipient',
-            'is_read'
+            'is_read',
+            'search_terms'
         ]
     }
     
+    def build_search_terms(self):
+        return index_terms(names=user_names(self, 'sender', 'recipient'),
+                           texts=[self.subject, self.content])
+    
+    def clean(self):
+        if terms_outdated(self, 'sender', 'recipient', 'subject', 'content'):
+            self.search_terms = self.build_search_terms()
+    
     def mark_as_read(self):
-        self.is_read = True
-        self.save()
+        unread.mark_read(self)
 
 class ChatMessage(Document):
     user = ReferenceField(User, required=True)
@@ -249,13 +317,15 @@ class Notification(Document):
         'indexes': [
             'user',
             'is_read',
-            'notification_type'
+            'notification_type',
+            # Keyset pages, see query_utils.keyset_page
+            ('-created_at', '-id'),
+            ('user', '-created_at', '-id')
         ]
     }
     
     def mark_as_read(self):
-        self.is_read = True
-        self.save()
+        unread.mark_read(self)
 
 class Payment(Document):
     patient = ReferenceField(User, required=True)
@@ -277,9 +347,16 @@ class Payment(Document):
             'patient',
             'doctor',
             'status',
-            'transaction_id'
+            'transaction_id',
+            'updated_at',
+            # Keyset pages, see query_utils.keyset_page
+            ('-created_at', '-id')
         ]
     }
+    
+    def clean(self):
+        # Rollups recompute the days of payments changed since their last run
+        self.updated_at = datetime.utcnow()
 
 class SystemLog(Document):
     user = ReferenceField(User)
@@ -296,7 +373,9 @@ class SystemLog(Document):
             'user',
             'action',
             'log_level',
-            'created_at'
+            'created_at',
+            # Keyset pages, see query_utils.keyset_page
+            ('-created_at', '-id')
         ]
     }
 
@@ -313,10 +392,36 @@ class Analytics(Document):
         'indexes': [
             'metric_name',
             'metric_date',
-            'category'
+            'category',
+            {'fields': ['metric_name', 'metric_date', 'category'], 'unique': True}
         ]
     }
 
+class RollupWatermark(Document):
+    """Progress of a daily rollup into Analytics, see rollups.py"""
+    name = StringField(max_length=100, unique=True, required=True)
+    last_run_at = DateTimeField()
+    # Days to recompute on the next run although no document of them changed, e.g. after a delete
+    stale_days = ListField(DateTimeField())
+    updated_at = DateTimeField(default=datetime.utcnow)
+    
+    meta = {
+        'collection': 'rollup_watermarks'
+    }
+
+class UnreadCounter(Document):
+    """Unread messages and notifications of a user, see unread.py"""
+    user = ReferenceField(User, required=True, unique=True)
+    messages = IntField(default=0)
+    notifications = IntField(default=0)
+    # Created but not counted into yet
+    pending = BooleanField(default=False)
+    updated_at = DateTimeField(default=datetime.utcnow)
+    
+    meta = {
+        'collection': 'unread_counters'
+    }
+
 class Call(Document):
     initiator = ReferenceField(User, required=True)
     participants = ListField(ReferenceField(User), required=True)
@@ -377,3 +482,9 @@ class CallLog(Document):
             'action'
         ]
     }
+
+# Keep the unread counters in step with the messages and notifications written
+for model in (Message, Notification):
+    signals.post_save.connect(unread.document_saved, sender=model)
+    signals.post_bulk_insert.connect(unread.documents_inserted, sender=model)
+    signals.post_delete.connect(unread.document_deleted, sender=model)
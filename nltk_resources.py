@@ -0,0 +1,149 @@
+"""
+Lazy, offline access to the NLTK resources used by the chatbots.
+
+Nothing in this module downloads data at import or request time. Resources
+are looked up in the local NLTK data path with nltk.data.find the first time
+they are needed; when one is missing a simpler built-in fallback is used and
+a warning is logged once. Provision a host ahead of time with:
+
+    python nltk_resources.py
+"""
+
+import importlib.metadata
+import logging
+import os
+import re
+import sys
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Download name -> resource paths that satisfy it (newer NLTK releases ship punkt as punkt_tab)
+RESOURCES = {
+    'punkt': ['tokenizers/punkt_tab', 'tokenizers/punkt'],
+    'wordnet': ['corpora/wordnet', 'corpora/wordnet.zip'],
+    'omw-1.4': ['corpora/omw-1.4', 'corpora/omw-1.4.zip'],
+    'stopwords': ['corpora/stopwords', 'corpora/stopwords.zip']
+}
+
+_lock = threading.Lock()
+_available = {}
+_lemmatizer = None
+_stop_words = None
+
+_FALLBACK_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+class IdentityLemmatizer:
+    """Stand-in used when the WordNet corpus is not installed"""
+
+    def lemmatize(self, word, pos='n'):
+        return word
+
+def is_available(name):
+    """Return True if the named resource is installed locally"""
+    if name not in _available:
+        import nltk
+        found = False
+        for path in RESOURCES[name]:
+            try:
+                nltk.data.find(path)
+                found = True
+                break
+            except LookupError:
+                continue
+        if not found:
+            logger.warning(f"NLTK resource '{name}' not installed, using fallback. "
+                           f"Run 'python nltk_resources.py' to install it.")
+        _available[name] = found
+    return _available[name]
+
+def word_tokenize(text):
+    """Tokenize with the Punkt-based NLTK tokenizer, or a regex fallback"""
+    if is_available('punkt'):
+        import nltk
+        try:
+            return nltk.word_tokenize(text)
+        except LookupError:
+            # Installed tokenizer data does not match this NLTK release
+            _available['punkt'] = False
+    return _FALLBACK_TOKEN_PATTERN.findall(text)
+
+def get_lemmatizer():
+    """Return a shared WordNet lemmatizer, or an identity lemmatizer"""
+    global _lemmatizer
+    if _lemmatizer is None:
+        with _lock:
+            if _lemmatizer is None:
+                if is_available('wordnet'):
+                    from nltk.stem import WordNetLemmatizer
+                    _lemmatizer = WordNetLemmatizer()
+                else:
+                    _lemmatizer = IdentityLemmatizer()
+    return _lemmatizer
+
+def get_stop_words():
+    """Return the English stop words, or an empty set"""
+    global _stop_words
+    if _stop_words is None:
+        with _lock:
+            if _stop_words is None:
+                if is_available('stopwords'):
+                    from nltk.corpus import stopwords
+                    _stop_words = frozenset(stopwords.words('english'))
+                else:
+                    _stop_words = frozenset()
+    return _stop_words
+
+def status():
+    """Return which resources are installed locally"""
+    return {name: is_available(name) for name in RESOURCES}
+
+def default_data_path():
+    """Return the directories nltk.data.path starts with, without importing nltk"""
+    # Same order as nltk/data.py
+    path = [directory for directory in os.environ.get('NLTK_DATA', '').split(os.pathsep) if directory]
+    if 'APPENGINE_RUNTIME' not in os.environ and os.path.expanduser('~/') != '~/':
+        path.append(os.path.expanduser('~/nltk_data'))
+    path += [os.path.join(sys.prefix, 'nltk_data'),
+             os.path.join(sys.prefix, 'share', 'nltk_data'),
+             os.path.join(sys.prefix, 'lib', 'nltk_data')]
+    if sys.platform.startswith('win'):
+        path += [os.path.join(os.environ.get('APPDATA', 'C:\\'), 'nltk_data'),
+                 r'C:\nltk_data', r'D:\nltk_data', r'E:\nltk_data']
+    else:
+        path += ['/usr/share/nltk_data', '/usr/local/share/nltk_data', '/usr/lib/nltk_data', '/usr/local/lib/nltk_data']
+    return path
+
+def fingerprint():
+    """Return the installed NLTK version and which resources are present, without importing nltk.
+
+    Stored with precompiled artifacts, it changes whenever NLTK or one of its
+    resources is installed or removed, and checking it costs a few stat calls
+    rather than the second it takes to import nltk.
+    """
+    try:
+        version = importlib.metadata.version('nltk')
+    except importlib.metadata.PackageNotFoundError:
+        version = None
+    data_path = default_data_path()
+    return {
+        'nltk': version,
+        **{name: any(os.path.exists(os.path.join(directory, *path.split('/')))
+                     for path in paths for directory in data_path)
+           for name, paths in RESOURCES.items()}
+    }
+
+def download_all(quiet=False):
+    """Install every resource into the NLTK data path; for provisioning only"""
+    import nltk
+    results = {name: nltk.download(name, quiet=quiet) for name in RESOURCES}
+    if 'punkt' in results:
+        # NLTK 3.8.2+ tokenizes with punkt_tab
+        results['punkt_tab'] = nltk.download('punkt_tab', quiet=quiet)
+    _available.clear()
+    return results
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    for name, installed in download_all().items():
+        print(f"{'✓' if installed else '✗'} {name}")
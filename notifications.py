@@ -0,0 +1,28 @@
+"""
+Creating notifications in bulk.
+
+A call, an appointment or a payment notifies several users at once. Saving
+each Notification costs a round-trip per user; these helpers validate them
+all and write them with a single insert_many.
+"""
+
+from models import Notification, NotificationType
+
+def send_notifications(notifications):
+    """Insert notifications with one insert; returns them, with their ids set"""
+    notifications = list(notifications)
+    if not notifications:
+        return notifications
+    # insert() skips validation
+    for notification in notifications:
+        notification.validate()
+    Notification.objects.insert(notifications, load_bulk=False)
+    return notifications
+
+def notify_many(users, title, message, notification_type=NotificationType.SYSTEM, related_id=None):
+    """Send the same notification to every user with one insert; returns the notifications"""
+    return send_notifications(
+        Notification(user=user, title=title, message=message,
+                     notification_type=notification_type, related_id=related_id)
+        for user in users
+    )
@@ -0,0 +1,121 @@
+"""
+Query helpers for the list pages.
+
+Documents of a page reference users that the templates show by name. Left
+to MongoEngine, each of those references is dereferenced on first access
+with its own query, one round-trip per reference per row. attach_users()
+collects the referenced ids of the whole page and loads the users with a
+single query instead.
+
+Long lists are split by keyset_page(). Rather than skipping the rows of the
+earlier pages, which costs more the further the page, each page starts
+right after the (timestamp, id) of the last row of the previous one, passed
+along as an opaque cursor. Backed by an index on the same keys, page N
+costs the same as page 1.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from mongoengine import Document, ListField, ReferenceField
+from mongoengine.base import BaseList
+from mongoengine.queryset.visitor import Q
+
+from models import User
+
+# What the list templates show of a referenced user: get_full_name(), contact details and role checks
+USER_DISPLAY_FIELDS = ('username', 'first_name', 'last_name', 'email', 'phone', 'role', 'specialization')
+
+def reference_id(value):
+    """Id of a stored reference, whether a DBRef, an ObjectId or a loaded document"""
+    return getattr(value, 'id', value)
+
+def unloaded(value):
+    """Whether value is a reference still to be loaded"""
+    return value is not None and not isinstance(value, Document)
+
+def user_reference_fields(model):
+    """Names of the fields of model referencing users, single or list references"""
+    names = []
+    for name, field in model._fields.items():
+        if isinstance(field, ListField):
+            field = field.field
+        if isinstance(field, ReferenceField) and field.document_type is User:
+            names.append(name)
+    return names
+
+def attach_users(documents, *fields, only=USER_DISPLAY_FIELDS):
+    """Load the users referenced by fields of documents with one query; returns the documents as a list.
+
+    fields defaults to every user reference of the documents' model. Users
+    are loaded with only the given fields, pass only=None for whole users.
+    References to users that no longer exist are left unresolved and fail
+    on access as before.
+    """
+    documents = list(documents)
+    if not documents:
+        return documents
+    fields = fields or user_reference_fields(type(documents[0]))
+
+    # Raw values from _data, reading the attributes would dereference them one by one
+    ids = set()
+    for document in documents:
+        for name in fields:
+            value = document._data.get(name)
+            if isinstance(value, list):
+                ids.update(reference_id(item) for item in value if unloaded(item))
+            elif unloaded(value):
+                ids.add(reference_id(value))
+    if not ids:
+        return documents
+
+    users = User.objects(id__in=list(ids))
+    if only:
+        users = users.only(*only)
+    users = {user.id: user for user in users}
+
+    for document in documents:
+        for name in fields:
+            value = document._data.get(name)
+            if isinstance(value, list):
+                resolved = BaseList([users.get(reference_id(item), item) if unloaded(item) else item
+                                     for item in value], document, name)
+                # Keeps the list field from dereferencing it again
+                resolved._dereferenced = True
+                document._data[name] = resolved
+            elif unloaded(value):
+                document._data[name] = users.get(reference_id(value), value)
+    return documents
+
+def encode_cursor(document, field='created_at'):
+    """Cursor of the page following document"""
+    value = getattr(document, field)
+    payload = json.dumps([value.isoformat() if value else None, str(document.id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """(value, id) encoded in cursor; raises ValueError when it is not a valid cursor"""
+    try:
+        value, document_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return (datetime.fromisoformat(value) if value else None), ObjectId(document_id)
+    except (ValueError, TypeError, binascii.Error, InvalidId) as e:
+        raise ValueError(f"Invalid page cursor: {cursor!r}") from e
+
+def keyset_page(queryset, cursor=None, per_page=10, field='created_at'):
+    """One page of queryset, newest first by field then id, and the cursor of the next page or None"""
+    if cursor:
+        value, document_id = decode_cursor(cursor)
+        if value is None:
+            # Documents without a value sort last, only their ids are left to page through
+            queryset = queryset.filter(Q(**{field: None, 'id__lt': document_id}))
+        else:
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) |
+                                       Q(**{field: value, 'id__lt': document_id}) |
+                                       Q(**{field: None}))
+    documents = list(queryset.order_by(f'-{field}', '-id').limit(per_page + 1))
+    next_cursor = encode_cursor(documents[per_page - 1], field) if len(documents) > per_page else None
+    return documents[:per_page], next_cursor
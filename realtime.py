@@ -0,0 +1,79 @@
+"""
+Pushing new notifications and messages to the browser over Socket.IO.
+
+Every signed-in socket joins a room of its own user, see user_room(). When
+a Notification or Message is created, by save() or by a bulk insert, it is
+emitted to the room of the user it is for, so open pages update at once
+instead of polling MongoDB for news.
+
+The events are 'notification' and 'new_message' ('message' is the event of
+Socket.IO's send()); base.html listens to them and re-dispatches them to the
+page as 'realtime:notification' and 'realtime:message' DOM events.
+"""
+
+import logging
+
+from flask import current_app, has_app_context
+from mongoengine import signals
+
+from models import Notification, Message
+from query_utils import reference_id
+
+logger = logging.getLogger(__name__)
+
+def user_room(user_id):
+    return f'user_{user_id}'
+
+def notification_payload(notification):
+    return {
+        'id': str(notification.id),
+        'title': notification.title,
+        'message': notification.message,
+        'notification_type': getattr(notification.notification_type, 'value', notification.notification_type),
+        'related_id': notification.related_id,
+        'created_at': notification.created_at.isoformat() if notification.created_at else None
+    }
+
+def message_payload(message):
+    return {
+        'id': str(message.id),
+        # The sender is not loaded, its id is enough to link to the conversation
+        'sender_id': str(reference_id(message._data.get('sender'))),
+        'subject': message.subject,
+        'created_at': message.created_at.isoformat() if message.created_at else None
+    }
+
+def push(user_id, event, payload):
+    """Emit event to the sockets of user_id; a no-op outside the app or without Socket.IO"""
+    socketio = current_app.extensions.get('socketio') if has_app_context() else None
+    if socketio is None or user_id is None:
+        return False
+    try:
+        socketio.emit(event, payload, to=user_room(user_id))
+    except Exception as e:
+        # The document is saved, only the live update is lost
+        logger.warning(f"Could not push {event} to user {user_id}: {e}")
+        return False
+    return True
+
+def push_notifications(notifications):
+    for notification in notifications:
+        push(reference_id(notification._data.get('user')), 'notification', notification_payload(notification))
+
+def push_message(message):
+    push(reference_id(message._data.get('recipient')), 'new_message', message_payload(message))
+
+def _notification_saved(sender, document, created=False, **kwargs):
+    if created:
+        push_notifications([document])
+
+def _notifications_inserted(sender, documents, **kwargs):
+    push_notifications(documents)
+
+def _message_saved(sender, document, created=False, **kwargs):
+    if created:
+        push_message(document)
+
+signals.post_save.connect(_notification_saved, sender=Notification)
+signals.post_bulk_insert.connect(_notifications_inserted, sender=Notification)
+signals.post_save.connect(_message_saved, sender=Message)
@@ -0,0 +1,64 @@
+"""
+Revenue of paid payments, added up by MongoDB.
+
+One $facet aggregation returns the overall total with the totals per
+doctor, per month and per currency, without loading a single Payment
+document. The result is kept for REVENUE_CACHE_TTL seconds, so admin pages
+loaded in between share it; a payment made in this process drops it.
+"""
+
+from cache import TTLCache
+from config import Config
+
+_cache = TTLCache(maxsize=1, ttl=Config.REVENUE_CACHE_TTL)
+
+def _totals(key):
+    return [
+        {'$group': {'_id': key, 'total': {'$sum': '$amount'}, 'count': {'$sum': 1}}},
+        {'$sort': {'_id': 1}}
+    ]
+
+def compute_summary():
+    """Totals of the paid payments: overall, per doctor id, per month paid and per currency"""
+    from models import Payment, PaymentStatus
+
+    paid_at = {'$ifNull': ['$payment_date', '$created_at']}
+    result = next(Payment.objects(status=PaymentStatus.PAID).aggregate([{'$facet': {
+        'overall': _totals(None),
+        'by_doctor': _totals('$doctor'),
+        'by_month': _totals({'$dateToString': {'format': '%Y-%m', 'date': paid_at}}),
+        'by_currency': _totals('$currency')
+    }}]))
+
+    overall = result['overall'][0] if result['overall'] else {'total': 0, 'count': 0}
+    by_currency = {}
+    for row in result['by_currency']:
+        # Payments saved without a currency got the field's default
+        currency = row['_id'] or 'USD'
+        by_currency[currency] = by_currency.get(currency, 0) + row['total']
+    return {
+        # Amounts of every currency added up, as the pages always showed them
+        'total': overall['total'],
+        'count': overall['count'],
+        'by_doctor': {str(row['_id']): row['total'] for row in result['by_doctor']},
+        'by_month': {row['_id']: row['total'] for row in result['by_month'] if row['_id']},
+        'by_currency': by_currency
+    }
+
+def revenue_summary():
+    """compute_summary(), reused for REVENUE_CACHE_TTL seconds"""
+    summary = _cache.get('summary')
+    if summary is None:
+        summary = compute_summary()
+        _cache.put('summary', summary)
+    return summary
+
+def total_revenue():
+    return revenue_summary()['total']
+
+def invalidate():
+    """Drop the cached totals, e.g. after a payment"""
+    _cache.clear()
+
+def cache_stats():
+    return _cache.stats()
@@ -0,0 +1,220 @@
+"""
+Daily metric rollups kept in the Analytics collection.
+
+Each rollup groups one collection by day and category: new users per role,
+appointments per status, paid revenue per doctor and day paid, and chatbot
+messages. The
+admin analytics page reads these few rows per day instead of scanning the
+raw collections.
+
+Runs are incremental. A RollupWatermark per rollup records when it last
+ran; the next run only looks at the documents changed since then, finds
+the days they fall on, and recomputes those days with one $group
+aggregation, replacing their rows. Recomputing whole days keeps the counts
+right when a document moves category, e.g. an appointment being cancelled.
+Deletes leave nothing to find, so mark_stale() queues the day instead.
+
+A visit of the page starts a refresh on a background thread and shows the
+rollups as of the last one, so it never waits for an aggregation. Workers
+may refresh at the same time: their upserts of the same row are retried
+when another process inserted it first. To build them for existing data,
+or from scratch:
+
+    python rollups.py [--rebuild]
+"""
+
+import logging
+import threading
+from datetime import datetime, time, timedelta
+
+from bson import ObjectId
+
+logger = logging.getLogger(__name__)
+
+# Documents written just before a run may become visible after it, so each run looks this far behind its watermark
+WATERMARK_OVERLAP = timedelta(minutes=1)
+
+DAY_FORMAT = '%Y-%m-%d'
+
+_refresh_lock = threading.Lock()
+
+class Rollup:
+    """Documents of model per day of date_field and category, counted or with value summed.
+
+    date_fallback is the date of documents without date_field. match
+    restricts the documents counted, changed_field is the timestamp telling
+    which documents changed since the last run. With changed_field 'id',
+    for documents that are only ever inserted, that is when their ObjectId
+    was generated, i.e. when they were inserted rather than created.
+    """
+
+    def __init__(self, name, model, date_field, category=None, value=None, match=None, changed_field='created_at',
+                 date_fallback=None):
+        self.name = name
+        self.model = model
+        self.date_field = date_field
+        self.date_fallback = date_fallback
+        self.category = category
+        self.value = value
+        self.match = match or {}
+        self.changed_field = changed_field
+
+    def changed_days(self, since):
+        """Days of the documents changed after since"""
+        if self.changed_field == 'id':
+            # ObjectIds hold whole seconds, so up to a second more is looked at
+            changed = self.model.objects(id__gte=ObjectId.from_datetime(since))
+        else:
+            changed = self.model.objects(**{f'{self.changed_field}__gt': since})
+        return {
+            datetime.strptime(row['_id'], DAY_FORMAT)
+            for row in changed.aggregate([{'$group': {'_id': self._day_expression()}}])
+            if row['_id']
+        }
+
+    def compute(self, days=None):
+        """{(day, category): value} over the given days, or over all documents"""
+        match = dict(self.match)
+        if days is not None:
+            match['$or'] = [condition for day in days for condition in self._day_conditions(day)]
+        pipeline = [
+            {'$match': match},
+            {'$group': {
+                '_id': {'day': self._day_expression(), 'category': f'${self.category}' if self.category else None},
+                'value': {'$sum': f'${self.value}' if self.value else 1}
+            }}
+        ]
+        results = {}
+        for row in self.model._get_collection().aggregate(pipeline):
+            if row['_id']['day'] is None:
+                continue
+            category = row['_id'].get('category')
+            key = (datetime.strptime(row['_id']['day'], DAY_FORMAT), None if category is None else str(category))
+            results[key] = float(row['value'])
+        return results
+
+    def _day_conditions(self, day):
+        within = {'$gte': day, '$lt': day + timedelta(days=1)}
+        if self.date_fallback is None:
+            return [{self.date_field: within}]
+        return [{self.date_field: within}, {self.date_field: None, self.date_fallback: within}]
+
+    def _day_expression(self):
+        date = f'${self.date_field}'
+        if self.date_fallback is not None:
+            date = {'$ifNull': [date, f'${self.date_fallback}']}
+        return {'$dateToString': {'format': DAY_FORMAT, 'date': date}}
+
+def all_rollups():
+    from models import User, Appointment, Payment, ChatMessage, PaymentStatus
+    return [
+        # Changed rather than created users, so role changes reach the counts
+        Rollup('new_users', User, 'created_at', category='role', changed_field='updated_at'),
+        Rollup('appointments', Appointment, 'appointment_date', category='status', changed_field='updated_at'),
+        # By the day paid, like revenue.py
+        Rollup('revenue', Payment, 'payment_date', category='doctor', value='amount',
+               match={'status': PaymentStatus.PAID.value}, changed_field='updated_at', date_fallback='created_at'),
+        # The BulkWriter inserts messages well after their created_at when MongoDB falls behind
+        Rollup('chat_messages', ChatMessage, 'created_at', changed_field='id')
+    ]
+
+def retry_duplicates(write, attempts=3):
+    """Run write, again when a concurrent upsert of another process inserted the same unique key first"""
+    from mongoengine import NotUniqueError
+    from pymongo.errors import BulkWriteError, DuplicateKeyError
+    for attempt in range(attempts):
+        try:
+            return write()
+        except (BulkWriteError, DuplicateKeyError, NotUniqueError) as e:
+            errors = e.details.get('writeErrors', []) if isinstance(e, BulkWriteError) else [{'code': 11000}]
+            # The retry finds the inserted row and updates it instead
+            if attempt == attempts - 1 or not all(error.get('code') == 11000 for error in errors):
+                raise
+            logger.info(f"Concurrent rollup upsert, retrying: {str(e)}")
+
+def write_rows(rollup, results, days=None):
+    """Replace the Analytics rows of rollup for days (all of them when None) with results"""
+    from pymongo import DeleteMany, UpdateOne
+    from models import Analytics
+
+    operations = []
+    if days is None:
+        operations.append(DeleteMany({'metric_name': rollup.name}))
+    else:
+        for day in days:
+            categories = [category for (row_day, category) in results if row_day == day]
+            operations.append(DeleteMany({'metric_name': rollup.name, 'metric_date': day,
+                                          'category': {'$nin': categories}}))
+    now = datetime.utcnow()
+    for (day, category), value in results.items():
+        operations.append(UpdateOne(
+            {'metric_name': rollup.name, 'metric_date': day, 'category': category},
+            {'$set': {'metric_value': value}, '$setOnInsert': {'metadata': {}, 'created_at': now}},
+            upsert=True
+        ))
+    retry_duplicates(lambda: Analytics._get_collection().bulk_write(operations, ordered=True))
+
+def run_rollup(rollup, rebuild=False):
+    """Bring the rows of one rollup up to date; returns the number of days recomputed, None for all"""
+    from models import RollupWatermark
+
+    started = datetime.utcnow()
+    watermark = RollupWatermark.objects(name=rollup.name).first()
+    stale_days = list(watermark.stale_days) if watermark else []
+
+    if rebuild or watermark is None or watermark.last_run_at is None:
+        days = None
+    else:
+        days = rollup.changed_days(watermark.last_run_at - WATERMARK_OVERLAP) | set(stale_days)
+
+    if days is None or days:
+        results = rollup.compute(sorted(days) if days else None)
+        write_rows(rollup, results, days)
+        logger.info(f"Rollup {rollup.name}: {len(results)} rows for {'all' if days is None else len(days)} days")
+
+    retry_duplicates(lambda: RollupWatermark.objects(name=rollup.name).update_one(
+        set__last_run_at=started, set__updated_at=datetime.utcnow(),
+        pull_all__stale_days=stale_days, upsert=True
+    ))
+    return None if days is None else len(days)
+
+def refresh_rollups(rebuild=False):
+    """Run every rollup; returns {name: days recomputed}, empty when another refresh is running"""
+    if not _refresh_lock.acquire(blocking=False):
+        return {}
+    try:
+        return {rollup.name: run_rollup(rollup, rebuild=rebuild) for rollup in all_rollups()}
+    finally:
+        _refresh_lock.release()
+
+def refresh_async():
+    """Run refresh_rollups() on a background thread; returns the thread, False if a refresh is already running"""
+    if _refresh_lock.locked():
+        return False
+
+    def run():
+        try:
+            refresh_rollups()
+        except Exception as e:
+            logger.error(f"Error refreshing rollups: {str(e)}")
+
+    thread = threading.Thread(target=run, name='rollups-refresh', daemon=True)
+    thread.start()
+    return thread
+
+def mark_stale(name, *moments):
+    """Have the next run of rollup name recompute the days of moments, e.g. of deleted documents"""
+    from models import RollupWatermark
+    days = [datetime.combine(moment.date(), time.min) for moment in moments if moment]
+    if days:
+        retry_duplicates(lambda: RollupWatermark.objects(name=name).update_one(add_to_set__stale_days=days,
+                                                                               upsert=True))
+
+if __name__ == '__main__':
+    import sys
+    logging.basicConfig(level=logging.INFO)
+    from mongoengine import connect
+    from config import Config
+    connect(host=Config.MONGODB_URI)
+    for name, days in refresh_rollups(rebuild='--rebuild' in sys.argv).items():
+        print(f"✓ {name}: {'all' if days is None else days} days rolled up")
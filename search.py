@@ -0,0 +1,135 @@
+"""
+Keyword search for the admin list pages.
+
+Searchable documents keep a `search_terms` list with the lowercase words of
+their searched fields, and names of the users they reference, maintained
+by their clean() method. It only rebuilds them when one of those fields
+changed, so saving e.g. a status update does not read the referenced users
+again. Short fields such as names, emails and titles also
+store every prefix of their words, so typing the start of a name finds it.
+A multikey index on `search_terms` turns a search into a single indexed
+query: every word of the search has to be one of the document's terms, so
+names match by prefix and free text by whole words, not by substring.
+
+When a user is renamed, sync_user_names() rewrites the terms of the
+documents referencing them. Fill the terms of existing data with:
+
+    python search.py
+"""
+
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+_WORD_PATTERN = re.compile(r"[^\W_]+")
+
+# Longer words are cut, keeps prefixes of pathological input bounded
+MAX_TERM_LENGTH = 32
+
+def words(text):
+    return [word[:MAX_TERM_LENGTH] for word in _WORD_PATTERN.findall((text or '').lower())]
+
+def index_terms(names=(), texts=()):
+    """Return the sorted search terms: every prefix of words in names, whole words of texts"""
+    terms = set()
+    for name in names:
+        for word in words(name):
+            terms.update(word[:length] for length in range(1, len(word) + 1))
+    for text in texts:
+        terms.update(words(text))
+    return sorted(terms)
+
+def terms_outdated(document, *fields):
+    """Whether the search terms of document, built from fields, have to be rebuilt before saving it.
+
+    New documents and documents without terms always do, loaded ones only
+    when one of the fields changed since.
+    """
+    if document._created or not document.search_terms:
+        return True
+    changed = document._get_changed_fields()
+    return any(name == field or name.startswith(f'{field}.') for name in changed for field in fields)
+
+def user_names(document, *fields):
+    """First and last names of the users referenced by fields, skipping unset or dangling references"""
+    from mongoengine import DoesNotExist
+    names = []
+    for field in fields:
+        try:
+            user = getattr(document, field)
+        except DoesNotExist:
+            continue
+        names.extend(getattr(user, attribute, None) or '' for attribute in ('first_name', 'last_name'))
+    return names
+
+def apply_search(queryset, query):
+    """Restrict queryset to documents containing every word of query"""
+    terms = sorted(set(words(query)))
+    if not terms:
+        return queryset
+    return queryset.filter(search_terms__all=terms)
+
+def searchable_models():
+    from models import User, Appointment, Prescription, Report, Message
+    return [User, Appointment, Prescription, Report, Message]
+
+def referencing_querysets(user):
+    """Querysets of the documents whose search terms include the user's name"""
+    from models import Appointment, Prescription, Report, Message
+    return [
+        Appointment.objects(patient=user), Appointment.objects(doctor=user),
+        Prescription.objects(patient=user), Prescription.objects(doctor=user),
+        Report.objects(user=user), Report.objects(created_by=user),
+        Message.objects(sender=user), Message.objects(recipient=user)
+    ]
+
+def refresh_terms(queryset, batch_size=500):
+    """Recompute and write the search terms of every document in queryset; returns the count.
+
+    Documents are read without dereferencing; the users referenced by a
+    batch are fetched with one query and the terms written with one
+    bulk_write per batch.
+    """
+    count = 0
+    batch = []
+    for document in queryset.no_dereference().no_cache():
+        batch.append(document)
+        if len(batch) >= batch_size:
+            count += _write_terms(queryset._document, batch)
+            batch = []
+    if batch:
+        count += _write_terms(queryset._document, batch)
+    return count
+
+def _write_terms(model, batch):
+    from pymongo import UpdateOne
+    from query_utils import attach_users, user_reference_fields
+
+    # Only set in memory to build the terms, the documents themselves are not saved
+    attach_users(batch, *user_reference_fields(model), only=('first_name', 'last_name'))
+
+    model._get_collection().bulk_write(
+        [UpdateOne({'_id': document.pk}, {'$set': {'search_terms': document.build_search_terms()}})
+         for document in batch],
+        ordered=False
+    )
+    return len(batch)
+
+def sync_user_names(user):
+    """Update the denormalized names of a renamed user in the documents referencing them"""
+    count = sum(refresh_terms(queryset) for queryset in referencing_querysets(user))
+    logger.info(f"Search terms of {count} documents updated for user {user.id}")
+    return count
+
+def reindex_all():
+    """Fill the search terms of every searchable document, e.g. after upgrading"""
+    return {model.__name__: refresh_terms(model.objects) for model in searchable_models()}
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    from mongoengine import connect
+    from config import Config
+    connect(host=Config.MONGODB_URI)
+    for name, count in reindex_all().items():
+        print(f"✓ {name}: {count} documents indexed")
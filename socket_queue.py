@@ -0,0 +1,70 @@
+"""
+Message queue connecting the Socket.IO servers of several workers.
+
+A socket is connected to one worker, but the rooms it joined are addressed
+from any of them: a call's participants may sit on different workers, and a
+notification is created by whichever worker served the request. With
+SOCKETIO_MESSAGE_QUEUE set, every worker publishes its emits to the queue
+and delivers those of the others to its own sockets.
+
+The URL picks the backend Flask-SocketIO supports, e.g. redis://host:6379/0
+(pip install redis), amqp://... (kombu) or kafka://... . local:// is a
+stand-in connecting the servers of a single process, for tests and the
+signaling load test.
+"""
+
+import pickle
+import queue
+import threading
+
+import socketio
+
+class LocalPubSubManager(socketio.PubSubManager):
+    """Pub/sub backend of the Socket.IO servers created in this process on the same channel.
+
+    Messages are pickled like the Redis backend does, so whatever could not
+    cross a real queue fails here too.
+    """
+
+    name = 'local'
+
+    _subscribers = {}
+    _subscribers_lock = threading.Lock()
+
+    def __init__(self, url='local://', channel='flask-socketio', write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.url = url
+        self._messages = queue.Queue()
+        if not write_only:
+            with self._subscribers_lock:
+                self._subscribers.setdefault(channel, []).append(self._messages)
+
+    def close(self):
+        """Stop receiving the messages of the channel"""
+        with self._subscribers_lock:
+            subscribers = self._subscribers.get(self.channel, [])
+            if self._messages in subscribers:
+                subscribers.remove(self._messages)
+        self._messages.put(None)
+
+    def _publish(self, data):
+        message = pickle.dumps(data)
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers.get(self.channel, []))
+        for messages in subscribers:
+            messages.put(message)
+
+    def _listen(self):
+        while True:
+            message = self._messages.get()
+            if message is None:
+                return
+            yield message
+
+def queue_options(url, channel='flask-socketio', write_only=False):
+    """SocketIO() keyword arguments for the message queue at url, none without one"""
+    if not url:
+        return {}
+    if url.startswith('local://'):
+        return {'client_manager': LocalPubSubManager(url, channel=channel, write_only=write_only)}
+    return {'message_queue': url, 'channel': channel}
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test script for the aggregations behind the admin analytics page.
+"""
+
+import sys
+import os
+from datetime import date, datetime, timedelta
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import mock_database, make_user
+
+def test_windows():
+    """Test the chart windows keep the month and day buckets of the page"""
+    print("🔧 Testing Chart Windows")
+    print("=" * 40)
+
+    from analytics import month_windows, day_windows
+    months = month_windows(date(2024, 3, 15))
+    assert len(months) == 6
+    assert months[-1] == (date(2024, 3, 1), date(2024, 3, 15))
+    assert months[-2] == (date(2024, 1, 31), date(2024, 3, 1))
+    assert all(end == following[0] for (_, end), following in zip(months[:-2], months[1:-1]))
+    days = day_windows(date(2024, 3, 15))
+    assert days[0] == (date(2024, 3, 9), date(2024, 3, 10)) and days[-1] == (date(2024, 3, 15), date(2024, 3, 16))
+    print("✅ Six months ending today, seven days ending tomorrow")
+
+def test_statistics_match_per_window_counts():
+    """Test that the statistics read from the rollups agree with counting every window separately"""
+    print("🔧 Testing Analytics Aggregations")
+    print("=" * 40)
+
+    with mock_database():
+        from models import User, Appointment, Payment, PaymentStatus, PaymentMethod, UserRole
+        from analytics import user_statistics, appointment_statistics, paid_revenue, month_windows, day_windows
+        from rollups import refresh_rollups
+
+        today = date(2024, 3, 15)
+        doctor = make_user('drsmith', 'Alice', 'Smith', UserRole.DOCTOR)
+        make_user('admin', 'Ad', 'Min', UserRole.ADMIN)
+        for n in range(20):
+            patient = make_user(f'patient{n}', 'Pat', 'Doe', UserRole.PATIENT)
+            patient.update(set__created_at=datetime(2024, 3, 14, 12) - timedelta(days=9 * n))
+            Appointment(patient=patient, doctor=doctor,
+                        appointment_date=datetime(2024, 3, 16, 9) - timedelta(hours=11 * n)).save()
+            Payment(patient=patient, doctor=doctor, amount=10.5 * n, payment_method=PaymentMethod.CASH,
+                    status=PaymentStatus.PAID if n % 2 else PaymentStatus.PENDING).save()
+
+        refresh_rollups()
+        users = user_statistics(today)
+        assert users['total'] == 22
+        assert users['roles'] == {'patient': 20, 'doctor': 1, 'admin': 1}
+        expected = [User.objects(created_at__gte=start, created_at__lt=end).count()
+                    for start, end in month_windows(today)]
+        assert users['growth_data'] == expected and sum(expected) > 0
+        assert users['growth_labels'] == ['Oct', 'Nov', 'Dec', 'Jan', 'Jan', 'Mar']
+        print(f"✅ User growth {users['growth_data']}")
+
+        appointments = appointment_statistics(today)
+        assert appointments['total'] == 20
+        expected = [Appointment.objects(appointment_date__gte=start, appointment_date__lt=end).count()
+                    for start, end in day_windows(today)]
+        assert appointments['trend_data'] == expected and sum(expected) > 0
+        assert appointments['trend_labels'][-1] == 'Fri'
+        print(f"✅ Appointment trend {appointments['trend_data']}")
+
+        assert paid_revenue() == sum(p.amount for p in Payment.objects(status=PaymentStatus.PAID))
+        Payment.objects.delete()
+        refresh_rollups(rebuild=True)
+        assert paid_revenue() == 0
+        print("✅ Revenue summed from the rollups")
+
+if __name__ == "__main__":
+    test_windows()
+    test_statistics_match_per_window_counts()
+    print("\n🎉 ALL ANALYTICS TESTS PASSED!")
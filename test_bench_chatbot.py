@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test script for the chatbot benchmark corpus and regression gate.
+"""
+
+import sys
+import os
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def test_corpus_is_fixed():
+    """Test that the corpus covers every pattern and is reproducible"""
+    print("🔧 Testing Benchmark Corpus")
+    print("=" * 40)
+
+    from bench_chatbot import build_corpus, OUT_OF_DOMAIN
+    corpus = build_corpus('model/intents.json')
+    assert corpus == build_corpus('model/intents.json')
+    kinds = {kind for kind, _ in corpus}
+    assert kinds == {'pattern', 'misspelled', 'truncated', 'out_of_domain'}
+    patterns = [query for kind, query in corpus if kind == 'pattern']
+    misspelled = [query for kind, query in corpus if kind == 'misspelled']
+    assert len(patterns) == len(misspelled)
+    assert sum(a != b for a, b in zip(patterns, misspelled)) > len(patterns) // 2
+    assert sum(kind == 'out_of_domain' for kind, _ in corpus) == 2 * len(OUT_OF_DOMAIN)
+    print(f"✅ {len(corpus)} queries, reproducible")
+
+def test_regression_gate():
+    """Test that slowdowns beyond the tolerance are reported"""
+    print("🔧 Testing Benchmark Regression Gate")
+    print("=" * 40)
+
+    from bench_chatbot import find_regressions
+    previous = {'p50_ms': 1.0, 'p95_ms': 2.0, 'p99_ms': 3.0, 'throughput_qps': 1000.0,
+                'setup_memory_kb': 500.0, 'peak_memory_kb': 100.0}
+    baseline = {'results': {'model': previous}}
+
+    assert find_regressions({'model': dict(previous, p95_ms=2.4)}, baseline) == []
+    assert find_regressions({'model': dict(previous, p95_ms=2.6)}, baseline) == ['model p95_ms: 2.0 -> 2.6']
+    assert find_regressions({'model': dict(previous, throughput_qps=700.0)}, baseline) == \
+        ['model throughput_qps: 1000.0 -> 700.0']
+    assert find_regressions({'tfidf': dict(previous, p95_ms=99.0)}, baseline) == []
+    print("✅ Regressions beyond 25% detected, new modes ignored")
+
+if __name__ == "__main__":
+    test_corpus_is_fixed()
+    test_regression_gate()
+    print("\n🎉 ALL BENCHMARK TESTS PASSED!")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test script for the background BulkWriter used to persist chat history.
+"""
+
+import sys
+import os
+import time
+import threading
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+class RecordingObjects:
+    """Stands in for Document.objects, records every insert call"""
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+        self.thread_names = set()
+        # Cleared to hold the writer inside insert(), like a stalled database
+        self.open = threading.Event()
+        self.open.set()
+        self.entered = threading.Event()
+
+    def insert(self, documents, load_bulk=True):
+        assert load_bulk is False
+        self.thread_names.add(threading.current_thread().name)
+        self.entered.set()
+        self.open.wait()
+        if self.fail:
+            raise RuntimeError("connection refused")
+        self.batches.append([document.value for document in documents])
+
+def make_document_class():
+    class RecordedDocument:
+        objects = RecordingObjects()
+
+        def __init__(self, value):
+            self.value = value
+
+        def validate(self):
+            if self.value is None:
+                raise ValueError("value is required")
+
+    return RecordedDocument
+
+def test_batches_by_size_and_interval():
+    """Test that documents are inserted in batches, off the calling thread"""
+    print("🔧 Testing Bulk Writer Batching")
+    print("=" * 40)
+
+    from bulk_writer import BulkWriter
+    document_class = make_document_class()
+    writer = BulkWriter(document_class, batch_size=3, flush_interval=0.2, name='test-writer')
+
+    for value in range(7):
+        writer.submit(document_class(value))
+    assert writer.flush(timeout=5)
+    assert document_class.objects.batches == [[0, 1, 2], [3, 4, 5], [6]]
+    assert document_class.objects.thread_names == {'test-writer'}
+    print("✅ Full batches written at once, the rest on flush")
+
+    writer.submit(document_class(7))
+    deadline = time.time() + 5
+    while len(document_class.objects.batches) < 4 and time.time() < deadline:
+        time.sleep(0.01)
+    assert document_class.objects.batches[-1] == [7]
+    print("✅ Partial batch written after the flush interval")
+
+    writer.submit(document_class(8))
+    writer.close()
+    assert document_class.objects.batches[-1] == [8]
+    stats = writer.stats()
+    assert stats['submitted'] == stats['written'] == 9 and stats['failed'] == 0
+    print(f"✅ Close writes what is queued: {stats}")
+
+def test_invalid_and_failed_writes():
+    """Test that invalid documents are rejected up front and failures counted"""
+    print("🔧 Testing Bulk Writer Errors")
+    print("=" * 40)
+
+    from bulk_writer import BulkWriter
+    document_class = make_document_class()
+    writer = BulkWriter(document_class, batch_size=10, flush_interval=10)
+
+    with pytest.raises(ValueError):
+        writer.submit(document_class(None))
+    assert writer.submitted == 0
+    print("✅ Invalid document rejected to the caller")
+
+    document_class.objects.fail = True
+    writer.submit(document_class(1))
+    writer.submit(document_class(2))
+    assert writer.flush(timeout=5)
+    assert writer.failed == 2 and writer.written == 0
+    document_class.objects.fail = False
+    writer.submit(document_class(3))
+    assert writer.flush(timeout=5)
+    assert document_class.objects.batches == [[3]]
+    writer.close()
+    print("✅ Failed batch logged and counted, writer keeps going")
+
+def test_bounded_queue_overflow():
+    """Test that a full queue drops documents, right away or after waiting for room"""
+    print("🔧 Testing Bulk Writer Backpressure")
+    print("=" * 40)
+
+    from bulk_writer import BulkWriter
+    with pytest.raises(ValueError):
+        BulkWriter(make_document_class(), overflow='spill')
+
+    for overflow, block_timeout in (('drop', None), ('block', 0.05)):
+        document_class = make_document_class()
+        writer = BulkWriter(document_class, batch_size=1, flush_interval=10,
+                            max_queue=2, overflow=overflow, block_timeout=block_timeout)
+        document_class.objects.open.clear()
+        assert writer.submit(document_class(0))
+        assert document_class.objects.entered.wait(5)
+        # The writer is stuck on the first document, two more fit in the queue
+        assert writer.submit(document_class(1)) and writer.submit(document_class(2))
+        started = time.monotonic()
+        assert writer.submit(document_class(3)) is False
+        waited = time.monotonic() - started
+        assert waited >= 0.04 if overflow == 'block' else waited < 0.04
+        assert writer.stats()['queued'] == 2
+
+        document_class.objects.open.set()
+        writer.close()
+        assert document_class.objects.batches == [[0], [1], [2]]
+        stats = writer.stats()
+        assert (stats['submitted'], stats['written'], stats['dropped']) == (3, 3, 1)
+        print(f"✅ {overflow}: {stats}")
+
+if __name__ == "__main__":
+    test_batches_by_size_and_interval()
+    test_invalid_and_failed_writes()
+    test_bounded_queue_overflow()
+    print("\n🎉 ALL BULK WRITER TESTS PASSED!")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-memory state of calls in progress.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import mock_database, make_user
+
+def test_signaling_state_written_behind():
+    """Test that signaling events are served from memory and written in batches"""
+    print("🔧 Testing Call Registry")
+    print("=" * 40)
+
+    with mock_database():
+        from models import CallParticipant, CallLog, UserRole
+        from call_registry import CallRegistry
+        from call_setup import start_call
+
+        doctor = make_user('drsmith', 'Alice', 'Smith', UserRole.DOCTOR)
+        patient = make_user('patient', 'Pat', 'Doe', UserRole.PATIENT)
+        stranger = make_user('stranger', 'Sam', 'Roe', UserRole.PATIENT)
+        call, _ = start_call(doctor, [str(patient.id)])
+        room_id = call.room_id
+
+        # Flushed by hand below rather than by the thread
+        calls = CallRegistry(flush_interval=3600)
+        try:
+            moment = datetime(2024, 3, 15, 9)
+            # The initiator takes part in their call
+            assert calls.join(room_id, str(doctor.id), moment, sid='sid-doctor') is not None
+            assert calls.join(room_id, str(patient.id), moment, sid='sid-patient') is not None
+            assert calls.loads == 1
+            assert calls.record(room_id, str(patient.id), 'muted', is_muted=True).state['is_muted'] is True
+            calls.record(room_id, str(patient.id), 'video_disabled', is_video_enabled=False)
+            for _ in range(3):
+                assert calls.record(room_id, str(stranger.id), 'muted', is_muted=True) is None
+                assert calls.record('room-2', str(doctor.id), 'muted', is_muted=True) is None
+            # The room was loaded once, and a second time to look for the stranger only
+            assert calls.loads == 2
+            assert calls.stats()['misses']['hits'] == 4
+            assert CallParticipant.objects(user=patient).first().is_muted is False
+            print("✅ Events served from memory, nothing written yet")
+
+            assert calls.flush() == 2
+            assert calls.flush() == 0
+            stored = CallParticipant.objects(user=patient).first()
+            assert stored.is_muted and not stored.is_video_enabled and stored.joined_at == moment
+            assert CallParticipant.objects(user=doctor).first().joined_at == moment
+            assert calls.log_writer.flush(timeout=5)
+            assert sorted(log.action for log in CallLog.objects(user=patient)) == ['joined', 'muted', 'video_disabled']
+            print("✅ Participants and call logs written in batches")
+
+            # A socket dropped without leave_call leaves its calls
+            assert calls.disconnect('sid-doctor', moment) == [(room_id, str(doctor.id))]
+            assert calls.disconnect('sid-doctor', moment) == []
+            assert calls.stats()['rooms'] == 1
+            calls.leave(room_id, str(patient.id), moment, sid='sid-patient')
+            assert calls.stats()['rooms'] == 0 and calls.stats()['sockets'] == 0
+            # The state not written yet survives the room being reloaded
+            calls.record(room_id, str(patient.id), 'unmuted', is_muted=False)
+            assert calls.stats()['pending'] == 2
+            print("✅ Rooms dropped when everybody left or disconnected")
+        finally:
+            calls.close()
+        stored = CallParticipant.objects(user=patient).first()
+        assert stored.left_at == moment and stored.is_muted is False
+        # With the log of start_call
+        assert CallLog.objects(call=call).count() == 8
+        print("✅ Everything written on close")
+
+def test_idle_rooms_evicted():
+    """Test that rooms without events are dropped, e.g. of calls ended on another worker"""
+    print("🔧 Testing Idle Call Rooms")
+    print("=" * 40)
+
+    with mock_database():
+        from models import UserRole
+        from call_registry import CallRegistry
+        from call_setup import start_call
+
+        doctor = make_user('drsmith', 'Alice', 'Smith', UserRole.DOCTOR)
+        patient = make_user('patient', 'Pat', 'Doe', UserRole.PATIENT)
+        stranger = make_user('stranger', 'Sam', 'Roe', UserRole.PATIENT)
+        quiet, _ = start_call(doctor, [str(patient.id)])
+        busy, _ = start_call(doctor, [str(patient.id)])
+
+        now = [0.0]
+        calls = CallRegistry(flush_interval=3600, idle_timeout=60, clock=lambda: now[0])
+        try:
+            moment = datetime(2024, 3, 15, 9)
+            calls.join(quiet.room_id, str(doctor.id), moment)
+            calls.join(busy.room_id, str(doctor.id), moment)
+            assert calls.record(quiet.room_id, str(stranger.id), 'muted', is_muted=True) is None
+            now[0] = 45.0
+            calls.record(busy.room_id, str(doctor.id), 'muted', is_muted=True)
+            assert calls.evict_idle() == 0
+            now[0] = 90.0
+            assert calls.evict_idle() == 1
+            assert calls.stats()['rooms'] == 1 and calls.stats()['evicted'] == 1
+            print("✅ Idle rooms dropped")
+
+            # Reloaded on the next event, the stranger looked up again once the miss expired
+            loads = calls.loads
+            assert calls.record(quiet.room_id, str(doctor.id), 'unmuted', is_muted=False) is not None
+            assert calls.record(quiet.room_id, str(stranger.id), 'muted', is_muted=True) is None
+            assert calls.loads == loads + 2
+            print("✅ Idle rooms reloaded on demand")
+        finally:
+            calls.close()
+
+if __name__ == "__main__":
+    test_signaling_state_written_behind()
+    test_idle_rooms_evicted()
+    print("\n🎉 ALL CALL REGISTRY TESTS PASSED!")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test script for starting calls in a fixed number of round-trips.
+"""
+
+import sys
+import os
+from contextlib import contextmanager
+from unittest import mock
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import mock_database, make_user
+
+DATABASE_CALLS = ('find', 'find_one', 'insert_one', 'insert_many', 'update_one', 'update_many',
+                  'bulk_write', 'count_documents', 'aggregate')
+
+@contextmanager
+def count_round_trips():
+    """Count the calls to every collection; MongoEngine goes through copies of them, so the class is watched"""
+    import mongomock
+    collection_class = mongomock.collection.Collection
+    calls = []
+    patches = [mock.patch.object(collection_class, name, autospec=True,
+                                 side_effect=lambda *args, _name=name, _original=getattr(collection_class, name), **kwargs:
+                                 calls.append(_name) or _original(*args, **kwargs))
+               for name in DATABASE_CALLS]
+    for patch in patches:
+        patch.start()
+    try:
+        yield calls
+    finally:
+        for patch in patches:
+            patch.stop()
+
+def test_start_call_round_trips():
+    """Test that a call costs the same round-trips however many are called"""
+    print("🔧 Testing Call Setup")
+    print("=" * 40)
+
+    with mock_database():
+        from models import Call, CallParticipant, CallLog, Notification, UserRole
+        from call_setup import start_call
+
+        doctor = make_user('drsmith', 'Alice', 'Smith', UserRole.DOCTOR)
+        patients = [make_user(f'patient{n}', 'Pat', f'Doe{n}', UserRole.PATIENT) for n in range(9)]
+        # Indexes are created on first use
+        start_call(doctor, [str(patients[0].id)])
+
+        round_trips = []
+        for group in (patients[:1], patients[:3], patients):
+            with count_round_trips() as calls:
+                call, called = start_call(doctor, [str(patient.id) for patient in group], 'audio',
+                                          max_participants=10, call_title="Rounds")
+            round_trips.append(len(calls))
+            assert called == group
+            assert call.is_group_call == (len(group) > 1) and call.call_title == "Rounds"
+            assert CallParticipant.objects(call=call).count() == len(group) + 1
+            assert Notification.objects(related_id=str(call.id)).count() == len(group)
+            assert CallLog.objects(call=call, action='initiated').count() == 1
+        assert round_trips[0] == round_trips[1] == round_trips[2]
+        print(f"✅ {round_trips[0]} round-trips for 1, 3 or 9 participants")
+
+        ids = [str(patients[1].id), 'not-an-id', str(doctor.id), str(patients[0].id), str(patients[1].id)]
+        call, called = start_call(doctor, ids)
+        assert called == [patients[1], patients[0]]
+        assert [user.id for user in Call.objects.get(id=call.id).participants] == \
+            [doctor.id, patients[1].id, patients[0].id]
+        print("✅ Invalid ids, duplicates and the caller left out, order kept")
+
+        calls_before = Call.objects.count()
+        with pytest.raises(ValueError):
+            start_call(doctor, [str(patient.id) for patient in patients], max_participants=5)
+        with pytest.raises(ValueError):
+            start_call(doctor, ['not-an-id', str(doctor.id)])
+        assert Call.objects.count() == calls_before
+        print("✅ Oversized and empty calls refused before any write")
+
+if __name__ == "__main__":
+    test_start_call_round_trips()
+    print("\n🎉 ALL CALL SETUP TESTS PASSED!")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test script to verify that the TF-IDF matching mode of HealthChatbot picks
+the same intents as the token-overlap scorer.
+"""
+
+import sys
+import os
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+TEST_PHRASES = [
+    "Hello",
+    "How to sleep better",
+    "What should I eat",
+    "I need some exercise tips",
+    "How to reduce stress",
+    "covid symptoms",
+    "dental hygiene advice",
+    "how much water should I drink",
+    "what are good health habits",
+    "weight loss tips",
+    "heart disease prevention",
+    "vitamin supplements",
+    "Goodbye"
+]
+
+def make_chatbot(match_mode, threshold=None):
+    from chatbot import HealthChatbot
+    return HealthChatbot(match_mode=match_mode, threshold=threshold)
+
+def test_tfidf_agrees_with_overlap():
+    """Test that both matching modes select the same intent for the test phrases"""
+    print("🔧 Testing Chatbot Matching Modes")
+    print("=" * 40)
+
+    overlap_bot = make_chatbot('overlap')
+    tfidf_bot = make_chatbot('tfidf')
+
+    for phrase in TEST_PHRASES:
+        overlap_intent, _ = overlap_bot.match_overlap(phrase)
+        tfidf_intent, score = tfidf_bot.match_tfidf(phrase)
+        assert overlap_intent is not None, phrase
+        assert tfidf_intent['tag'] == overlap_intent['tag'], phrase
+        assert score > tfidf_bot.threshold, phrase
+        print(f"✅ '{phrase}' -> {tfidf_intent['tag']} ({score:.2f})")
+
+def test_tfidf_threshold_is_selectable():
+    """Test that the TF-IDF threshold controls the fallback response"""
+    print("🔧 Testing Chatbot Matching Threshold")
+    print("=" * 40)
+
+    strict_bot = make_chatbot('tfidf', threshold=1.01)
+    response = strict_bot.get_response("How to sleep better")
+    assert response in strict_bot.fallback_responses
+    print("✅ Threshold above every score falls back")
+
+    with pytest.raises(ValueError):
+        make_chatbot('unknown')
+    print("✅ Unknown match mode rejected")
+
+if __name__ == "__main__":
+    test_tfidf_agrees_with_overlap()
+    test_tfidf_threshold_is_selectable()
+    print("\n🎉 ALL CHATBOT MATCHING TESTS PASSED!")
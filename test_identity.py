@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Test script for the cache of signed-in users.
+"""
+
+import sys
+import os
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import mock_database, make_user
+
+def test_cached_user_loader():
+    """Test that users are reused between requests until they are saved or deleted"""
+    print("🔧 Testing User Cache")
+    print("=" * 40)
+
+    with mock_database():
+        from models import User, UserRole
+        import identity
+
+        doctor = make_user('drsmith', 'Alice', 'Smith', UserRole.DOCTOR)
+        identity._cache.clear()
+
+        first = identity.load_user(str(doctor.id))
+        assert first == doctor and first.is_doctor() and first.get_full_name() == 'Alice Smith'
+        # Written behind the cache's back: the cached user is still served
+        User.objects(id=doctor.id).update(set__first_name='Alicia')
+        second = identity.load_user(str(doctor.id))
+        assert second is not first and second.first_name == 'Alice'
+        assert identity.cache_stats()['hits'] >= 1
+        print("✅ Second load served from the cache")
+
+        second.bio = "Cardiologist"
+        assert identity.load_user(str(doctor.id)).bio is None
+        print("✅ Each load gets a document of its own")
+
+        second.is_active = False
+        second.save()
+        reloaded = identity.load_user(str(doctor.id))
+        assert reloaded.first_name == 'Alicia' and reloaded.bio == "Cardiologist" and not reloaded.is_active
+        print("✅ Saving the user drops its cache entry")
+
+        reloaded.delete()
+        assert identity.load_user(str(doctor.id)) is None
+        print("✅ Deleted users are not loaded")
+
+if __name__ == "__main__":
+    test_cached_user_loader()
+    print("\n🎉 ALL USER CACHE TESTS PASSED!")
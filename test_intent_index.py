@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Test script for the precompiled intent index used by HealthChatbotModel.
+"""
+
+import sys
+import os
+from difflib import SequenceMatcher
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_INTENTS = {
+    "intents": [
+        {"tag": "greeting", "patterns": ["Hi", "Hello there", "Good morning"], "responses": ["Hello!"]},
+        {"tag": "flu", "patterns": ["What are symptoms of flu", "flu symptoms"], "responses": ["Flu info"]},
+        {"tag": "sleep", "patterns": ["I cannot sleep", "tips for better sleep"], "responses": ["Sleep info"]},
+        {"tag": "goodbye", "patterns": ["Bye", "See you later"], "responses": ["Goodbye!"]}
+    ]
+}
+
+def simple_tokenize(sentence):
+    return [word.lower() for word in sentence.replace('?', ' ').split()]
+
+def full_scan(tokens, threshold=0.5):
+    """Reference implementation: score every pattern like the original get_response"""
+    query = ' '.join(tokens)
+    best, best_score = None, threshold
+    for intent in SAMPLE_INTENTS['intents']:
+        for pattern in intent['patterns']:
+            score = SequenceMatcher(None, query, ' '.join(simple_tokenize(pattern))).ratio()
+            if score > best_score:
+                best, best_score = intent, score
+    return best
+
+def test_index_structure():
+    """Test that patterns are normalized once and indexed by token"""
+    print("🔧 Testing Intent Index Structure")
+    print("=" * 40)
+
+    from intent_index import IntentIndex
+    index = IntentIndex(SAMPLE_INTENTS, simple_tokenize)
+
+    assert len(index) == 9
+    assert index.pattern_texts[3] == 'what are symptoms of flu'
+    assert sorted(index.candidates(['flu'])) == [3, 4]
+    assert sorted(index.candidates(['sleep'])) == [5, 6]
+    print("✅ Patterns and postings built correctly")
+
+    assert sorted(index.candidates(['flu', 'sleep'])) == [3, 4, 5, 6]
+    assert index.candidates(['unknown']) == []
+    print("✅ Candidate pruning works")
+
+    # "flu symptoms" shares both tokens, the longer pattern only dilutes them
+    assert index.candidates(['flu', 'symptoms']) == [4, 3]
+    print("✅ Candidates ranked by TF-IDF score")
+
+def test_best_match_agrees_with_full_scan():
+    """Test that shortlisted scoring picks the same intent as a full scan"""
+    print("🔧 Testing Intent Index Matching")
+    print("=" * 40)
+
+    from intent_index import IntentIndex
+    index = IntentIndex(SAMPLE_INTENTS, simple_tokenize)
+
+    queries = ["hi", "hello", "what are the symptoms of flu?", "symptoms flu",
+               "i cannot sleep at night", "better sleep tips", "bye", "see you",
+               # No token in common with their best pattern
+               "hell", "good mornin", "sleeping tip"]
+    for query in queries:
+        tokens = simple_tokenize(query)
+        intent, score = index.best_match(tokens)
+        expected = full_scan(tokens)
+        assert intent is expected, query
+        print(f"✅ '{query}' -> {intent['tag'] if intent else None} ({score:.2f})")
+
+    assert index.candidates(simple_tokenize("hell")) == []
+    assert index.best_match(simple_tokenize("hell"))[0]['tag'] == 'greeting'
+    print("✅ Patterns without a shared token still scored when they can win")
+
+    intent, score = index.best_match(simple_tokenize("quantum chromodynamics"))
+    assert intent is None and score == 0.0
+    print("✅ Unrelated input has no match")
+
+def test_batch_matches_agree_with_single_matches():
+    """Test that the vectorized batch path returns the same matches as single queries"""
+    print("🔧 Testing Batch Intent Matching")
+    print("=" * 40)
+
+    from intent_index import IntentIndex
+    index = IntentIndex(SAMPLE_INTENTS, simple_tokenize)
+    index.BATCH_CHUNK_SIZE = 3
+
+    queries = ["hi", "flu symptoms?", "", "i cannot sleep", "quantum chromodynamics", "see you later", "hello there"]
+    token_lists = [simple_tokenize(query) for query in queries]
+    assert index.best_matches(token_lists) == [index.best_match(tokens) for tokens in token_lists]
+    print(f"✅ {len(queries)} queries matched in chunks of {index.BATCH_CHUNK_SIZE}")
+
+def test_model_get_responses():
+    """Test HealthChatbotModel.get_responses against per-message responses"""
+    print("🔧 Testing HealthChatbotModel Batch Responses")
+    print("=" * 40)
+
+    from learning_model import HealthChatbotModel
+    model = HealthChatbotModel()
+    model.tokenize = simple_tokenize
+    model.intents = SAMPLE_INTENTS
+    model.compile_index()
+
+    messages = ["Hi", "hi", "what are symptoms of flu", "xyzzy"]
+    responses = model.get_responses(messages)
+    assert responses == ["Hello!", "Hello!", "Flu info", "I'm not sure I understand. Could you please rephrase that?"]
+    assert responses == [model.get_response(message) for message in messages]
+    print("✅ Batch responses match single responses")
+
+def test_response_cache():
+    """Test LRU eviction, hit/miss counters and invalidation on reload"""
+    print("🔧 Testing Chat Response Cache")
+    print("=" * 40)
+
+    from cache import LRUCache
+    cache = LRUCache(maxsize=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.stats()['evictions'] == 1 and cache.hits == 1 and cache.misses == 1
+    print("✅ Least recently used entry evicted")
+
+    from learning_model import HealthChatbotModel
+    model = HealthChatbotModel(cache_size=8)
+    model.tokenize = simple_tokenize
+    model.intents = SAMPLE_INTENTS
+    model.compile_index()
+
+    assert model.get_response("What are symptoms of flu") == "Flu info"
+    assert model.get_response("what are symptoms of flu?") == "Flu info"
+    stats = model.response_cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['size'] == 1
+    print("✅ Inputs normalizing to the same tokens share an entry")
+
+    # Only stop words tell these apart, they must not share an entry
+    assert model.get_response("I cannot sleep") == "Sleep info"
+    assert model.get_response("I sleep") == "Sleep info"
+    stats = model.response_cache.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 3 and stats['size'] == 3
+    print("✅ Inputs differing in stop words matched separately")
+
+    model.compile_index()
+    assert len(model.response_cache) == 0
+    assert model.get_response("symptoms flu") == "Flu info"
+    assert model.response_cache.misses == 4
+    print("✅ Reloading intents invalidates the cache")
+
+def test_fuzzy_correction():
+    """Test the BK-tree corrector and typo-tolerant matching"""
+    print("🔧 Testing Fuzzy Token Correction")
+    print("=" * 40)
+
+    from fuzzy import levenshtein, BKTree
+    assert levenshtein('fevr', 'fever') == 1
+    assert levenshtein('hedache', 'headache') == 1
+    assert levenshtein('diabetis', 'diabetes') == 1
+    assert levenshtein('kitten', 'sitting') == 3
+    assert levenshtein('', 'abc') == 3
+
+    words = ['fever', 'flu', 'headache', 'diabetes', 'sleep', 'stress', 'symptoms', 'sleepy', 'steep']
+    tree = BKTree(words)
+    for query in ['fevr', 'sleap', 'symtoms', 'xyz', 'steps']:
+        expected = sorted((levenshtein(query, word), word) for word in words if levenshtein(query, word) <= 2)
+        assert tree.search(query, 2) == expected, query
+    print("✅ BK-tree search agrees with a linear scan")
+
+    from intent_index import IntentIndex
+    index = IntentIndex(SAMPLE_INTENTS, simple_tokenize)
+    assert index.correct(['symtoms', 'fluu', 'flo', 'sleeep', 'helo', 'xyzzy']) == \
+        ['symptoms', 'flu', 'flo', 'sleep', 'hello', 'xyzzy']
+    print("✅ Unknown tokens corrected, short and hopeless ones kept")
+
+    from learning_model import HealthChatbotModel
+    model = HealthChatbotModel(cache_size=8)
+    model.tokenize = simple_tokenize
+    model.intents = SAMPLE_INTENTS
+    assert model.get_response("symtoms of flu") == "Flu info"
+    assert model.get_response("symptoms of flu") == "Flu info"
+    assert model.response_cache.hits == 1
+    assert model.get_responses(["i canot sleeep"]) == ["Sleep info"]
+    print("✅ Misspelled input matches and shares the cache entry")
+
+def test_saved_artifact():
+    """Test that a saved index is memory-mapped back and detected as stale"""
+    print("🔧 Testing Precompiled Intent Artifact")
+    print("=" * 40)
+
+    import json
+    import mmap
+    import tempfile
+    from learning_model import HealthChatbotModel
+
+    def make_model():
+        model = HealthChatbotModel()
+        model.tokenize = simple_tokenize
+        return model
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = os.path.join(directory, 'intent_index.bin')
+        intents_path = os.path.join(directory, 'intents.json')
+        model = make_model()
+        model.intents = SAMPLE_INTENTS
+        model.save_model(model_path, intents_path)
+
+        loaded = make_model()
+        assert loaded.load_saved_model(model_path, intents_path)
+        assert loaded.intents is None
+        assert isinstance(loaded.index.token_weights.base.obj, mmap.mmap)
+        # Tokens and pattern texts are looked up in the mapped pages, not copied out of them
+        for table in (loaded.index.vocabulary, loaded.index.pattern_texts):
+            assert isinstance(table.data.base.obj, mmap.mmap)
+        assert loaded.index.vocabulary.position('flu') == model.index.vocabulary.position('flu') is not None
+        assert 'influenza' not in loaded.index.vocabulary
+        print("✅ Index memory-mapped without parsing the intents")
+
+        queries = ["hi", "flu symptoms", "i cannot sleep", "xyzzy", "see you later"]
+        assert loaded.get_responses(queries) == model.get_responses(queries)
+        assert [loaded.get_response(query) for query in queries] == model.get_responses(queries)
+        assert loaded.index.best_matches([simple_tokenize(q) for q in queries])[1] == \
+            ({'tag': 'flu', 'responses': ['Flu info']}, 1.0)
+        print("✅ Mapped index answers like the built one")
+
+        changed = dict(SAMPLE_INTENTS, intents=SAMPLE_INTENTS['intents'][:2])
+        with open(intents_path, 'w', encoding='utf-8') as f:
+            json.dump(changed, f)
+        stale = make_model()
+        assert stale.load_saved_model(model_path, intents_path)
+        assert stale.intents == changed and stale.get_response("i cannot sleep") == stale.choose_response(None)
+        print("✅ Stale artifact falls back to the intents file")
+
+        # Rebuilding the artifact leaves the edited intents file as it is
+        with open(intents_path, 'rb') as f:
+            edited = f.read()
+        stale.save_artifact(model_path, intents_path)
+        with open(intents_path, 'rb') as f:
+            assert f.read() == edited
+        rebuilt = make_model()
+        assert rebuilt.load_saved_model(model_path, intents_path) and rebuilt.intents is None
+        assert rebuilt.get_response("flu symptoms") == "Flu info"
+        print("✅ Artifact rebuilt from the intents file without rewriting it")
+
+def test_hot_reload():
+    """Test that reloads swap the index atomically while requests are served"""
+    print("🔧 Testing Intent Hot Reload")
+    print("=" * 40)
+
+    import json
+    import tempfile
+    import threading
+    import time
+    from learning_model import HealthChatbotModel
+
+    updated = {"intents": SAMPLE_INTENTS["intents"] + [
+        {"tag": "water", "patterns": ["how much water should i drink"], "responses": ["Water info"]}
+    ]}
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = os.path.join(directory, 'intent_index.bin')
+        intents_path = os.path.join(directory, 'intents.json')
+        model = HealthChatbotModel()
+        model.tokenize = simple_tokenize
+        model.intents = SAMPLE_INTENTS
+        model.save_model(model_path, intents_path)
+        unknown = model.choose_response(None)
+
+        answers = set()
+        stop = threading.Event()
+
+        def ask():
+            while not stop.is_set():
+                answers.add(model.get_response("how much water should i drink"))
+                answers.add(model.get_response("flu symptoms"))
+
+        readers = [threading.Thread(target=ask) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        for intents in (updated, SAMPLE_INTENTS, updated):
+            model.reload(intents, model_path, intents_path)
+        stop.set()
+        for reader in readers:
+            reader.join()
+        assert answers <= {unknown, "Water info", "Flu info"}
+        assert model.get_response("how much water should i drink") == "Water info"
+        print("✅ Readers only ever saw complete indexes")
+
+        with open(intents_path, encoding='utf-8') as f:
+            assert json.load(f) == updated
+        metrics = model.metrics()
+        assert metrics['index']['patterns'] == 10 and metrics['index']['intents'] == 5
+        assert metrics['reload']['reloads'] == 3 and metrics['reload']['last_duration_seconds'] >= 0
+        print(f"✅ Uploaded intents saved, reload took {metrics['reload']['last_duration_seconds']}s")
+
+        assert model.reload_async({"intents": [{"tag": "broken"}]}, model_path, intents_path)
+        deadline = time.time() + 5
+        while model.reload_stats['failures'] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert model.reload_stats['failures'] == 1 and model.metrics()['index']['patterns'] == 10
+        print("✅ Invalid intents leave the current index in place")
+
+        model.watch(0.02, model_path, intents_path)
+        with open(intents_path, 'w', encoding='utf-8') as f:
+            json.dump(SAMPLE_INTENTS, f)
+        deadline = time.time() + 5
+        while model.get_response("how much water should i drink") != unknown and time.time() < deadline:
+            time.sleep(0.02)
+        assert model.get_response("how much water should i drink") == unknown
+        assert model.metrics()['index']['source'] == 'built'
+        print("✅ Watcher reloaded the edited intents file")
+
+if __name__ == "__main__":
+    test_index_structure()
+    test_best_match_agrees_with_full_scan()
+    test_batch_matches_agree_with_single_matches()
+    test_model_get_responses()
+    test_response_cache()
+    test_fuzzy_correction()
+    test_saved_artifact()
+    test_hot_reload()
+    print("\n🎉 ALL INTENT INDEX TESTS PASSED!")
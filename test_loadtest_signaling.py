@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Test script for the delivery accounting of the signaling load test.
+"""
+
+import sys
+import os
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def test_deliveries_matched_in_order():
+    """Test that receipts are matched to the emits of their sender, in order"""
+    print("🔧 Testing Signaling Deliveries")
+    print("=" * 40)
+
+    from loadtest_signaling import Deliveries
+    deliveries = Deliveries()
+    deliveries.sent('doctor', 'offer', receivers=2)
+    deliveries.sent('doctor', 'mute_audio', receivers=2)
+    deliveries.sent('patient', 'offer', receivers=2)
+    assert deliveries.expected == 6
+
+    deliveries.received('patient', 'doctor', 'offer')
+    deliveries.received('patient', 'doctor', 'user_muted')
+    deliveries.received('nurse', 'doctor', 'offer')
+    deliveries.received('doctor', 'patient', 'offer')
+    assert len(deliveries.latencies) == 4 and all(latency >= 0 for latency in deliveries.latencies)
+    print("✅ Receipts matched per sender, event and receiver")
+
+    # A second offer was never emitted by the doctor
+    deliveries.received('patient', 'doctor', 'offer')
+    assert deliveries.unexpected == 1
+    assert deliveries.expected - len(deliveries.latencies) == 2
+    print("✅ Unexpected receipts and missing deliveries counted")
+
+if __name__ == "__main__":
+    test_deliveries_matched_in_order()
+    print("\n🎉 ALL SIGNALING LOAD TEST TESTS PASSED!")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script to verify that NLTK resources are loaded lazily and never downloaded.
+"""
+
+import sys
+import os
+import importlib
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def test_no_download_on_import_or_use():
+    """Test that importing and using the chatbots never calls nltk.download"""
+    print("🔧 Testing Offline NLTK Loading")
+    print("=" * 40)
+
+    import nltk
+    original_download = nltk.download
+
+    def fail_download(*args, **kwargs):
+        raise AssertionError(f"nltk.download called with {args}")
+
+    nltk.download = fail_download
+    try:
+        import nltk_resources
+        import learning_model
+        import chatbot
+        importlib.reload(learning_model)
+        importlib.reload(chatbot)
+        print("✅ Modules import without downloading")
+
+        tokens = nltk_resources.word_tokenize("What are flu symptoms?")
+        assert tokens[:4] == ['What', 'are', 'flu', 'symptoms']
+        assert nltk_resources.get_lemmatizer().lemmatize('symptoms') in ('symptom', 'symptoms')
+        assert isinstance(nltk_resources.get_stop_words(), frozenset)
+        print(f"✅ Resources resolved locally: {nltk_resources.status()}")
+    finally:
+        nltk.download = original_download
+
+def test_artifact_loads_without_importing_nltk():
+    """Test that checking and mapping a saved intent index leaves nltk unimported"""
+    print("🔧 Testing NLTK-Free Artifact Loading")
+    print("=" * 40)
+
+    import subprocess
+    import tempfile
+    import nltk
+    import nltk_resources
+    from learning_model import HealthChatbotModel
+
+    assert nltk_resources.default_data_path() == nltk.data.path
+    print("✅ Data path resolved like nltk.data.path")
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = os.path.join(directory, 'intent_index.bin')
+        intents_path = os.path.join(directory, 'intents.json')
+        model = HealthChatbotModel()
+        model.intents = {"intents": [{"tag": "greeting", "patterns": ["Hello there"], "responses": ["Hello!"]}]}
+        model.save_model(model_path, intents_path)
+
+        script = (
+            "import sys\n"
+            "from learning_model import HealthChatbotModel\n"
+            "model = HealthChatbotModel()\n"
+            f"assert model.load_saved_model({model_path!r}, {intents_path!r})\n"
+            "assert model.index is not None and model.index.source is not None\n"
+            "assert 'nltk' not in sys.modules\n"
+        )
+        subprocess.run([sys.executable, '-c', script], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    print("✅ Artifact mapped without importing nltk")
+
+if __name__ == "__main__":
+    test_no_download_on_import_or_use()
+    test_artifact_loads_without_importing_nltk()
+    print("\n🎉 ALL NLTK RESOURCE TESTS PASSED!")
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Test script for sending notifications to many users with one insert.
+"""
+
+import sys
+import os
+from unittest import mock
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import mock_database, make_user
+
+def test_notify_many():
+    """Test that a group of notifications is validated up front and written in one round-trip"""
+    print("🔧 Testing Bulk Notifications")
+    print("=" * 40)
+
+    with mock_database():
+        from mongoengine import ValidationError
+        from models import Notification, NotificationType, UserRole
+        from notifications import notify_many, send_notifications
+
+        users = [make_user(f'patient{n}', 'Pat', f'Doe{n}', UserRole.PATIENT) for n in range(5)]
+        # MongoEngine inserts through a copy of the collection, so the class is watched
+        collection_class = type(Notification._get_collection())
+        with mock.patch.object(collection_class, 'insert_many', autospec=True,
+                               side_effect=collection_class.insert_many) as insert_many, \
+                mock.patch.object(collection_class, 'insert_one', autospec=True,
+                                  side_effect=collection_class.insert_one) as insert_one:
+            sent = notify_many(users, title="Incoming Call", message="Dr. Smith is calling you",
+                               related_id='call-1')
+            assert insert_many.call_count == 1 and insert_one.call_count == 0
+        assert all(notification.id for notification in sent)
+        stored = Notification.objects(related_id='call-1')
+        assert sorted(n.user.last_name for n in stored) == [f'Doe{n}' for n in range(5)]
+        assert {n.notification_type for n in stored} == {NotificationType.SYSTEM}
+        print(f"✅ {len(sent)} notifications in one insert")
+
+        assert notify_many([], title="Nobody", message="Nothing") == []
+        with pytest.raises(ValidationError):
+            send_notifications([Notification(user=users[0], title="Fine", message="ok"),
+                                Notification(user=users[1], title="No message")])
+        assert Notification.objects.count() == 5
+        print("✅ Invalid batch rejected before anything is written")
+
+if __name__ == "__main__":
+    test_notify_many()
+    print("\n🎉 ALL NOTIFICATION TESTS PASSED!")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script for loading the users referenced by a page of documents at once.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+import pytest
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import mock_database, make_user
+
+def test_attach_users():
+    """Test that references of a page are resolved by one query, without per-row dereferencing"""
+    print("🔧 Testing Bulk User Loading")
+    print("=" * 40)
+
+    with mock_database():
+        from mongoengine import DoesNotExist
+        from models import User, Appointment, Call, CallType, UserRole
+        from query_utils import attach_users, user_reference_fields
+
+        doctor = make_user('drsmith', 'Alice', 'Smith', UserRole.DOCTOR)
+        patients = [make_user(f'patient{n}', f'Pat{n}', 'Doe', UserRole.PATIENT) for n in range(3)]
+        for day, patient in enumerate(patients, start=1):
+            Appointment(patient=patient, doctor=doctor, appointment_date=datetime(2024, 1, day)).save()
+        Call(initiator=doctor, participants=patients, call_type=CallType.VIDEO,
+             room_id='room-1', call_title='Rounds').save()
+        gone = make_user('gone', 'Gone', 'User', UserRole.PATIENT)
+        Appointment(patient=gone, doctor=doctor, appointment_date=datetime(2024, 1, 9)).save()
+        gone.delete()
+
+        assert user_reference_fields(Appointment) == ['patient', 'doctor']
+        assert user_reference_fields(Call) == ['initiator', 'participants']
+        assert attach_users([]) == []
+
+        appointments = attach_users(Appointment.objects.order_by('appointment_date'))
+        calls = attach_users(Call.objects)
+        # Any dereference left would now fail, the users are no longer stored
+        User._get_collection().delete_many({})
+
+        assert [a.patient.get_full_name() for a in appointments[:3]] == ['Pat0 Doe', 'Pat1 Doe', 'Pat2 Doe']
+        assert {a.doctor.email for a in appointments} == {'drsmith@example.com'}
+        assert appointments[0].doctor.is_doctor() and appointments[0].patient.is_patient()
+        # Only the display fields are loaded
+        assert appointments[0].doctor.password_hash is None
+        print("✅ Appointment patients and doctors attached")
+
+        assert calls[0].initiator.username == 'drsmith'
+        assert [user.first_name for user in calls[0].participants] == ['Pat0', 'Pat1', 'Pat2']
+        print("✅ List references attached")
+
+        with pytest.raises(DoesNotExist):
+            appointments[3].patient
+        print("✅ Reference to a deleted user left unresolved")
+
+def test_keyset_pages():
+    """Test that cursor pages cover every document once, in order, ties included"""
+    print("🔧 Testing Keyset Pagination")
+    print("=" * 40)
+
+    with mock_database():
+        from models import SystemLog, Notification
+        from query_utils import keyset_page, decode_cursor
+
+        # Several logs share a timestamp, the id breaks the tie
+        stamps = [datetime(2024, 1, 1, 12, minute // 3) for minute in range(23)]
+        SystemLog.objects.insert([SystemLog(action=f'action {n}', created_at=stamp) for n, stamp in enumerate(stamps)])
+        SystemLog(action='undated').save()
+        SystemLog.objects(action='undated').update_one(unset__created_at=True)
+        expected = [log.id for log in SystemLog.objects.order_by('-created_at', '-id')]
+
+        seen = []
+        cursor = None
+        pages = 0
+        while True:
+            logs, cursor = keyset_page(SystemLog.objects, cursor, per_page=5)
+            seen.extend(log.id for log in logs)
+            pages += 1
+            if cursor is None:
+                break
+        assert seen == expected and len(seen) == 24 and pages == 5
+        print(f"✅ {len(seen)} logs in {pages} pages, undated last")
+
+        logs, cursor = keyset_page(SystemLog.objects(action__ne='undated'), None, per_page=23)
+        assert len(logs) == 23 and cursor is None
+        with pytest.raises(ValueError):
+            keyset_page(SystemLog.objects, 'not-a-cursor')
+        with pytest.raises(ValueError):
+            decode_cursor('WyJ4IiwgIjEiXQ')
+        print("✅ Last page has no cursor, invalid cursors rejected")
+
+        index_keys = [info['key'] for info in SystemLog._get_collection().index_information().values()]
+        assert [('created_at', -1), ('_id', -1)] in index_keys
+        assert [('user', 1), ('created_at', -1), ('_id', -1)] in \
+            [info['key'] for info in Notification._get_collection().index_information().values()]
+        print("✅ Pages backed by (created_at, _id) indexes")
+
+if __name__ == "__main__":
+    test_attach_users()
+    test_keyset_pages()
+    print("\n🎉 ALL QUERY UTILS TESTS PASSED!")
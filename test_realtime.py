@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test script for pushing new notifications and messages over Socket.IO.
+"""
+
+import sys
+import os
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import mock_database, make_user
+
+def test_push_to_user_rooms():
+    """Test that saved and bulk inserted documents reach the room of their user only"""
+    print("🔧 Testing Real-time Push")
+    print("=" * 40)
+
+    with mock_database():
+        from flask import Flask, request
+        from flask_socketio import SocketIO, join_room
+        from models import Notification, Message, UserRole
+        from notifications import notify_many
+        from realtime import user_room
+
+        app = Flask(__name__)
+        socketio = SocketIO(app)
+
+        # The app joins the room of current_user; here the user is passed along
+        @socketio.on('connect')
+        def handle_connect():
+            join_room(user_room(request.args['user']))
+
+        doctor = make_user('drsmith', 'Alice', 'Smith', UserRole.DOCTOR)
+        patients = [make_user(f'patient{n}', 'Pat', f'Doe{n}', UserRole.PATIENT) for n in range(3)]
+        clients = [socketio.test_client(app, query_string=f'user={patient.id}') for patient in patients]
+
+        # Outside the app nothing is pushed, and nothing breaks
+        Notification(user=patients[0], title="Offline", message="Not pushed").save()
+        assert clients[0].get_received() == []
+
+        with app.app_context():
+            notification = Notification(user=patients[0], title="Appointment", message="Booked").save()
+            received = clients[0].get_received()
+            assert [event['name'] for event in received] == ['notification']
+            assert received[0]['args'][0]['id'] == str(notification.id)
+            assert clients[1].get_received() == []
+            print("✅ Saved notification pushed to its user")
+
+            notification.is_read = True
+            notification.save()
+            assert clients[0].get_received() == []
+            print("✅ Updates are not pushed again")
+
+            notify_many(patients[1:], title="Incoming Call", message="Dr. Smith is calling you")
+            for client in clients[1:]:
+                received = client.get_received()
+                assert [event['args'][0]['title'] for event in received] == ["Incoming Call"]
+            print("✅ Bulk inserted notifications pushed to each user")
+
+            Message(sender=doctor, recipient=patients[2], subject="Results", content="All clear").save()
+            received = clients[2].get_received()
+            assert received[0]['name'] == 'new_message'
+            assert received[0]['args'][0]['sender_id'] == str(doctor.id)
+            print("✅ New message pushed to its recipient")
+
+        for client in clients:
+            client.disconnect()
+
+if __name__ == "__main__":
+    test_push_to_user_rooms()
+    print("\n🎉 ALL REAL-TIME TESTS PASSED!")
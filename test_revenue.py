@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script for the server-side revenue totals and their TTL cache.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import mock_database, make_user
+
+def test_ttl_cache():
+    """Test that entries expire after the TTL and expirations count as misses"""
+    print("🔧 Testing TTL Cache")
+    print("=" * 40)
+
+    from cache import TTLCache
+    now = [100.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.put('a', 1)
+    now[0] += 9.9
+    assert cache.get('a') == 1
+    now[0] += 0.1
+    assert cache.get('a') is None and len(cache) == 0
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations'], stats['ttl']) == (1, 1, 1, 10)
+    print(f"✅ Entry expired after its TTL: {stats}")
+
+def test_revenue_summary():
+    """Test that revenue totals are grouped by the database and cached"""
+    print("🔧 Testing Revenue Totals")
+    print("=" * 40)
+
+    with mock_database():
+        from models import Payment, PaymentMethod, PaymentStatus, UserRole
+        import revenue
+
+        smith = make_user('drsmith', 'Alice', 'Smith', UserRole.DOCTOR)
+        jones = make_user('drjones', 'Bob', 'Jones', UserRole.DOCTOR)
+        patient = make_user('jdoe', 'John', 'Doe', UserRole.PATIENT)
+
+        def pay(doctor, amount, paid_on, status=PaymentStatus.PAID, currency='USD'):
+            Payment(patient=patient, doctor=doctor, amount=amount, currency=currency, status=status,
+                    payment_method=PaymentMethod.CASH, payment_date=paid_on).save()
+
+        pay(smith, 50.0, datetime(2024, 1, 10))
+        pay(smith, 25.0, datetime(2024, 2, 1), currency='EUR')
+        pay(jones, 100.0, datetime(2024, 2, 15))
+        pay(jones, 999.0, datetime(2024, 2, 20), status=PaymentStatus.PENDING)
+
+        revenue.invalidate()
+        summary = revenue.revenue_summary()
+        assert summary['total'] == 175.0 and summary['count'] == 3
+        assert summary['by_doctor'] == {str(smith.id): 75.0, str(jones.id): 100.0}
+        assert summary['by_month'] == {'2024-01': 50.0, '2024-02': 125.0}
+        assert summary['by_currency'] == {'USD': 150.0, 'EUR': 25.0}
+        print(f"✅ Totals grouped server-side: {summary['by_month']}")
+
+        pay(jones, 10.0, datetime(2024, 3, 1))
+        assert revenue.total_revenue() == 175.0
+        revenue.invalidate()
+        assert revenue.total_revenue() == 185.0
+        print("✅ Cached until invalidated")
+
+if __name__ == "__main__":
+    test_ttl_cache()
+    test_revenue_summary()
+    print("\n🎉 ALL REVENUE TESTS PASSED!")
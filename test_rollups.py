@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script for the incremental daily rollups in the Analytics collection.
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import mock_database, make_user
+
+def rows(metric_name):
+    from models import Analytics
+    return {(row.metric_date.isoformat(), row.category): row.metric_value
+            for row in Analytics.objects(metric_name=metric_name)}
+
+def test_incremental_rollups():
+    """Test that runs only recompute the days of changed documents and keep them exact"""
+    print("🔧 Testing Daily Rollups")
+    print("=" * 40)
+
+    import rollups
+    overlap = rollups.WATERMARK_OVERLAP
+    # Without the look-back, documents written by this test just before a run are not seen again
+    rollups.WATERMARK_OVERLAP = timedelta(0)
+    try:
+        check_incremental_rollups()
+    finally:
+        rollups.WATERMARK_OVERLAP = overlap
+
+def check_incremental_rollups():
+    with mock_database():
+        from models import (Appointment, AppointmentStatus, ChatMessage, Payment, PaymentMethod,
+                            PaymentStatus, RollupWatermark, UserRole)
+        from rollups import refresh_rollups, mark_stale
+
+        doctor = make_user('drsmith', 'Alice', 'Smith', UserRole.DOCTOR)
+        patient = make_user('jdoe', 'John', 'Doe', UserRole.PATIENT)
+        first = Appointment(patient=patient, doctor=doctor, appointment_date=datetime(2024, 1, 5, 9)).save()
+        Appointment(patient=patient, doctor=doctor, appointment_date=datetime(2024, 1, 5, 15)).save()
+        Appointment(patient=patient, doctor=doctor, appointment_date=datetime(2024, 1, 6, 9)).save()
+        Payment(patient=patient, doctor=doctor, amount=40.0, payment_method=PaymentMethod.CASH,
+                status=PaymentStatus.PAID).save()
+        Payment(patient=patient, doctor=doctor, amount=60.0, payment_method=PaymentMethod.CASH,
+                status=PaymentStatus.PAID, payment_date=datetime(2024, 1, 7, 10)).save()
+        Payment(patient=patient, doctor=doctor, amount=99.0, payment_method=PaymentMethod.CASH).save()
+        # ObjectIds only tell the second of insertion, this one is well before the first run
+        ChatMessage(id=ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=5)),
+                    user=patient, message='hi', response='hello').save()
+
+        assert refresh_rollups() == {'new_users': None, 'appointments': None, 'revenue': None, 'chat_messages': None}
+        assert rows('appointments') == {('2024-01-05', 'scheduled'): 2, ('2024-01-06', 'scheduled'): 1}
+        # By the day paid, the day created when that is unknown
+        assert rows('revenue') == {(datetime.utcnow().date().isoformat(), str(doctor.id)): 40.0,
+                                   ('2024-01-07', str(doctor.id)): 60.0}
+        assert sorted(category for _, category in rows('new_users')) == ['doctor', 'patient']
+        assert sum(rows('chat_messages').values()) == 1
+        print("✅ First run rolls up everything")
+
+        assert set(refresh_rollups().values()) == {0}
+        first.status = AppointmentStatus.CANCELLED
+        first.save()
+        assert refresh_rollups()['appointments'] == 1
+        assert rows('appointments') == {('2024-01-05', 'scheduled'): 1, ('2024-01-05', 'cancelled'): 1,
+                                        ('2024-01-06', 'scheduled'): 1}
+        print("✅ Only the day of the changed appointment recomputed")
+
+        # Appointments that stopped changing are not rescanned
+        RollupWatermark.objects(name='appointments').update_one(set__last_run_at=datetime(2100, 1, 1))
+        Appointment.objects(id=first.id).update_one(set__status=AppointmentStatus.COMPLETED.value)
+        assert refresh_rollups()['appointments'] == 0
+        assert rows('appointments')[('2024-01-05', 'cancelled')] == 1
+
+        patient.role = UserRole.ADMIN
+        patient.save()
+        assert refresh_rollups()['new_users'] == 1
+        assert sorted(category for _, category in rows('new_users')) == ['admin', 'doctor']
+        print("✅ Role change recounted on the registration day")
+
+        doctor_created = doctor.created_at
+        doctor.delete()
+        mark_stale('new_users', doctor_created)
+        assert refresh_rollups()['new_users'] == 1
+        assert [category for _, category in rows('new_users')] == ['admin']
+        assert RollupWatermark.objects.get(name='new_users').stale_days == []
+        print("✅ Deleted user recounted through a stale day")
+
+        refresh_rollups(rebuild=True)
+        assert rows('appointments')[('2024-01-05', 'completed')] == 1
+        print("✅ Rebuild recomputes everything")
+
+        # Inserted by the chat writer long after it was created, i.e. behind the watermark
+        ChatMessage(user=patient, message='late', response='reply', created_at=datetime(2024, 1, 5, 9)).save()
+        assert refresh_rollups()['chat_messages'] == 1
+        assert rows('chat_messages')[('2024-01-05', None)] == 1
+        print("✅ Chat messages written late still counted")
+
+        from rollups import refresh_async
+        ChatMessage(user=patient, message='bye', response='goodbye').save()
+        refresh_async().join(timeout=10)
+        assert sum(rows('chat_messages').values()) == 3
+        print("✅ Refreshed in the background")
+
+def test_concurrent_upserts_retried():
+    """Test that an upsert losing the race to another process is retried, other errors are not"""
+    print("🔧 Testing Concurrent Rollup Writes")
+    print("=" * 40)
+
+    import pytest
+    from pymongo.errors import BulkWriteError, DuplicateKeyError
+    from rollups import retry_duplicates
+
+    attempts = []
+
+    def write():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise BulkWriteError({'writeErrors': [{'code': 11000, 'errmsg': 'duplicate key'}]})
+        return 'written'
+
+    assert retry_duplicates(write) == 'written' and len(attempts) == 2
+    print("✅ Duplicate key retried as an update")
+
+    def fail():
+        raise BulkWriteError({'writeErrors': [{'code': 121, 'errmsg': 'validation failed'}]})
+
+    with pytest.raises(BulkWriteError):
+        retry_duplicates(fail)
+
+    def always_duplicate():
+        raise DuplicateKeyError('duplicate key', 11000)
+
+    with pytest.raises(DuplicateKeyError):
+        retry_duplicates(always_duplicate)
+    print("✅ Other errors and repeated conflicts raised")
+
+if __name__ == "__main__":
+    test_incremental_rollups()
+    test_concurrent_upserts_retried()
+    print("\n🎉 ALL ROLLUP TESTS PASSED!")
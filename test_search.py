@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for the indexed keyword search used by the admin list pages.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import mock_database, make_user
+
+def test_index_terms():
+    """Test that names are indexed with prefixes and free text by whole words"""
+    print("🔧 Testing Search Terms")
+    print("=" * 40)
+
+    from search import index_terms
+    terms = index_terms(names=['Jane', 'jane.doe@example.com'], texts=['Severe headaches, at night'])
+    assert {'j', 'ja', 'jan', 'jane', 'doe', 'exa', 'example', 'com'} <= set(terms)
+    assert {'severe', 'headaches', 'at', 'night'} <= set(terms)
+    assert 'head' not in terms and 'sev' not in terms
+    assert terms == sorted(set(terms))
+    print(f"✅ {len(terms)} terms built")
+
+def test_admin_search_queries():
+    """Test that searches are single indexed queries over denormalized names"""
+    print("🔧 Testing Indexed Admin Search")
+    print("=" * 40)
+
+    with mock_database():
+        from models import User, Appointment, Message, UserRole
+        from search import apply_search, sync_user_names, reindex_all
+
+        doctor = make_user('drsmith', 'Alice', 'Smith', UserRole.DOCTOR)
+        patient = make_user('jdoe', 'John', 'Doe', UserRole.PATIENT)
+        other = make_user('mroe', 'Mary', 'Roe', UserRole.PATIENT)
+        Appointment(patient=patient, doctor=doctor, appointment_date=datetime(2024, 1, 5),
+                    symptoms='Persistent cough and fever').save()
+        Appointment(patient=other, doctor=doctor, appointment_date=datetime(2024, 1, 6),
+                    symptoms='Knee pain').save()
+        Message(sender=doctor, recipient=patient, subject='Lab results', content='All values normal').save()
+
+        assert 'search_terms_1' in User._get_collection().index_information()
+        assert [user.username for user in apply_search(User.objects.order_by('username'), 'smi')] == ['drsmith']
+        assert apply_search(User.objects, 'example').count() == 3
+        assert apply_search(User.objects, '').count() == 3
+        print("✅ Users found by name, email and username prefixes")
+
+        appointments = Appointment.objects.order_by('-appointment_date')
+        assert [a.patient.username for a in apply_search(appointments, 'smith')] == ['mroe', 'jdoe']
+        assert [a.patient.username for a in apply_search(appointments, 'john cough')] == ['jdoe']
+        assert apply_search(appointments, 'john knee').count() == 0
+        assert apply_search(Message.objects, 'lab jo').count() == 1
+        # Subjects are free text, matched by whole words
+        assert apply_search(Message.objects, 'resul').count() == 0
+        print("✅ Appointments and messages found by denormalized names and text")
+
+        patient.first_name = 'Jonathan'
+        patient.save()
+        assert apply_search(appointments, 'jonathan').count() == 0
+        assert sync_user_names(patient) == 2
+        assert apply_search(appointments, 'jonathan').count() == 1
+        assert apply_search(Message.objects, 'jonathan').count() == 1
+        print("✅ Renamed user synced into referencing documents")
+
+        from unittest import mock
+        from models import AppointmentStatus
+        appointment = apply_search(appointments, 'roe').first()
+        appointment.reload()
+        with mock.patch('models.user_names', side_effect=AssertionError("users read")):
+            appointment.status = AppointmentStatus.CONFIRMED
+            appointment.save()
+        appointment.symptoms = 'Knee pain and swelling'
+        appointment.save()
+        assert apply_search(appointments, 'mary swelling').count() == 1
+        print("✅ Terms only rebuilt when a searched field changed")
+
+        Appointment._get_collection().update_many({}, {'$unset': {'search_terms': 1}})
+        assert apply_search(appointments, 'roe').count() == 0
+        counts = reindex_all()
+        assert counts['Appointment'] == 2 and counts['User'] == 3
+        assert apply_search(appointments, 'roe').count() == 1
+        print(f"✅ Reindexed existing documents: {counts}")
+
+if __name__ == "__main__":
+    test_index_terms()
+    test_admin_search_queries()
+    print("\n🎉 ALL SEARCH TESTS PASSED!")
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test script for Socket.IO rooms spanning workers through a message queue.
+"""
+
+import sys
+import os
+import time
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+def make_worker(channel):
+    """A Socket.IO server recording the packets it sends, like the one of a worker process"""
+    import socketio
+    from socket_queue import queue_options
+
+    # Flask-SocketIO's test client refuses message queues, so the server is driven directly
+    server = socketio.Server(async_mode='threading', **queue_options('local://', channel))
+    server.sent = []
+    server._send_eio_packet = lambda eio_sid, eio_pkt: server.sent.append(
+        (eio_sid, socketio.packet.Packet(encoded_packet=eio_pkt.data).data))
+    server.manager_initialized = True
+    server.manager.initialize()
+    return server
+
+def connect(server, eio_sid, room):
+    """A socket of server in room, as the app's connect handler would have it"""
+    sid = server.manager.connect(eio_sid, '/')
+    server.enter_room(sid, room)
+    return sid
+
+def received(server, eio_sid, timeout=5.0):
+    """[event, data] sent by server to eio_sid, waiting for the queue's listener thread to deliver them"""
+    deadline = time.monotonic() + timeout
+    while True:
+        events = [data for sent_to, data in server.sent if sent_to == eio_sid]
+        if events or time.monotonic() >= deadline:
+            return events
+        time.sleep(0.01)
+
+def test_rooms_span_workers():
+    """Test that emits to a room reach its sockets on every worker on the channel, and only there"""
+    print("🔧 Testing Socket.IO Message Queue")
+    print("=" * 40)
+
+    from socket_queue import queue_options, LocalPubSubManager
+
+    assert queue_options(None) == {}
+    assert queue_options('redis://localhost:6379/0', 'calls') == {'message_queue': 'redis://localhost:6379/0',
+                                                                  'channel': 'calls'}
+    assert isinstance(queue_options('local://')['client_manager'], LocalPubSubManager)
+
+    first, second, other = make_worker('test-rooms'), make_worker('test-rooms'), make_worker('test-other')
+    try:
+        doctor = connect(first, 'doctor', 'call-1')
+        connect(second, 'patient', 'call-1')
+        connect(second, 'outsider', 'call-2')
+        connect(other, 'elsewhere', 'call-1')
+
+        first.emit('offer', {'sdp': 'v=0'}, room='call-1', skip_sid=doctor)
+        assert received(second, 'patient') == [['offer', {'sdp': 'v=0'}]]
+        print("✅ Signaling relayed to a participant on another worker")
+
+        second.emit('notification', {'title': 'Incoming Call'}, room='call-1')
+        assert received(first, 'doctor') == [['notification', {'title': 'Incoming Call'}]]
+        assert len(received(second, 'patient')) == 2
+        print("✅ Pushes reach the room on every worker")
+
+        assert received(second, 'outsider', timeout=0.2) == []
+        assert received(other, 'elsewhere', timeout=0.2) == []
+        print("✅ Not to the sender, other rooms or other channels")
+    finally:
+        for server in (first, second, other):
+            server.manager.close()
+
+if __name__ == "__main__":
+    test_rooms_span_workers()
+    print("\n🎉 ALL MESSAGE QUEUE TESTS PASSED!")
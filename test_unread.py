@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test script for the unread message and notification counters.
+"""
+
+import sys
+import os
+from unittest import mock
+
+# Add the project directory to Python path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conftest import mock_database, make_user
+
+def test_unread_counters():
+    """Test that the counters follow creation, reading and deletion, and match counting"""
+    print("🔧 Testing Unread Counters")
+    print("=" * 40)
+
+    with mock_database():
+        from models import Message, Notification, UnreadCounter, UserRole
+        from notifications import notify_many
+        from unread import unread_counts, reset
+
+        doctor = make_user('drsmith', 'Alice', 'Smith', UserRole.DOCTOR)
+        patient = make_user('patient', 'Pat', 'Doe', UserRole.PATIENT)
+
+        def counted():
+            return {'messages': Message.objects(recipient=patient, is_read=False).count(),
+                    'notifications': Notification.objects(user=patient, is_read=False).count()}
+
+        # Written before the counter exists: counted on first read
+        Message(sender=doctor, recipient=patient, subject="Hello", content="First").save()
+        Message(sender=doctor, recipient=patient, subject="Read", content="Old", is_read=True).save()
+        assert UnreadCounter.objects.count() == 0
+        assert unread_counts(patient) == {'messages': 1, 'notifications': 0}
+        print("✅ Counter created by counting")
+
+        messages = [Message(sender=doctor, recipient=patient, subject="Results", content=f"Report {n}").save()
+                    for n in range(3)]
+        Message(sender=patient, recipient=doctor, subject="Thanks", content="Thank you").save()
+        notify_many([patient, doctor], title="Incoming Call", message="Calling")
+        Notification(user=patient, title="Appointment", message="Booked").save()
+        assert unread_counts(patient) == counted() == {'messages': 4, 'notifications': 2}
+        print("✅ Saves and bulk inserts increment")
+
+        messages[0].mark_as_read()
+        assert messages[0].is_read
+        Message.objects(id=messages[0].id).first().mark_as_read()
+        messages[1].delete()
+        Notification.objects(user=patient, title="Appointment").first().mark_as_read()
+        messages[2].content = "Edited"
+        messages[2].save()
+        assert unread_counts(patient) == counted() == {'messages': 2, 'notifications': 1}
+        print("✅ Reading once and deleting decrement, edits do not")
+
+        Message.objects(recipient=patient).update(set__is_read=True)
+        reset(patient)
+        assert unread_counts(patient) == counted() == {'messages': 0, 'notifications': 1}
+        print("✅ Reset counters are recounted")
+
+        # Messages written and read by other requests while the counter is being counted
+        import unread
+        original = unread.count_unread
+        during = []
+
+        def count_then_change(user):
+            counts = original(user)
+            if not during:
+                during.append(Message(sender=doctor, recipient=patient, subject="New", content="Meanwhile").save())
+            elif len(during) == 1:
+                during.append(Notification.objects(user=patient, is_read=False).first().mark_as_read())
+            return counts
+
+        reset(patient)
+        with mock.patch.object(unread, 'count_unread', count_then_change):
+            assert unread_counts(patient) == counted() == {'messages': 1, 'notifications': 0}
+        assert len(during) == 2 and not UnreadCounter.objects.get(user=patient).pending
+        assert unread_counts(patient) == counted()
+        print("✅ Changes made while counting are not lost")
+
+if __name__ == "__main__":
+    test_unread_counters()
+    print("\n🎉 ALL UNREAD COUNTER TESTS PASSED!")
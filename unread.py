@@ -0,0 +1,125 @@
+"""
+Unread message and notification counters per user.
+
+Dashboards and badges show how many messages and notifications a user has
+not read. Rather than counting them on every page, one UnreadCounter
+document per user holds both numbers: creating an unread Message or
+Notification increments it, marking one read or deleting it decrements it.
+models.py connects these hooks to the MongoEngine signals.
+
+A user's counter is created the first time it is read, pending, and the
+unread documents are then counted into it. Changes made while counting
+update the pending counter, so the counted values are only written when
+the counter did not change meanwhile; otherwise they are counted again.
+Only existing counters are incremented, so a user who never looked has
+nothing to keep up to date. To have every counter recounted, e.g. after
+editing the collections by hand, call reset().
+"""
+
+from datetime import datetime
+
+# Field naming the user of each counted model, and the counter it feeds
+COUNTED = {
+    'Message': ('recipient', 'messages'),
+    'Notification': ('user', 'notifications')
+}
+
+def _user_id(value):
+    return getattr(value, 'id', value)
+
+def increment(user_id, counter, amount=1):
+    from models import UnreadCounter
+    UnreadCounter.objects(user=user_id).update_one(**{f'inc__{counter}': amount},
+                                                  set__updated_at=datetime.utcnow())
+
+def decrement(user_id, counter, amount=1):
+    from models import UnreadCounter
+    now = datetime.utcnow()
+    # Never below zero, should a counter have been recounted in between
+    if not UnreadCounter.objects(user=user_id, **{f'{counter}__gte': amount}).update_one(
+            **{f'inc__{counter}': -amount}, set__updated_at=now):
+        # A counter being counted into must still see the change, it is overwritten by the count
+        UnreadCounter.objects(user=user_id, pending=True).update_one(**{f'inc__{counter}': -amount},
+                                                                     set__updated_at=now)
+
+def count_unread(user):
+    """{'messages': n, 'notifications': n} unread by user, counted in the collections"""
+    from models import Message, Notification
+    return {'messages': Message.objects(recipient=user, is_read=False).count(),
+            'notifications': Notification.objects(user=user, is_read=False).count()}
+
+def unread_counts(user, attempts=3):
+    """{'messages': n, 'notifications': n} unread by user, from its counter"""
+    from mongoengine import NotUniqueError
+    from models import UnreadCounter
+
+    counter = UnreadCounter.objects(user=user).first()
+    if counter is None:
+        # Created before counting, so the documents saved meanwhile update it
+        try:
+            UnreadCounter.objects(user=user).update_one(
+                set_on_insert__messages=0, set_on_insert__notifications=0, set_on_insert__pending=True,
+                set_on_insert__updated_at=datetime.utcnow(), upsert=True
+            )
+        except NotUniqueError:
+            # Created by a concurrent request first
+            pass
+        counter = UnreadCounter.objects(user=user).first()
+    for attempt in range(attempts):
+        if not counter.pending:
+            return {'messages': counter.messages, 'notifications': counter.notifications}
+        counts = count_unread(user)
+        # Written only if nothing changed the counter while counting, else counted again
+        if UnreadCounter.objects(user=user, pending=True, messages=counter.messages,
+                                 notifications=counter.notifications, updated_at=counter.updated_at).update_one(
+                set__messages=counts['messages'], set__notifications=counts['notifications'],
+                set__pending=False, set__updated_at=datetime.utcnow()):
+            return counts
+        counter = UnreadCounter.objects(user=user).first()
+        if counter is None:
+            # Reset meanwhile
+            break
+    # Left for the next read to count
+    return counts
+
+def reset(user=None):
+    """Drop the counter of user, or all of them; they are recounted when next read"""
+    from models import UnreadCounter
+    (UnreadCounter.objects(user=user) if user is not None else UnreadCounter.objects).delete()
+
+def mark_read(document):
+    """Mark an unread Message or Notification read; returns whether this call changed it"""
+    field, counter = COUNTED[type(document).__name__]
+    # Only the request that flips is_read decrements
+    changed = type(document).objects(id=document.id, is_read=False).update_one(set__is_read=True)
+    document.is_read = True
+    if changed:
+        decrement(_user_id(document._data.get(field)), counter)
+    return bool(changed)
+
+def document_saved(sender, document, created=False, **kwargs):
+    if created and not document.is_read:
+        field, counter = COUNTED[sender.__name__]
+        increment(_user_id(document._data.get(field)), counter)
+
+def documents_inserted(sender, documents, **kwargs):
+    field, counter = COUNTED[sender.__name__]
+    per_user = {}
+    for document in documents:
+        if not document.is_read:
+            user_id = _user_id(document._data.get(field))
+            per_user[user_id] = per_user.get(user_id, 0) + 1
+    if per_user:
+        from pymongo import UpdateOne
+        from models import UnreadCounter
+        # One round-trip for a notification sent to a whole group
+        now = datetime.utcnow()
+        UnreadCounter._get_collection().bulk_write([
+            UpdateOne({'user': user_id}, {'$inc': {counter: amount}, '$set': {'updated_at': now}})
+            for user_id, amount in per_user.items()
+        ], ordered=False)
+
+def document_deleted(sender, document, **kwargs):
+    if not document.is_read:
+        field, counter = COUNTED[sender.__name__]
+        decrement(_user_id(document._data.get(field)), counter)